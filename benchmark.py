@@ -0,0 +1,345 @@
+# Event-day load benchmark for stock1L.py
+#
+# Drives the app headlessly with streamlit.testing.v1.AppTest: every simulated
+# player is its own session that registers, trades through the Buy/Sell
+# buttons, posts rumors and submits rounds. Players are split over worker
+# processes that share one working directory, so the game database sees real
+# concurrent writers; inside a worker the sessions take turns
+# rerun by rerun.
+#
+# Usage:
+#   python benchmark.py --players 50 --workers 4 --output results.json
+#   python benchmark.py --headless --players 10000 --trades-per-round 50
+#
+# The report is JSON: rerun latency percentiles, time spent in storage I/O,
+# peak RSS and how many leaderboard / rumor updates were lost. --headless
+# skips Streamlit and plays the same game straight through GameEngine in this
+# process, reporting game actions per minute instead.
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+DATA_HEADERS = {
+    "leaderboard.csv": "Player,Net Worth (₹),Round\n",
+    "rumors.csv": "source,rumor,round\n",
+}
+
+# Time every call to the methods that read or write the shared leaderboard and rumors
+def instrument_storage_io():
+    from game_db import GameDatabase, SqliteLeaderboard, SqliteRumorFeed
+    from leaderboard_store import LeaderboardStore
+    from rumor_feed import RumorFeed
+
+    stats = {"calls": 0, "seconds": 0.0}
+    lock = threading.Lock()
+
+    def timed(method):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                with lock:
+                    stats["calls"] += 1
+                    stats["seconds"] += time.perf_counter() - start
+        return wrapper
+
+    for cls, names in ((LeaderboardStore, ("refresh", "_write_rows", "compact")),
+                       (RumorFeed, ("refresh", "append", "latest_for_round")),
+                       (SqliteLeaderboard, ("refresh", "_write_rows")),
+                       (SqliteRumorFeed, ("refresh", "append", "latest_for_round")),
+                       (GameDatabase, ("save_player", "load_player"))):
+        for name in names:
+            setattr(cls, name, timed(getattr(cls, name)))
+    return stats
+
+
+def _by_label(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+# One simulated browser session
+class SimulatedPlayer:
+    def __init__(self, name, app_path, rng, latencies, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.name = name
+        self.rng = rng
+        self.latencies = latencies
+        self.at = AppTest.from_file(app_path, default_timeout=timeout)
+        self.rumors_posted = 0
+        self.rounds_submitted = 0
+
+    def run(self):
+        start = time.perf_counter()
+        self.at.run()
+        self.latencies.append(time.perf_counter() - start)
+        if self.at.exception:
+            raise RuntimeError(f"{self.name}: {self.at.exception[0].message}")
+
+    def register(self):
+        self.run()
+        self.at.text_input[0].input(self.name)
+        self.at.text_input[1].input(self.name)
+        _by_label(self.at.button, "Register").click()
+        self.run()
+
+    def trade(self):
+        select = _by_label(self.at.sidebar.selectbox, "Select Company")
+        company = self.rng.choice(select.options)
+        select.set_value(company)
+        self.run()
+        holdings = self.at.session_state["player"].shares(company)
+        shares_input = self.at.sidebar.number_input(key=f"shares_{company}")
+        if holdings and self.rng.random() < 0.4:
+            shares_input.set_value(self.rng.randint(1, holdings))
+            _by_label(self.at.sidebar.button, "Sell").click()
+        else:
+            shares_input.set_value(self.rng.randint(1, 20))
+            _by_label(self.at.sidebar.button, "Buy").click()
+        self.run()
+
+    def post_rumor(self):
+        _by_label(self.at.text_area, "Submit a Rumor").input(f"{self.name} rumor {self.rumors_posted}")
+        _by_label(self.at.button, "Submit Rumor").click()
+        self.run()
+        self.rumors_posted += 1
+
+    def submit_round(self):
+        password = ""
+        for subheader in self.at.sidebar.subheader:
+            match = re.search(r"Password: `(.*)`", subheader.value)
+            if match:
+                password = match.group(1)
+        _by_label(self.at.sidebar.text_input, "Enter Password to Proceed to Next Round").input(password)
+        _by_label(self.at.sidebar.checkbox, "I hereby confirm this.").check()
+        _by_label(self.at.sidebar.button, "Submit Round").click()
+        self.run()
+        self.rounds_submitted += 1
+
+
+# Runs one worker's share of the players; returns its raw measurements
+def run_worker(job):
+    os.chdir(job["workdir"])
+    sys.path.insert(0, job["workdir"])
+    io_stats = instrument_storage_io()
+    rng = random.Random(job["seed"])
+    latencies = []
+    players = [
+        SimulatedPlayer(name, os.path.join(job["workdir"], job["app"]), rng, latencies, job["timeout"])
+        for name in job["players"]
+    ]
+    for player in players:
+        player.register()
+    for _ in range(job["rounds"]):
+        for _ in range(job["trades_per_round"]):
+            for player in players:
+                player.trade()
+        for _ in range(job["rumors_per_round"]):
+            for player in players:
+                player.post_rumor()
+        for player in players:
+            player.submit_round()
+    # What a server shutdown does: write out standings still waiting in write-behind buffers
+    import write_behind
+    write_behind.flush_all()
+    return {
+        "latencies": latencies,
+        "storage_io": io_stats,
+        "rumors_posted": sum(player.rumors_posted for player in players),
+        "rounds_submitted": {player.name: player.rounds_submitted for player in players},
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+# Compare what the players did with what ended up in the game database
+def count_lost_updates(workdir, results):
+    sys.path.insert(0, workdir)
+    from game_db import GameDatabase, SqliteLeaderboard, SqliteRumorFeed
+
+    database = GameDatabase(os.path.join(workdir, "mockstock.db"))
+    store = SqliteLeaderboard(database)
+    store.refresh()
+    standings = store.snapshot()
+    lost_leaderboard = 0
+    for result in results:
+        for player, rounds_submitted in result["rounds_submitted"].items():
+            standing = standings.get(player)
+            if rounds_submitted and (standing is None or standing.get("Round") != rounds_submitted + 1):
+                lost_leaderboard += 1
+
+    feed = SqliteRumorFeed(database)
+    rumors_saved = sum(feed.round_counts().values())
+    rumors_posted = sum(result["rumors_posted"] for result in results)
+    database.close()
+    return {"leaderboard": lost_leaderboard, "rumors": max(rumors_posted - rumors_saved, 0)}
+
+
+# Play the game through GameEngine without Streamlit: every player trades, asks an expert and
+# submits each round; the whole event runs in this process (or on the state server with --state-server)
+def run_headless(args):
+    from game_config import EXPERTS, load_market, load_round_passwords
+    from game_engine import GameEngine
+    from journal import EventJournal
+    from market_data import MarketData
+    from predictions import PredictionEngine
+    from state_client import RemoteGame, StateClient
+
+    market = MarketData.from_file(args.scenario) if args.scenario else load_market()
+    round_passwords = load_round_passwords(market)
+    if args.state_server:
+        engine = RemoteGame(StateClient(args.state_server), market)
+    else:
+        journal = EventJournal(args.journal, market.version, args.seed) if args.journal else None
+        engine = GameEngine(market, EXPERTS, round_passwords, PredictionEngine(market, EXPERTS, args.seed), journal=journal)
+    rng = random.Random(args.seed)
+    rounds = min(args.rounds, market.n_rounds - 1)
+    accounts = [engine.new_account(f"player{i:04d}") for i in range(args.players)]
+    names = [account.name for account in accounts]
+    counts = {"trades": 0, "rejected": 0, "predictions": 0, "submits": 0}
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        round_number = accounts[0].round if accounts else 1
+        companies = market.listed(round_number)
+        if isinstance(engine, GameEngine):
+            engine.predictions.prepare_round(round_number, names)
+        for account in accounts:
+            for _ in range(args.trades_per_round):
+                company = rng.choice(companies)
+                if rng.random() < 0.6:
+                    result = engine.buy(account, company, rng.randint(1, 20))
+                else:
+                    result = engine.sell(account, company, rng.randint(1, 10))
+                counts["trades" if result else "rejected"] += 1
+            if engine.expert_prediction(account, rng.choice(list(EXPERTS))):
+                counts["predictions"] += 1
+            if engine.submit_round(account, round_passwords.get(account.round, '')):
+                counts["submits"] += 1
+    wall_seconds = time.perf_counter() - started
+
+    actions = sum(counts.values())
+    net_worths = np.array([account.net_worth for account in accounts], dtype=np.float64)
+    return {
+        "mode": "state-server" if args.state_server else "headless",
+        "revision": _git_revision(os.path.dirname(os.path.abspath(__file__))),
+        "python": platform.python_version(),
+        "players": args.players,
+        "rounds": rounds,
+        "wall_seconds": round(wall_seconds, 3),
+        "actions": counts,
+        "actions_per_minute": round(actions / wall_seconds * 60) if wall_seconds else None,
+        "trades_per_minute": round((counts["trades"] + counts["rejected"]) / wall_seconds * 60) if wall_seconds else None,
+        "mean_net_worth": round(float(net_worths.mean()), 2) if net_worths.size else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _git_revision(path):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent players against the MockStock app")
+    parser.add_argument("--app", default="stock1L.py", help="app script to drive")
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4, help="processes sharing the game files")
+    parser.add_argument("--rounds", type=int, default=2, help="rounds each player submits (at most the number of rounds - 1)")
+    parser.add_argument("--trades-per-round", type=int, default=3)
+    parser.add_argument("--rumors-per-round", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per rerun")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--headless", action="store_true", help="play through GameEngine in-process instead of the app")
+    parser.add_argument("--scenario", help="price file for --headless (CSV or Parquet); the built-in rounds otherwise")
+    parser.add_argument("--state-server", help="with --headless, play through this state server (unix:/path or host:port)")
+    parser.add_argument("--journal", help="with --headless, record the game in this event journal (see replay.py)")
+    args = parser.parse_args()
+
+    if args.headless:
+        _print_report(run_headless(args), args.output)
+        return
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    workdir = tempfile.mkdtemp(prefix="mockstock-bench-")
+    for name in os.listdir(repo):
+        if name.endswith(".py"):
+            shutil.copy(os.path.join(repo, name), workdir)
+    for name, header in DATA_HEADERS.items():
+        with open(os.path.join(workdir, name), "w", encoding="utf-8") as f:
+            f.write(header)
+
+    names = [f"player{i:04d}" for i in range(args.players)]
+    workers = max(1, min(args.workers, args.players))
+    jobs = [
+        {
+            "workdir": workdir, "app": args.app, "players": names[i::workers], "rounds": args.rounds,
+            "trades_per_round": args.trades_per_round, "rumors_per_round": args.rumors_per_round,
+            "seed": args.seed * 1000 + i, "timeout": args.timeout,
+        }
+        for i in range(workers)
+    ]
+    started = time.perf_counter()
+    with Pool(workers) as pool:
+        results = pool.map(run_worker, jobs)
+    wall_seconds = time.perf_counter() - started
+
+    latencies_ms = np.array([t for result in results for t in result["latencies"]]) * 1000
+    report = {
+        "app": args.app,
+        "revision": _git_revision(repo),
+        "python": platform.python_version(),
+        "players": args.players,
+        "workers": workers,
+        "rounds": args.rounds,
+        "reruns": int(latencies_ms.size),
+        "wall_seconds": round(wall_seconds, 3),
+        "rerun_latency_ms": {
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 3),
+            "mean": round(float(latencies_ms.mean()), 3),
+            "max": round(float(latencies_ms.max()), 3),
+        },
+        "storage_io": {
+            "calls": sum(result["storage_io"]["calls"] for result in results),
+            "total_ms": round(sum(result["storage_io"]["seconds"] for result in results) * 1000, 3),
+        },
+        "peak_rss_mb": round(max(result["peak_rss_kb"] for result in results) / 1024, 1),
+        "lost_updates": count_lost_updates(workdir, results),
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+    _print_report(report, args.output)
+
+
+def _print_report(report, path):
+    output = json.dumps(report, indent=2)
+    print(output)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+
+from market_data import MarketData
+
+# Event configuration shared by the app (stock1L.py), the state server and the tools
+
+# Experts players can pay for a prediction (shared by every session, never modified)
+EXPERTS = {
+    "Expert 1": {"cost": 50000, "accuracy": 0.8},
+    "Expert 2": {"cost": 30000, "accuracy": 0.49},
+    "Expert 3": {"cost": 1000, "accuracy": 0.21}
+}
+
+# Store passwords for each round in a dictionary
+round_passwords = {
+    1: "apple",
+    2: "tegrat",
+    3: ""
+}
+
+# Dummy data for companies and their prices for three rounds
+companies = {
+    'Round 1': {'Company A': 100, 'Company B': 150, 'Company C': 200},
+    'Round 2': {'Company A': 110, 'Company B': 140, 'Company C': 210},
+    'Round 3': {'Company A': 120, 'Company B': 130}  # Company C is delisted in Round 3
+}
+
+# Dummy news data for each round
+news_data = {
+    'Round 1': [
+        "Company A announces record profits!",
+        "Company B faces regulatory scrutiny.",
+        "Company C launches a new product line."
+    ],
+    'Round 2': [
+        "Company A's profits decline due to market conditions.",
+        "Company B resolves regulatory issues and gains investor confidence.",
+        "Company C's new product receives mixed reviews."
+    ],
+    'Round 3': [
+        "Company A's stock surges after a major partnership.",
+        "Company B's stock drops due to unexpected losses.",
+        "Company C is delisted from the stock exchange."
+    ]
+}
+
+# Scenario file (CSV or Parquet with columns round, company, price); the dummy data above is used when unset
+SCENARIO_PATH = os.environ.get("MOCKSTOCK_SCENARIO")
+
+# SQLite database holding players, portfolios, trades, rumors and the leaderboard
+DATABASE_PATH = os.environ.get("MOCKSTOCK_DB", "mockstock.db")
+
+# Seconds a round's live prices keep moving (they then hold until the round is submitted);
+# 0 keeps every round at its fixed scenario prices
+ROUND_SECONDS = float(os.environ.get("MOCKSTOCK_ROUND_SECONDS", "600"))
+
+# Event journal every game action is appended to (see journal.py and replay.py); none is kept when unset
+JOURNAL_PATH = os.environ.get("MOCKSTOCK_JOURNAL")
+
+# Passwords of the rounds players submit, comma-separated in round order ("apple,tegrat"); the ones above when unset
+ROUND_PASSWORDS = os.environ.get("MOCKSTOCK_ROUND_PASSWORDS")
+
+# Address of the shared state server ("unix:/path/to.sock" or "host:port"); each process keeps its own state when unset
+STATE_SERVER = os.environ.get("MOCKSTOCK_STATE_SERVER")
+
+
+# Price matrix of the event: the scenario file when set, the dummy data otherwise
+def load_market():
+    if SCENARIO_PATH:
+        return MarketData.from_file(SCENARIO_PATH)
+    return MarketData.from_dict(companies)
+
+
+# Round passwords of the event; raises ValueError when a round players submit (all but the last) has none,
+# so a scenario with more rounds than passwords cannot be skipped through with an empty password
+def load_round_passwords(market):
+    passwords = dict(round_passwords)
+    if ROUND_PASSWORDS:
+        passwords = {number: password.strip() for number, password in enumerate(ROUND_PASSWORDS.split(","), start=1)}
+    missing = [str(number) for number in range(1, market.n_rounds) if not passwords.get(number)]
+    if missing:
+        raise ValueError(f"No password for round {', '.join(missing)} of {market.n_rounds}; set MOCKSTOCK_ROUND_PASSWORDS")
+    return passwords
+
+
+# Seed of this event's expert predictions and price paths; the same seed replays the same game.
+# Defaults to one derived from the scenario, so a given scenario always plays out the same way.
+def event_seed(market):
+    return int(os.environ.get("MOCKSTOCK_EVENT_SEED") or int(market.version, 16))
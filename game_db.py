@@ -0,0 +1,435 @@
+import csv
+import hashlib
+import hmac
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from leaderboard_store import LeaderboardStore, Standings, NET_WORTH_COLUMN, ROUND_COLUMN
+from player_state import Position
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    cash NUMERIC NOT NULL,
+    round INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS player_pins (
+    name TEXT PRIMARY KEY,
+    salt BLOB NOT NULL,
+    pin_hash BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS portfolios (
+    player TEXT NOT NULL,
+    company TEXT NOT NULL,
+    shares INTEGER NOT NULL,
+    total_spent NUMERIC NOT NULL,
+    total_received NUMERIC NOT NULL,
+    PRIMARY KEY (player, company)
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    company TEXT NOT NULL,
+    shares_bought INTEGER NOT NULL,
+    shares_sold INTEGER NOT NULL,
+    price NUMERIC NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trades_player ON trades (player);
+CREATE TABLE IF NOT EXISTS open_orders (
+    player TEXT NOT NULL,
+    order_id INTEGER NOT NULL,
+    company TEXT NOT NULL,
+    side TEXT NOT NULL,
+    price NUMERIC NOT NULL,
+    remaining INTEGER NOT NULL,
+    PRIMARY KEY (player, order_id)
+);
+CREATE INDEX IF NOT EXISTS idx_trades_round ON trades (round);
+CREATE TABLE IF NOT EXISTS rumors (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    rumor TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rumors_round ON rumors (round);
+CREATE TABLE IF NOT EXISTS leaderboard (
+    player TEXT PRIMARY KEY,
+    net_worth NUMERIC NOT NULL,
+    round INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_round_net_worth ON leaderboard (round, net_worth);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_seq ON leaderboard (seq);
+CREATE TABLE IF NOT EXISTS round_clock (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    round INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    opened_at REAL NOT NULL,
+    deadline REAL,
+    closed_at REAL
+);
+"""
+
+# Statements are kept as constants: sqlite3 caches the prepared statement of each
+# distinct SQL string per connection, so every call after the first skips parsing.
+GET_COUNTER = "SELECT value FROM counters WHERE name = ?"
+BUMP_COUNTER = (
+    "INSERT INTO counters (name, value) VALUES (?, 1) "
+    "ON CONFLICT (name) DO UPDATE SET value = value + 1 RETURNING value"
+)
+UPSERT_PLAYER = (
+    "INSERT INTO players (name, cash, round, updated_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (name) DO UPDATE SET cash = excluded.cash, round = excluded.round, updated_at = excluded.updated_at"
+)
+UPSERT_POSITION = (
+    "INSERT INTO portfolios (player, company, shares, total_spent, total_received) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (player, company) DO UPDATE SET shares = excluded.shares, "
+    "total_spent = excluded.total_spent, total_received = excluded.total_received"
+)
+INSERT_TRADE = (
+    "INSERT INTO trades (player, round, company, shares_bought, shares_sold, price, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+DELETE_ORDERS = "DELETE FROM open_orders WHERE player = ?"
+INSERT_ORDER = (
+    "INSERT INTO open_orders (player, order_id, company, side, price, remaining) VALUES (?, ?, ?, ?, ?, ?)"
+)
+SELECT_PLAYER = "SELECT cash, round FROM players WHERE name = ?"
+INSERT_PIN = "INSERT INTO player_pins (name, salt, pin_hash) VALUES (?, ?, ?) ON CONFLICT (name) DO NOTHING"
+SELECT_PIN = "SELECT salt, pin_hash FROM player_pins WHERE name = ?"
+SELECT_PORTFOLIO = "SELECT company, shares, total_spent, total_received FROM portfolios WHERE player = ?"
+SELECT_TRADES = "SELECT round, company, shares_bought, shares_sold, price FROM trades WHERE player = ? ORDER BY id"
+SELECT_ORDERS = "SELECT order_id, company, side, price, remaining FROM open_orders WHERE player = ? ORDER BY order_id"
+UPSERT_STANDING = (
+    "INSERT INTO leaderboard (player, net_worth, round, seq, updated_at) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (player) DO UPDATE SET net_worth = excluded.net_worth, round = excluded.round, "
+    "seq = excluded.seq, updated_at = excluded.updated_at"
+)
+SELECT_STANDINGS_SINCE = "SELECT player, net_worth, round FROM leaderboard WHERE seq > ?"
+INSERT_RUMOR = "INSERT INTO rumors (source, rumor, round, created_at) VALUES (?, ?, ?, ?)"
+SELECT_LATEST_RUMORS = "SELECT source, rumor, round FROM rumors ORDER BY id DESC LIMIT ?"
+SELECT_ROUND_RUMORS = "SELECT source, rumor, round FROM rumors WHERE round = ? ORDER BY id DESC LIMIT ?"
+COUNT_ROUND_RUMORS = "SELECT round, COUNT(*) FROM rumors GROUP BY round"
+SELECT_CLOCK = "SELECT round, status, opened_at, deadline FROM round_clock WHERE id = 1"
+OPEN_CLOCK = (
+    "INSERT INTO round_clock (id, round, status, opened_at, deadline, closed_at) VALUES (1, ?, 'open', ?, ?, NULL) "
+    "ON CONFLICT (id) DO UPDATE SET round = excluded.round, status = excluded.status, "
+    "opened_at = excluded.opened_at, deadline = excluded.deadline, closed_at = NULL"
+)
+CLOSE_CLOCK = "UPDATE round_clock SET status = 'closed', closed_at = ? WHERE id = 1 AND round = ? AND status = 'open'"
+SELECT_ALL_CASH = "SELECT name, cash FROM players"
+SELECT_ALL_HOLDINGS = "SELECT player, company, shares FROM portfolios WHERE shares != 0"
+SELECT_ALL_ORDERS = "SELECT player, order_id, company, side, price, remaining FROM open_orders ORDER BY order_id"
+
+# PBKDF2 rounds of a stored PIN hash
+PIN_ITERATIONS = 100_000
+
+
+def _pin_hash(pin, salt):
+    return hashlib.pbkdf2_hmac("sha256", pin.encode("utf-8"), salt, PIN_ITERATIONS)
+
+
+# Small pool of SQLite connections shared by the threads of one server process
+#
+# Connections are opened lazily, up to `size`; a thread that finds them all in
+# use waits for one to come back. Every connection runs in WAL mode, so readers
+# never block the writer (and the other way round), and uses autocommit so
+# transactions are only opened explicitly.
+class ConnectionPool:
+    def __init__(self, path, size=4, timeout=30.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                     check_same_thread=False, cached_statements=256)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._opened < self.size
+                if create:
+                    self._opened += 1
+            if create:
+                try:
+                    connection = self._open()
+                except sqlite3.Error:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                connection = self._idle.get(timeout=self.timeout)
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# Game state in one SQLite database: players, portfolios, trades, rumors and leaderboard
+#
+# Writes go through transaction(), which takes the write lock up front (BEGIN
+# IMMEDIATE) and commits every statement of a batch at once. Tables that other
+# processes poll bump a row in `counters` in the same transaction, so a reader
+# can check for changes with one primary-key lookup.
+class GameDatabase:
+    def __init__(self, path="mockstock.db", pool_size=4):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        # executescript() would commit on its own; run the statements inside one transaction instead
+        with self.transaction() as connection:
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    connection.execute(statement)
+
+    @contextmanager
+    def transaction(self):
+        with self.pool.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def query(self, sql, params=()):
+        with self.pool.connection() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def counter(self, name):
+        rows = self.query(GET_COUNTER, (name,))
+        return rows[0][0] if rows else 0
+
+    # Increment a change counter inside a write transaction; returns its new value
+    @staticmethod
+    def bump(connection, name):
+        return connection.execute(BUMP_COUNTER, (name,)).fetchone()[0]
+
+    def is_empty(self):
+        with self.pool.connection() as connection:
+            return not any(
+                connection.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+                for table in ("players", "leaderboard", "rumors")
+            )
+
+    # Store a player's cash, round and portfolio plus any new trades in one transaction.
+    # portfolio is {company: Position}, trades are
+    # (round, company, shares bought, shares sold, price) rows. orders, when given, replace the
+    # player's open limit orders as (order id, company, side, limit price, remaining) rows: the
+    # cash and shares they reserve are not in the saved cash and portfolio.
+    def save_player(self, name, cash, round_number, portfolio, trades=(), orders=None):
+        self.save_players([(name, cash, round_number, portfolio, trades, orders)])
+
+    # save_player() for many players in one transaction; players are (name, cash, round, portfolio, trades, orders)
+    def save_players(self, players):
+        now = time.time()
+        with self.transaction() as connection:
+            for name, cash, round_number, portfolio, trades, orders in players:
+                connection.execute(UPSERT_PLAYER, (name, cash, round_number, now))
+                connection.executemany(UPSERT_POSITION, [
+                    (name, company, *position.as_tuple()) for company, position in portfolio.items()
+                ])
+                connection.executemany(INSERT_TRADE, [(name, *trade, now) for trade in trades])
+                if orders is not None:
+                    connection.execute(DELETE_ORDERS, (name,))
+                    connection.executemany(INSERT_ORDER, [(name, *order) for order in orders])
+
+    # Check a player's PIN, or make it theirs when the name has none yet (a new player, or one saved before
+    # PINs); False when the name belongs to someone with another PIN. Only a salted hash is stored.
+    def claim_player(self, name, pin):
+        salt = os.urandom(16)
+        pin_hash = _pin_hash(pin, salt)
+        with self.transaction() as connection:
+            if connection.execute(INSERT_PIN, (name, salt, pin_hash)).rowcount:
+                return True
+            salt, pin_hash = connection.execute(SELECT_PIN, (name,)).fetchone()
+        return hmac.compare_digest(_pin_hash(pin, salt), pin_hash)
+
+    # A player's saved state as {'cash', 'round', 'portfolio', 'trades', 'orders'}, None for unknown players
+    def load_player(self, name):
+        with self.pool.connection() as connection:
+            player = connection.execute(SELECT_PLAYER, (name,)).fetchone()
+            if player is None:
+                return None
+            portfolio = {
+                company: Position(shares, spent, received)
+                for company, shares, spent, received in connection.execute(SELECT_PORTFOLIO, (name,))
+            }
+            trades = connection.execute(SELECT_TRADES, (name,)).fetchall()
+            orders = connection.execute(SELECT_ORDERS, (name,)).fetchall()
+        return {'cash': player[0], 'round': player[1], 'portfolio': portfolio, 'trades': trades, 'orders': orders}
+
+    # The shared round clock as (round, status, opened_at, deadline), None before the first round was opened
+    def round_clock(self):
+        rows = self.query(SELECT_CLOCK)
+        return rows[0] if rows else None
+
+    def open_round(self, round_number, deadline=None):
+        with self.transaction() as connection:
+            connection.execute(OPEN_CLOCK, (round_number, time.time(), deadline))
+            self.bump(connection, "round_clock")
+
+    # Close an open round and snapshot every player's cash, holdings and saved open orders in the same
+    # transaction. Returns ({player: cash}, {player: {company: shares}}, {player: [(order id, company,
+    # side, limit price, remaining)]}), or None when the round was not open (another process closed it first).
+    def close_round(self, round_number):
+        with self.transaction() as connection:
+            if connection.execute(CLOSE_CLOCK, (time.time(), round_number)).rowcount == 0:
+                return None
+            self.bump(connection, "round_clock")
+            cash = dict(connection.execute(SELECT_ALL_CASH).fetchall())
+            portfolios = {player: {} for player in cash}
+            for player, company, shares in connection.execute(SELECT_ALL_HOLDINGS):
+                portfolios.setdefault(player, {})[company] = shares
+            orders = {}
+            for player, *order in connection.execute(SELECT_ALL_ORDERS):
+                orders.setdefault(player, []).append(tuple(order))
+        return cash, portfolios, orders
+
+    # Copy an existing leaderboard.csv (with its journal) and rumors.csv into an empty database
+    def import_csv(self, leaderboard_path="leaderboard.csv", rumors_path="rumors.csv"):
+        if not self.is_empty():
+            return False
+        store = LeaderboardStore(leaderboard_path)
+        store.refresh()
+        rumors = []
+        if os.path.exists(rumors_path):
+            with open(rumors_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if row.get("rumor"):
+                        rumors.append((row.get("source") or "Anonymous", row["rumor"], int(row.get("round") or 0)))
+        now = time.time()
+        with self.transaction() as connection:
+            seq = self.bump(connection, "leaderboard")
+            connection.executemany(UPSERT_STANDING, [
+                (player, data.get(NET_WORTH_COLUMN, 0), data.get(ROUND_COLUMN, 1), seq, now)
+                for player, data in store.snapshot().items()
+            ])
+            if rumors:
+                self.bump(connection, "rumors")
+                connection.executemany(INSERT_RUMOR, [(*rumor, now) for rumor in rumors])
+        return True
+
+    def close(self):
+        self.pool.close()
+
+
+# Leaderboard backed by the `leaderboard` table
+#
+# Every write stamps its rows with the next value of the "leaderboard" counter,
+# so refresh() only fetches rows written since the last refresh (through the
+# index on seq) and leaves the standings of everyone else untouched.
+class SqliteLeaderboard(Standings):
+    watch_errors = (sqlite3.Error,)
+
+    def __init__(self, database):
+        super().__init__()
+        self.database = database
+        self._seq = None
+
+    def refresh(self):
+        seq = self.database.counter("leaderboard")
+        if seq == self._seq:
+            return False
+        with self._lock:
+            if seq == self._seq:
+                return False
+            rows = self.database.query(SELECT_STANDINGS_SINCE, (self._seq or 0,))
+            standings = dict(self._standings) if self._seq is not None else {}
+            for player, net_worth, round_number in rows:
+                standings[player] = {NET_WORTH_COLUMN: net_worth, ROUND_COLUMN: round_number}
+            self._replace(standings, [row[0] for row in rows] if self._seq is not None else None)
+            self._seq = seq
+            return True
+
+    # Write (player, net worth, round) rows in one transaction
+    def _write_rows(self, rows):
+        now = time.time()
+        with self.database.transaction() as connection:
+            seq = self.database.bump(connection, "leaderboard")
+            connection.executemany(UPSERT_STANDING, [
+                (player, net_worth, round_number, seq, now) for player, net_worth, round_number in rows
+            ])
+
+
+# Rumor feed backed by the `rumors` table
+#
+# Reads are cached until the "rumors" counter moves, so reruns that find no
+# new rumor cost one primary-key lookup; the per-round query uses the index on round.
+class SqliteRumorFeed:
+    def __init__(self, database, size=5):
+        self.database = database
+        self.size = size
+        self.version = 0
+        self._seq = None
+        self._latest = []
+        self._round_cache = {}
+        self._lock = threading.Lock()
+
+    # Latest rumors first, at most `size` of them
+    def latest(self):
+        return self._latest
+
+    def refresh(self):
+        seq = self.database.counter("rumors")
+        if seq == self._seq:
+            return False
+        rows = self.database.query(SELECT_LATEST_RUMORS, (self.size,))
+        with self._lock:
+            self._latest = [self._as_dict(row) for row in rows]
+            self._round_cache = {}
+            self._seq = seq
+            self.version += 1
+        return True
+
+    @staticmethod
+    def _as_dict(row):
+        return {"source": row[0], "rumor": row[1], "round": row[2]}
+
+    # Latest rumors of one round first, at most `size` of them
+    def latest_for_round(self, round_number):
+        round_number = int(round_number)
+        cached = self._round_cache.get(round_number)
+        if cached is None:
+            rows = self.database.query(SELECT_ROUND_RUMORS, (round_number, self.size))
+            cached = self._round_cache[round_number] = [self._as_dict(row) for row in rows]
+        return cached
+
+    # Number of rumors posted in each round
+    def round_counts(self):
+        return {str(round_number): count for round_number, count in self.database.query(COUNT_ROUND_RUMORS)}
+
+    def append(self, source, rumor, round_number):
+        with self.database.transaction() as connection:
+            self.database.bump(connection, "rumors")
+            connection.execute(INSERT_RUMOR, (source, " ".join(rumor.splitlines()), int(round_number), time.time()))
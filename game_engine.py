@@ -0,0 +1,353 @@
+from journal import (BASKET_FILLED, BOUGHT, EXPERT_PAID, ORDER_CANCELLED, ORDER_EVENTS, ORDER_PLACED, REGISTERED,
+                     ROUND_FOLLOWED, ROUND_SUBMITTED, SOLD)
+from order_book import BUY, SELL, cancellation
+from player_state import PlayerState
+from predictions import describe
+
+# The engine's player account is the same slotted state a Streamlit session keeps
+PlayerAccount = PlayerState
+
+ALL_ROUNDS_COMPLETED = "All rounds completed!"
+LIMIT_ORDERS_UNAVAILABLE = "Limit orders are not available."
+
+
+# Outcome of a game action: whether it went through, a message for the player
+# and the action's value (an order id, a prediction, a net worth, ...)
+class Result:
+    __slots__ = ("ok", "message", "value")
+
+    def __init__(self, ok, message="", value=None):
+        self.ok = ok
+        self.message = message
+        self.value = value
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return f"Result(ok={self.ok}, message={self.message!r}, value={self.value!r})"
+
+
+def _failed(message):
+    return Result(False, message)
+
+
+# What one rerun of the app reads about an account: whether it moved to the clock's round, and the
+# limit order panel of `company` (trade price, order book depth and the account's open orders)
+class RerunView:
+    __slots__ = ("moved", "company", "price", "depth", "open_orders")
+
+    def __init__(self, moved, company, price, depth, open_orders):
+        self.moved = moved
+        self.company = company
+        self.price = price
+        self.depth = depth
+        self.open_orders = open_orders
+
+
+# Game rules without any UI
+#
+# Every action takes the PlayerAccount it applies to and returns a Result
+# instead of showing messages or rerunning a script, so the same rules serve
+# the Streamlit app, bots, benchmarks and batch jobs. Shared pieces are passed
+# in: the market prices, the expert table, the round passwords and, when
+# available, the prediction engine, the order matching engine and a live
+# price source. Trades go through at `quotes` prices (the round's fixed price
+# by default); net worth is always valued at round prices. Once the shared
+# round `clock` is running, trading follows it instead of passwords. With a
+# `journal` (journal.py), every action that goes through is also recorded there.
+class GameEngine:
+    def __init__(self, market, experts, round_passwords, predictions=None, orders=None, quotes=None, clock=None,
+                 journal=None):
+        self.market = market
+        self.experts = experts
+        self.round_passwords = round_passwords
+        self.predictions = predictions
+        self.orders = orders
+        self.quotes = quotes if quotes is not None else market
+        self.clock = clock
+        self.journal = journal
+
+    def _record(self, kind, *fields):
+        if self.journal is not None:
+            self.journal.append(kind, *fields)
+
+    def new_account(self, name, cash=100000):
+        account = PlayerAccount(cash=cash)
+        self.register(account, name)
+        return account
+
+    # Give a fresh account its player's name
+    def register(self, account, name):
+        account.name = name
+        self._record(REGISTERED, name, account.cash)
+
+    # Price a trade in a company goes through at right now, None if it is not listed
+    def price(self, account, company):
+        return self.quotes.price_of(account.round, company)
+
+    # Why the account cannot trade right now (its round is not open on the shared clock), None when it can
+    def _trading_closed(self, account):
+        if self.clock is None:
+            return None
+        state = self.clock.state
+        if not state.active or (state.round == account.round and state.is_open()):
+            return None
+        return f"Round {account.round} is closed for trading."
+
+    # Move the account to the shared clock's round; returns True when it moved
+    def follow_clock(self, account):
+        if self.clock is None or not self.clock.state.active or account.round == self.clock.state.round:
+            return False
+        account.round = self.clock.state.round
+        self._record(ROUND_FOLLOWED, account.name, account.round)
+        return True
+
+    # Organiser: open a round for everyone on the shared clock (the next one by default), optionally for `duration` seconds
+    def open_round(self, round_number=None, duration=None):
+        if self.clock is None:
+            return _failed("There is no round clock.")
+        try:
+            state = self.clock.open_round(round_number, duration)
+        except ValueError as error:
+            return _failed(str(error))
+        return Result(True, f"Round {state.round} is open.", state.round)
+
+    # Organiser: close the clock's current round and value every player; the value is {player: net worth}
+    def close_round(self):
+        if self.clock is None:
+            return _failed("There is no round clock.")
+        round_number = self.clock.state.round
+        net_worths = self.clock.close_round(round_number)
+        if net_worths is None:
+            return _failed(f"Round {round_number} is not open.")
+        return Result(True, f"Round {round_number} closed; {len(net_worths)} players valued.", net_worths)
+
+    def buy(self, account, company, shares):
+        closed = self._trading_closed(account)
+        if closed:
+            return _failed(closed)
+        price = self.price(account, company)
+        if price is None:
+            return _failed(f"{company} is not listed this round!")
+        if shares <= 0:
+            return _failed("Enter a positive number of shares!")
+        total_cost = shares * price
+        if total_cost > account.cash:
+            return _failed("Not enough cash to buy these shares!")
+        position = account.position(company)
+        position.shares += shares
+        position.total_spent += total_cost
+        account.cash -= total_cost
+        account.log_trade(company, shares, 0, price)
+        self._record(BOUGHT, account.name, account.round, company, shares, price)
+        return Result(True, f"Successfully bought {shares} shares of {company}!", total_cost)
+
+    def sell(self, account, company, shares):
+        closed = self._trading_closed(account)
+        if closed:
+            return _failed(closed)
+        price = self.price(account, company)
+        if price is None:
+            return _failed(f"{company} is not listed this round!")
+        if shares <= 0:
+            return _failed("Enter a positive number of shares!")
+        if account.shares(company) < shares:
+            return _failed("You don't own enough shares to sell!")
+        total_received = shares * price
+        position = account.position(company)
+        position.shares -= shares
+        position.total_received += total_received
+        account.cash += total_received
+        account.log_trade(company, 0, shares, price)
+        self._record(SOLD, account.name, account.round, company, shares, price)
+        return Result(True, f"Successfully sold {shares} shares of {company}!", total_received)
+
+    # Buy and sell several companies at once at the current prices
+    # legs is {company: shares}, positive to buy and negative to sell. The whole basket is checked first
+    # (sales fund purchases) and then applied in one go.
+    def basket(self, account, legs):
+        closed = self._trading_closed(account)
+        if closed:
+            return _failed(closed)
+        legs = {company: shares for company, shares in legs.items() if shares}
+        if not legs:
+            return _failed("Enter the number of shares to buy or sell for at least one company.")
+        prices = {company: self.price(account, company) for company in legs}
+        for company, shares in legs.items():
+            if prices[company] is None:
+                return _failed(f"{company} is not listed this round!")
+            if shares < 0 and account.shares(company) < -shares:
+                return _failed(f"You don't own enough shares of {company} to sell!")
+        net_cost = sum(shares * prices[company] for company, shares in legs.items())
+        if net_cost > account.cash:
+            return _failed("Not enough cash for this basket!")
+        for company, shares in legs.items():
+            position = account.position(company)
+            amount = abs(shares) * prices[company]
+            position.shares += shares
+            if shares > 0:
+                position.total_spent += amount
+                account.log_trade(company, shares, 0, prices[company])
+            else:
+                position.total_received += amount
+                account.log_trade(company, 0, -shares, prices[company])
+        account.cash -= net_cost
+        self._record(BASKET_FILLED, account.name, account.round, legs, prices)
+        return Result(True, "Orders executed!", net_cost)
+
+    # Place a limit order; its cash or shares are reserved until it fills or is cancelled
+    def place_order(self, account, company, side, shares, limit_price):
+        if self.orders is None:
+            return _failed(LIMIT_ORDERS_UNAVAILABLE)
+        closed = self._trading_closed(account)
+        if closed:
+            return _failed(closed)
+        if self.market.price_of(account.round, company) is None:
+            return _failed(f"{company} is not listed this round!")
+        if shares <= 0 or limit_price <= 0:
+            return _failed("Enter a positive number of shares and limit price!")
+        if side == BUY:
+            reserved = shares * limit_price
+            if reserved > account.cash:
+                return _failed("Not enough cash to place this order!")
+            account.cash -= reserved
+        elif side == SELL:
+            if account.shares(company) < shares:
+                return _failed("You don't own enough shares to sell!")
+            account.portfolio[company].shares -= shares
+        else:
+            return _failed(f"Unknown order side: {side}")
+        order_id = self.orders.submit(account.name, company, side, limit_price, shares)
+        self.orders.sync()
+        self._record(ORDER_PLACED, account.name, account.round, order_id, company, side, shares, limit_price)
+        return Result(True, f"Order {order_id} placed.", order_id)
+
+    # Cancel one of the account's resting orders (the reservation comes back with the cancellation event)
+    def cancel_order(self, account, order_id):
+        if self.orders is None:
+            return _failed(LIMIT_ORDERS_UNAVAILABLE)
+        if all(order[0] != order_id for order in self.orders.open_orders(account.name)):
+            return _failed(f"Order {order_id} is not one of your open orders.")
+        self.orders.cancel(order_id, account.name)
+        self.orders.sync()
+        self._record(ORDER_CANCELLED, account.name, order_id)
+        return Result(True, f"Order {order_id} cancelled.", order_id)
+
+    # The account's resting orders as (order_id, company, side, limit price, remaining)
+    def open_orders(self, account):
+        return self.orders.open_orders(account.name) if self.orders is not None else []
+
+    # Best bid and ask levels of a company's order book as ([(price, quantity)], [(price, quantity)])
+    def depth(self, company, levels=5):
+        return self.orders.depth(company, levels) if self.orders is not None else ([], [])
+
+    # Apply order book fills and cancellations to the account; returns how many were applied
+    def apply_order_events(self, account):
+        if self.orders is None:
+            return 0
+        return self._apply_events(account, self.orders.drain(account.name))
+
+    def _apply_events(self, account, events):
+        for event in events:
+            position = account.position(event.ticker)
+            amount = event.price * event.quantity
+            if event.kind == "cancelled":
+                if event.side == BUY:
+                    account.cash += amount
+                else:
+                    position.shares += event.quantity
+            elif event.side == BUY:
+                position.shares += event.quantity
+                position.total_spent += amount
+                # Cash was reserved at the limit price; give back the difference to the fill price
+                account.cash += (event.limit_price - event.price) * event.quantity
+                account.log_trade(event.ticker, event.quantity, 0, event.price)
+            else:
+                position.total_received += amount
+                account.cash += amount
+                account.log_trade(event.ticker, 0, event.quantity, event.price)
+        if events:
+            self._record(ORDER_EVENTS, account.name, account.round, [
+                [event.kind, event.order_id, event.ticker, event.side, event.limit_price, event.price, event.quantity]
+                for event in events
+            ])
+        return len(events)
+
+    # Start of a rerun: apply order events, follow the clock and read the limit order panel of `company`
+    def refresh(self, account, company, levels=5):
+        self.apply_order_events(account)
+        moved = self.follow_clock(account)
+        return RerunView(moved, company, self.price(account, company), self.depth(company, levels),
+                         self.open_orders(account))
+
+    # Pay an expert for a prediction of the next round; the first request of a round prepares `players`
+    # (an iterable of names) in the same batch, later ones only look theirs up
+    def expert_prediction(self, account, expert, players=()):
+        if expert not in self.experts:
+            return _failed("Invalid expert selected.")
+        if self.predictions is None or not self.predictions.has_next_round(account.round):
+            return _failed("This is the last round; there is nothing left to predict.")
+        cost = self.experts[expert]["cost"]
+        if account.cash < cost:
+            return _failed("Not enough cash to pay the expert!")
+        account.cash -= cost
+        self._record(EXPERT_PAID, account.name, account.round, expert, cost)
+        self.predictions.prepare_batch(account.round, players)
+        prediction = self.predictions.predict(account.round, account.name, expert)
+        return Result(True, f"{expert}'s prediction for the next round: {describe(prediction)}.", prediction)
+
+    # Cash plus holdings at the current round's prices; cash and shares reserved by open
+    # limit orders still belong to the player
+    def net_worth(self, account):
+        holdings = {company: position.shares for company, position in account.portfolio.items()}
+        reserved_cash = 0
+        if self.orders is not None:
+            for _, company, side, limit_price, remaining in self.orders.open_orders(account.name):
+                if side == BUY:
+                    reserved_cash += limit_price * remaining
+                else:
+                    holdings[company] = holdings.get(company, 0) + remaining
+        return account.cash + reserved_cash + self.market.value(account.round, holdings)
+
+    def is_last_round(self, account):
+        return account.round >= self.market.n_rounds
+
+    # Move the account to the next round and value it there; the Result's value is the new net worth
+    def submit_round(self, account, password, confirmed=True):
+        if self.clock is not None and self.clock.state.active:
+            return _failed("Rounds are opened and closed by the organiser.")
+        if not confirmed:
+            return _failed("Please confirm by checking the box above.")
+        expected = self.round_passwords.get(account.round, '')
+        if not expected and not self.is_last_round(account):
+            return _failed(f"Round {account.round} has no password; ask the organiser.")
+        if password != expected:
+            return _failed("Incorrect password!")
+        if self.is_last_round(account):
+            return _failed(ALL_ROUNDS_COMPLETED)
+        # Orders do not carry over into the next round; their reservations come back first
+        if self.orders is not None:
+            self.orders.cancel_all(account.name)
+            self.orders.sync()
+            self.apply_order_events(account)
+        account.round += 1
+        account.net_worth = self.net_worth(account)
+        self._record(ROUND_SUBMITTED, account.name, account.round - 1, account.net_worth)
+        return Result(True, f"Round {account.round - 1} submitted successfully! Now play the next round {account.round}.",
+                      account.net_worth)
+
+    # Load a player's saved state ({'cash', 'round', 'portfolio', 'trades', 'orders'}) into an account.
+    # Saved open orders the order book no longer has (the process restarted) are cancelled, so their
+    # reservations come back; orders it still has settle through apply_order_events() as usual.
+    def restore(self, account, saved):
+        account.cash = saved['cash']
+        account.round = saved['round']
+        account.portfolio = saved['portfolio']
+        for round_number, company, shares_bought, shares_sold, price in saved['trades']:
+            account.transactions.append(round_number, company, shares_bought, shares_sold, price)
+            account.add_round_totals(shares_bought * price, shares_sold * price, round_number)
+        live = self.orders.order_ids(account.name) if self.orders is not None else set()
+        self._apply_events(account, [
+            cancellation(account.name, order) for order in saved['orders'] if order[0] not in live
+        ])
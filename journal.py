@@ -0,0 +1,113 @@
+import os
+import struct
+import time
+import zlib
+
+from state_protocol import MAX_FRAME, ProtocolError, decode, encode
+
+# Append-only event journal of a competition
+#
+# Every game action that changes a player's state is appended as one record:
+# a 21-byte header (payload length, CRC-32 of the payload, wall-clock time,
+# event kind) followed by the event's fields encoded like a state server
+# payload (state_protocol.py). The first record of a journal names the
+# scenario and event seed it was recorded with, so replay.py can rebuild
+# every account from it with the same prices and predictions.
+#
+# Records are written with one os.write() on a file opened with O_APPEND, so
+# threads and several app processes can share a journal without interleaving
+# records. A record cut short by a crash fails its length or CRC check and
+# ends the journal for readers. An existing journal is only appended to when
+# it was started with the same scenario and seed.
+
+RECORD = struct.Struct("<IIdB")
+
+# Event kinds and their fields
+JOURNAL_STARTED = 0  # scenario version, event seed
+REGISTERED = 1  # player, starting cash
+BOUGHT = 2  # player, round, company, shares, price
+SOLD = 3  # player, round, company, shares, price
+BASKET_FILLED = 4  # player, round, {company: shares}, {company: price}
+ORDER_PLACED = 5  # player, round, order id, company, side, shares, limit price
+ORDER_CANCELLED = 6  # player, order id
+ORDER_EVENTS = 7  # player, round, [[kind, order id, company, side, limit price, price, quantity]]
+EXPERT_PAID = 8  # player, round, expert, cost
+RUMOR_POSTED = 9  # source, round, rumor
+ROUND_SUBMITTED = 10  # player, round submitted, net worth in the next round
+ROUND_FOLLOWED = 11  # player, round the clock moved them to
+
+EVENT_NAMES = {
+    JOURNAL_STARTED: "journal_started",
+    REGISTERED: "registered",
+    BOUGHT: "bought",
+    SOLD: "sold",
+    BASKET_FILLED: "basket_filled",
+    ORDER_PLACED: "order_placed",
+    ORDER_CANCELLED: "order_cancelled",
+    ORDER_EVENTS: "order_events",
+    EXPERT_PAID: "expert_paid",
+    RUMOR_POSTED: "rumor_posted",
+    ROUND_SUBMITTED: "round_submitted",
+    ROUND_FOLLOWED: "round_followed",
+}
+
+
+class EventJournal:
+    def __init__(self, path, scenario_version, event_seed):
+        self.path = path
+        try:
+            self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL, 0o644)
+            created = True
+        except FileExistsError:
+            # Empty when the process that created it has not written the header yet; a second header is harmless
+            created = os.path.getsize(path) == 0
+            if not created:
+                header = journal_header(path)
+                if header != (scenario_version, event_seed):
+                    raise ValueError(f"{path} was started with scenario {header[0]} and seed {header[1]}, "
+                                     f"not {scenario_version} and {event_seed}; use a new journal file")
+            self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        if created:
+            self.append(JOURNAL_STARTED, scenario_version, event_seed)
+
+    def append(self, kind, *fields):
+        payload = encode(list(fields))
+        os.write(self._fd, RECORD.pack(len(payload), zlib.crc32(payload), time.time(), kind) + payload)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+# Records of a journal from byte `offset` on, as (offset after the record, time, kind, fields);
+# stops at the end of the file or at a record that was cut short
+def read_journal(path, offset=0):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    view = memoryview(data)
+    position = 0
+    while len(data) - position >= RECORD.size:
+        length, checksum, timestamp, kind = RECORD.unpack_from(data, position)
+        end = position + RECORD.size + length
+        if length > MAX_FRAME or end > len(data):
+            return
+        payload = view[position + RECORD.size:end]
+        if zlib.crc32(payload) != checksum:
+            return
+        try:
+            fields = decode(payload)
+        except ProtocolError:
+            return
+        position = end
+        yield offset + position, timestamp, kind, fields
+
+
+# (scenario version, event seed) a journal was recorded with
+def journal_header(path):
+    for _, _, kind, fields in read_journal(path):
+        if kind == JOURNAL_STARTED:
+            return tuple(fields)
+        break
+    raise ValueError(f"{path} does not start with a journal header")
@@ -0,0 +1,310 @@
+import csv
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from rank_index import RankIndex
+from write_behind import WriteBehind
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+NET_WORTH_COLUMN = "Net Worth (₹)"
+ROUND_COLUMN = "Round"
+SNAPSHOT_COLUMNS = ["Player", NET_WORTH_COLUMN, ROUND_COLUMN]
+JOURNAL_COLUMNS = SNAPSHOT_COLUMNS + ["Timestamp"]
+
+
+# Convert a CSV cell back to a number (the leaderboard only stores numbers besides the name)
+def _to_number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    return int(number) if number.is_integer() else number
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# In-memory standings and rank index shared by the leaderboard backends
+#
+# Subclasses load standings in refresh() and write rows durably in _write_rows();
+# this class keeps the copy-on-write standings, the rank index, the watcher
+# thread and the optional write-behind buffer.
+class Standings:
+    # Errors a failed background refresh may raise; the watcher retries on its next tick
+    watch_errors = (OSError,)
+
+    def __init__(self):
+        self.version = 0
+        self._standings = {}
+        self._net_worths = {}
+        self._ranks = RankIndex()
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._write_behind = None
+
+    # Standings keyed by player: {player: {"Net Worth (₹)": ..., "Round": ...}}
+    def snapshot(self):
+        return self._standings
+
+    # Net worth keyed by player, for the older apps that store a plain number per player
+    def net_worths(self):
+        return self._net_worths
+
+    # Top `top` standings plus the player's own rank and `distance` neighbours either side,
+    # each as [(rank, player, net worth), ...]; the second list is empty for unranked players
+    def ranking(self, player=None, top=50, distance=2):
+        with self._lock:
+            leaders = self._ranks.top(top)
+            around = self._ranks.around(player, distance) if player is not None else []
+        return leaders, around
+
+    def rank(self, player):
+        with self._lock:
+            return self._ranks.rank(player)
+
+    def player_count(self):
+        return len(self._ranks)
+
+    def refresh(self):
+        raise NotImplementedError
+
+    # Durably write (player, net worth, round) rows in one go
+    def _write_rows(self, rows):
+        raise NotImplementedError
+
+    # Write many (player, net worth, round) standings at once; returns how many were new
+    def record_many(self, entries):
+        rows = self._changed(entries)
+        if not rows:
+            return 0
+        self._write_rows(rows)
+        self._publish(rows)
+        return len(rows)
+
+    # Record one player's standing; skipped when nothing changed
+    def record(self, player, net_worth, round_number):
+        return self.record_many([(player, net_worth, round_number)]) > 0
+
+    # Write standings through a background writer that commits everything submitted
+    # within `window` seconds as one batch (see submit())
+    def enable_write_behind(self, window=0.05):
+        if self._write_behind is None:
+            self._write_behind = WriteBehind(self._write_rows, window, name="leaderboard-writer")
+
+    # Record one player's standing without waiting for the disk: it is visible to this
+    # process at once and written with the next batch. Falls back to record() when
+    # write-behind is off.
+    def submit(self, player, net_worth, round_number):
+        if self._write_behind is None:
+            return self.record(player, net_worth, round_number)
+        rows = self._changed([(player, net_worth, round_number)])
+        if not rows:
+            return False
+        self._publish(rows)
+        self._write_behind.put(player, rows[0])
+        return True
+
+    # Wait until every submitted standing is on disk
+    def flush(self, timeout=5.0):
+        return self._write_behind is None or self._write_behind.flush(timeout)
+
+    # (player, net worth, round) entries that differ from the current standings
+    def _changed(self, entries):
+        return [
+            (player, net_worth, round_number) for player, net_worth, round_number in entries
+            if self._standings.get(player) != {NET_WORTH_COLUMN: net_worth, ROUND_COLUMN: round_number}
+        ]
+
+    # Swap in new standings (a full reload when `touched` is None, otherwise only those players
+    # changed); caller holds self._lock. New dicts keep sessions holding the old snapshot unchanged.
+    def _replace(self, standings, touched=None):
+        if touched is None:
+            self._ranks = RankIndex()
+            touched = standings
+        for player in touched:
+            self._rank(player, standings[player].get(NET_WORTH_COLUMN, 0))
+        self._standings = standings
+        self._net_worths = {player: data.get(NET_WORTH_COLUMN, 0) for player, data in standings.items()}
+        self.version += 1
+
+    # Move a player in the rank index; caller holds self._lock
+    def _rank(self, player, net_worth):
+        if isinstance(net_worth, (int, float)):
+            self._ranks.update(player, net_worth)
+        else:
+            self._ranks.remove(player)
+
+    # Show freshly recorded standings to this process right away, without waiting for a refresh
+    def _publish(self, rows):
+        with self._lock:
+            standings = dict(self._standings)
+            net_worths = dict(self._net_worths)
+            for player, net_worth, round_number in rows:
+                standings[player] = {NET_WORTH_COLUMN: net_worth, ROUND_COLUMN: round_number}
+                net_worths[player] = net_worth
+                self._rank(player, net_worth)
+            self._standings = standings
+            self._net_worths = net_worths
+            self.version += 1
+
+    # Refresh every `interval` seconds on a background thread, so readers that only
+    # look at snapshot()/version see other processes' writes without any I/O
+    def start_watcher(self, interval=5.0):
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="leaderboard-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+            except self.watch_errors:
+                pass
+
+
+# Shared, in-memory copy of the leaderboard, backed by CSV files
+#
+# One instance is shared by every session of the app (see get_leaderboard_store()
+# in stock1L.py). Standings live in two files:
+#   - leaderboard.csv: the compacted snapshot, sorted by net worth
+#   - leaderboard.csv.journal: one appended line per round submission
+# Submitting a round appends a single line under a file lock, so concurrent
+# sessions never overwrite each other. Once the journal grows past
+# compact_bytes it is folded into the snapshot (written to a temp file and
+# renamed into place) and truncated.
+# The files are only read again when their mtime or size changes, and a grown
+# journal is read from where the last read stopped.
+# Ranks are kept in a RankIndex that is updated per changed player, so the top
+# of the table and any player's rank are read without sorting every standing.
+class LeaderboardStore(Standings):
+    def __init__(self, path="leaderboard.csv", compact_bytes=64 * 1024):
+        super().__init__()
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.lock_path = path + ".lock"
+        self.compact_bytes = compact_bytes
+        self._signature = None
+        self._journal_offset = 0
+
+    def exists(self):
+        return self._signature is not None and self._signature[0] is not None
+
+    def is_empty(self):
+        return self.exists() and self._signature[0][1] == 0
+
+    # Lock shared with other processes serving the same leaderboard
+    @contextmanager
+    def _file_lock(self, exclusive):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _signatures(self):
+        return (_file_signature(self.path), _file_signature(self.journal_path))
+
+    def _read_snapshot(self):
+        standings = {}
+        if os.path.exists(self.path):
+            with open(self.path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    player = row.pop("Player", None)
+                    if player:
+                        standings[player] = {column: _to_number(value) for column, value in row.items()}
+        return standings
+
+    # Apply journal lines starting at offset; returns the offset after the last full line.
+    # Players whose standing was touched are added to `touched` when given.
+    def _apply_journal(self, standings, offset, touched=None):
+        if not os.path.exists(self.journal_path):
+            return 0
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        lines = data[:end].decode("utf-8").splitlines()
+        for row in csv.reader(lines):
+            if not row or row == JOURNAL_COLUMNS:
+                continue
+            player, net_worth, round_number = row[0], row[1], row[2]
+            standings[player] = {NET_WORTH_COLUMN: _to_number(net_worth), ROUND_COLUMN: _to_number(round_number)}
+            if touched is not None:
+                touched.add(player)
+        return offset + end
+
+    # Reload the files if they changed since the last call; returns True when they did
+    def refresh(self):
+        if self._signatures() == self._signature:
+            return False
+        with self._file_lock(exclusive=False):
+            signature = self._signatures()
+            if signature == self._signature:
+                return False
+            previous = self._signature
+            journal_size = signature[1][1] if signature[1] else 0
+            if previous is not None and previous[0] == signature[0] and journal_size >= self._journal_offset:
+                # Only the journal grew: apply the new lines on top of a copy
+                standings = dict(self._standings)
+                touched = set()
+                offset = self._apply_journal(standings, self._journal_offset, touched)
+            else:
+                standings = self._read_snapshot()
+                offset = self._apply_journal(standings, 0)
+                touched = None
+            self._replace(standings, touched)
+            self._journal_offset = offset
+            self._signature = signature
+            return True
+
+    # Append (player, net worth, round) rows to the journal in one locked write
+    def _write_rows(self, rows):
+        timestamp = f"{time.time():.3f}"
+        with self._file_lock(exclusive=True):
+            new_file = not os.path.exists(self.journal_path)
+            with open(self.journal_path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                if new_file:
+                    writer.writerow(JOURNAL_COLUMNS)
+                writer.writerows([player, net_worth, round_number, timestamp] for player, net_worth, round_number in rows)
+                journal_size = f.tell()
+            if journal_size >= self.compact_bytes:
+                self._compact()
+
+    # Fold the journal into the snapshot file; caller holds the exclusive lock
+    def _compact(self):
+        standings = self._read_snapshot()
+        self._apply_journal(standings, 0)
+        rows = sorted(standings.items(), key=lambda item: item[1].get(NET_WORTH_COLUMN, 0), reverse=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(SNAPSHOT_COLUMNS)
+            for player, data in rows:
+                writer.writerow([player, data.get(NET_WORTH_COLUMN, 0), data.get(ROUND_COLUMN, "")])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        open(self.journal_path, "w").close()
+
+    def compact(self):
+        with self._file_lock(exclusive=True):
+            self._compact()
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+LEDGER_COLUMNS = ["round", "company", "shares_bought", "shares_sold", "price"]
+
+
+# Transaction log stored as typed NumPy columns instead of one dict per trade
+#
+# Companies are interned to small integer ids. The arrays double in capacity
+# when full, so appending stays amortised O(1), and per-round or per-company
+# reports are computed with vectorised NumPy operations.
+class TransactionLedger:
+    def __init__(self, capacity=64):
+        self._size = 0
+        self._round = np.zeros(capacity, dtype=np.int16)
+        self._company = np.zeros(capacity, dtype=np.int32)
+        self._bought = np.zeros(capacity, dtype=np.int64)
+        self._sold = np.zeros(capacity, dtype=np.int64)
+        self._price = np.zeros(capacity, dtype=np.float64)
+        self.companies = []
+        self._company_ids = {}
+
+    def __len__(self):
+        return self._size
+
+    # Rows as dicts, in the same shape as the old list of transactions
+    def __iter__(self):
+        for i in range(self._size):
+            yield {
+                'round': int(self._round[i]),
+                'company': self.companies[self._company[i]],
+                'shares_bought': int(self._bought[i]),
+                'shares_sold': int(self._sold[i]),
+                'price': self._price[i].item()
+            }
+
+    def company_id(self, company):
+        company_id = self._company_ids.get(company)
+        if company_id is None:
+            company_id = len(self.companies)
+            self._company_ids[company] = company_id
+            self.companies.append(company)
+        return company_id
+
+    def _grow(self):
+        capacity = max(len(self._round) * 2, 1)
+        for name in ("_round", "_company", "_bought", "_sold", "_price"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def append(self, round_number, company, shares_bought, shares_sold, price):
+        if self._size == len(self._round):
+            self._grow()
+        i = self._size
+        self._round[i] = round_number
+        self._company[i] = self.company_id(company)
+        self._bought[i] = shares_bought
+        self._sold[i] = shares_sold
+        self._price[i] = price
+        self._size += 1
+
+    # Views over the filled part of each column
+    def columns(self):
+        n = self._size
+        return self._round[:n], self._company[:n], self._bought[:n], self._sold[:n], self._price[:n]
+
+    # Rows from index `start` on as (round, company, shares bought, shares sold, price) tuples
+    def rows(self, start=0):
+        return [
+            (int(self._round[i]), self.companies[self._company[i]], int(self._bought[i]), int(self._sold[i]), self._price[i].item())
+            for i in range(start, self._size)
+        ]
+
+    # Spent, received, net cash flow and trade count of one round
+    def round_summary(self, round_number):
+        rounds, _, bought, sold, price = self.columns()
+        mask = rounds == round_number
+        spent = float(np.dot(bought[mask], price[mask]))
+        received = float(np.dot(sold[mask], price[mask]))
+        return {'spent': spent, 'received': received, 'net': received - spent, 'trades': int(mask.sum())}
+
+    # Shares bought and sold, amount spent and received, per company
+    def company_summary(self):
+        _, company, bought, sold, price = self.columns()
+        n = len(self.companies)
+        summary = pd.DataFrame({
+            "Company": self.companies,
+            "Shares bought": np.bincount(company, weights=bought, minlength=n).astype(np.int64),
+            "Shares sold": np.bincount(company, weights=sold, minlength=n).astype(np.int64),
+            "Total amount spent": np.bincount(company, weights=bought * price, minlength=n),
+            "Total amount received": np.bincount(company, weights=sold * price, minlength=n),
+        })
+        return summary
+
+    # Realised profit per company: sale proceeds minus the shares sold valued at the average cost of
+    # the shares held at the time of the sale (purchases made after a sale do not change its profit)
+    def realized_pnl(self):
+        n = len(self.companies)
+        held = [0] * n
+        cost = [0.0] * n
+        pnl = [0.0] * n
+        _, company, bought, sold, price = self.columns()
+        for company_id, shares_bought, shares_sold, trade_price in zip(company.tolist(), bought.tolist(),
+                                                                        sold.tolist(), price.tolist()):
+            if shares_bought:
+                held[company_id] += shares_bought
+                cost[company_id] += shares_bought * trade_price
+            if shares_sold:
+                average_cost = cost[company_id] / held[company_id] if held[company_id] > 0 else 0.0
+                pnl[company_id] += shares_sold * (trade_price - average_cost)
+                cost[company_id] -= min(shares_sold, held[company_id]) * average_cost
+                held[company_id] = max(held[company_id] - shares_sold, 0)
+        return dict(zip(self.companies, pnl))
+
+    # Full log as a DataFrame for audit and export
+    def to_dataframe(self):
+        rounds, company, bought, sold, price = self.columns()
+        return pd.DataFrame({
+            "round": rounds,
+            "company": np.array(self.companies, dtype=object)[company] if self.companies else np.array([], dtype=object),
+            "shares_bought": bought,
+            "shares_sold": sold,
+            "price": price,
+        }, columns=LEDGER_COLUMNS)
@@ -0,0 +1,119 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Round labels are "Round 1", "Round 2", ... in the app and may be plain numbers in a scenario file
+def _round_number(value):
+    if isinstance(value, str):
+        value = value.replace("Round", "").strip()
+    return int(value)
+
+
+# Prices of every ticker in every round, as a rounds x tickers matrix
+#
+# Row r - 1 holds the prices of round r, column i the prices of ticker i.
+# A ticker that is not listed in a round (e.g. delisted) has NaN there.
+# Lookups by (round, ticker id) are plain array indexing, and a whole round can
+# be read as one price vector for vectorised valuation.
+class MarketData:
+    def __init__(self, tickers, prices):
+        self.tickers = list(tickers)
+        self.ticker_ids = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.prices.setflags(write=False)
+        self.n_rounds = self.prices.shape[0]
+        # Changes whenever the tickers or any price change, for keying per-round caches
+        digest = hashlib.sha1("\0".join(map(str, self.tickers)).encode("utf-8"))
+        digest.update(self.prices.tobytes())
+        self.version = digest.hexdigest()[:12]
+        self.closing = np.nan_to_num(self.prices, nan=0.0)
+        self.closing.setflags(write=False)
+        # Scenarios priced in whole rupees hand out ints, like the original companies dict
+        listed = self.prices[~np.isnan(self.prices)]
+        self.whole_prices = bool(np.all(listed == np.round(listed)))
+        self._listed_ids = [np.flatnonzero(~np.isnan(row)) for row in self.prices]
+        self._listed = [[self.tickers[i] for i in ids] for ids in self._listed_ids]
+
+    # Build from the app's {"Round 1": {"Company A": 100, ...}, ...} dict
+    @classmethod
+    def from_dict(cls, companies):
+        rows = [
+            (_round_number(round_label), company, price)
+            for round_label, round_prices in companies.items()
+            for company, price in round_prices.items()
+        ]
+        return cls.from_records(rows)
+
+    # Build from (round, ticker, price) rows
+    @classmethod
+    def from_records(cls, rows):
+        tickers = list(dict.fromkeys(ticker for _, ticker, _ in rows))
+        ticker_ids = {ticker: i for i, ticker in enumerate(tickers)}
+        n_rounds = max((round_number for round_number, _, _ in rows), default=0)
+        prices = np.full((n_rounds, len(tickers)), np.nan)
+        for round_number, ticker, price in rows:
+            prices[round_number - 1, ticker_ids[ticker]] = price
+        return cls(tickers, prices)
+
+    # Load a scenario file (.csv or .parquet) with columns round, company, price
+    @classmethod
+    def from_file(cls, path):
+        if os.path.splitext(path)[1].lower() == ".parquet":
+            scenario = pd.read_parquet(path, columns=["round", "company", "price"])
+        else:
+            scenario = pd.read_csv(path, usecols=["round", "company", "price"])
+        scenario = scenario.dropna(subset=["price"])
+        rounds = scenario["round"].map(_round_number).to_numpy()
+        return cls.from_records(list(zip(rounds, scenario["company"], scenario["price"])))
+
+    def ticker_id(self, ticker):
+        return self.ticker_ids.get(ticker)
+
+    def _scalar(self, price):
+        if np.isnan(price):
+            return None
+        return int(price) if self.whole_prices else float(price)
+
+    # Price of one ticker id in a round, None if it is not listed
+    def price(self, round_number, ticker_id):
+        return self._scalar(self.prices[round_number - 1, ticker_id])
+
+    def price_of(self, round_number, ticker):
+        ticker_id = self.ticker_ids.get(ticker)
+        if ticker_id is None:
+            return None
+        return self.price(round_number, ticker_id)
+
+    # All prices of a round (NaN where not listed)
+    def round_prices(self, round_number):
+        return self.prices[round_number - 1]
+
+    # All prices of a round with unlisted tickers valued at zero
+    def closing_prices(self, round_number):
+        return self.closing[round_number - 1]
+
+    # Names of the tickers listed in a round, in scenario order
+    def listed(self, round_number):
+        return self._listed[round_number - 1]
+
+    # Prices of the tickers listed in a round, in the same order as listed()
+    def listed_price_array(self, round_number):
+        prices = self.prices[round_number - 1, self._listed_ids[round_number - 1]]
+        return prices.astype(np.int64) if self.whole_prices else prices
+
+    # {ticker: price} of the tickers listed in a round
+    def listed_prices(self, round_number):
+        return {ticker: self.price_of(round_number, ticker) for ticker in self.listed(round_number)}
+
+    # Market value of {ticker: shares} holdings in a round; unlisted tickers count as zero
+    def value(self, round_number, holdings):
+        if not holdings:
+            return 0
+        ids = np.fromiter((self.ticker_ids.get(t, -1) for t in holdings), dtype=np.int64, count=len(holdings))
+        shares = np.fromiter(holdings.values(), dtype=np.float64, count=len(holdings))
+        known = ids >= 0
+        value = float(np.dot(shares[known], self.closing_prices(round_number)[ids[known]]))
+        return int(value) if self.whole_prices and value.is_integer() else value
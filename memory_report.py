@@ -0,0 +1,106 @@
+# Per-session memory of stock1L.py, before and after the PlayerState layout
+#
+# Builds the session state one player carries in both layouts from the same
+# simulated game (trades, holdings and a leaderboard of --players standings)
+# and reports the bytes each session holds on top of the objects shared by all
+# sessions, plus the total for the whole event.
+#
+# Before: the original app's loose session keys, one dict per holding, one
+# dict per transaction, a copy of the expert table and a per-session dict of
+# every player's standing, rebuilt from the leaderboard CSV.
+# After: one PlayerState with __slots__ Positions; experts and standings are
+# shared module-level / store objects.
+#
+# Usage:
+#   python memory_report.py --players 2000 --trades 30
+
+import argparse
+import json
+import random
+
+from game_config import EXPERTS
+from player_state import PlayerState, deep_sizeof
+
+
+def simulate_trades(rng, companies, trades):
+    return [
+        (rng.randint(1, 3), rng.choice(companies), rng.randint(1, 20), 0, rng.choice((100, 110, 120)))
+        for _ in range(trades)
+    ]
+
+
+# Session state of the original app: every rerun of load_leaderboard() filled the session's
+# own players dict with new dicts read from the CSV
+def legacy_session(name, trades, standings):
+    portfolio = {}
+    transactions = []
+    for round_number, company, bought, sold, price in trades:
+        position = portfolio.setdefault(company, {'shares': 0, 'total_spent': 0, 'total_received': 0})
+        position['shares'] += bought
+        position['total_spent'] += bought * price
+        transactions.append({
+            'round': round_number,
+            'company': company,
+            'shares_bought': bought,
+            'shares_sold': sold,
+            'price': price
+        })
+    players = {player: {"Net Worth (₹)": standing["Net Worth (₹)"], "Round": standing["Round"]}
+               for player, standing in standings.items()}
+    return {
+        'round': 3, 'cash': 100000, 'portfolio': portfolio, 'transactions': transactions,
+        'round_submitted': False,
+        'experts': {expert: dict(data) for expert, data in EXPERTS.items()},
+        'prediction': None, 'players': players, 'show_success_message': False, 'rumors': [],
+        'leaderboard_updated': False, 'player_name': name,
+    }
+
+
+def compact_session(name, trades):
+    player = PlayerState(cash=100000, round_number=3)
+    player.name = name
+    for round_number, company, bought, sold, price in trades:
+        position = player.position(company)
+        position.shares += bought
+        position.total_spent += bought * price
+        player.transactions.append(round_number, company, bought, sold, price)
+        player.add_round_totals(bought * price, sold * price, round_number)
+    return {
+        'player': player, 'round_submitted': False, 'prediction': None,
+        'show_success_message': False, 'leaderboard_updated': False,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-session memory of the old and new session layouts")
+    parser.add_argument("--players", type=int, default=2000, help="players at the event (size of the leaderboard)")
+    parser.add_argument("--trades", type=int, default=30, help="trades per player")
+    parser.add_argument("--companies", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    companies = [f"Company {chr(ord('A') + i)}" for i in range(args.companies)]
+    names = [f"player{i:04d}" for i in range(args.players)]
+    # Standings live once in the shared leaderboard store; new sessions only add references to them
+    standings = {name: {"Net Worth (₹)": rng.randint(50000, 150000), "Round": 3} for name in names}
+    shared = [standings, *standings.values(), *standings.keys(), *companies, EXPERTS]
+    trades = simulate_trades(rng, companies, args.trades)
+
+    before = deep_sizeof(legacy_session(names[0], trades, standings), shared)
+    after = deep_sizeof(compact_session(names[0], trades), shared)
+    report = {
+        "players": args.players,
+        "trades_per_player": args.trades,
+        "session_bytes": {"before": before, "after": after},
+        "event_mb": {
+            "before": round(before * args.players / 2**20, 2),
+            "after": round(after * args.players / 2**20, 2),
+        },
+        "saved_percent": round(100 * (before - after) / before, 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,18 @@
 import streamlit as st
 import pandas as pd
 import random
-import os
+from game_config import EXPERTS
+from leaderboard_store import LeaderboardStore
+from player_state import PlayerState
 
 # Set page config as the first Streamlit command
 st.set_page_config(layout="wide")
 
 # Initialize session state variables
-if 'round' not in st.session_state:
-    st.session_state.round = 1
-if 'cash' not in st.session_state:
-    st.session_state.cash = 100000  # Starting cash in hand
-if 'portfolio' not in st.session_state:
-    st.session_state.portfolio = {}
-if 'transactions' not in st.session_state:
-    st.session_state.transactions = []
+if 'player' not in st.session_state:
+    st.session_state.player = PlayerState(cash=100000)  # Name, cash in hand, round, portfolio and trades
 if 'round_submitted' not in st.session_state:
     st.session_state.round_submitted = False
-if 'experts' not in st.session_state:
-    st.session_state.experts = {
-        "Expert 1": {"cost": 50000, "accuracy": 0.8},
-        "Expert 2": {"cost": 30000, "accuracy": 0.49},
-        "Expert 3": {"cost": 1000, "accuracy": 0.21}
-    }
 if 'prediction' not in st.session_state:
     st.session_state.prediction = None  # Initialize prediction in session state
 if 'players' not in st.session_state:
@@ -66,58 +56,45 @@ news_data = {
 # Function to buy shares
 def buy_shares(company, shares, current_price):
     total_cost = shares * current_price
-    if total_cost > st.session_state.cash:
+    if total_cost > st.session_state.player.cash:
         st.error("Not enough cash to buy these shares!")
     else:
-        if company not in st.session_state.portfolio:
-            st.session_state.portfolio[company] = {'shares': 0, 'total_spent': 0, 'total_received': 0}
-        
-        st.session_state.portfolio[company]['shares'] += shares
-        st.session_state.portfolio[company]['total_spent'] += total_cost
-        st.session_state.cash -= total_cost
-        st.session_state.transactions.append({
-            'round': st.session_state.round,
-            'company': company,
-            'shares_bought': shares,
-            'shares_sold': 0,
-            'price': current_price
-        })
+        position = st.session_state.player.position(company)
+        position.shares += shares
+        position.total_spent += total_cost
+        st.session_state.player.cash -= total_cost
+        st.session_state.player.log_trade(company, shares, 0, current_price)
         st.success(f"Successfully bought {shares} shares of {company}!")
         st.rerun()  # Force refresh to update the UI
 
 # Function to sell shares
 def sell_shares(company, shares, current_price):
-    if company not in st.session_state.portfolio or st.session_state.portfolio[company]['shares'] < shares:
+    if st.session_state.player.shares(company) < shares:
         st.error("You don't own enough shares to sell!")
     else:
         total_received = shares * current_price
-        st.session_state.portfolio[company]['shares'] -= shares
-        st.session_state.portfolio[company]['total_received'] += total_received
-        st.session_state.cash += total_received
-        st.session_state.transactions.append({
-            'round': st.session_state.round,
-            'company': company,
-            'shares_bought': 0,
-            'shares_sold': shares,
-            'price': current_price
-        })
+        position = st.session_state.player.portfolio[company]
+        position.shares -= shares
+        position.total_received += total_received
+        st.session_state.player.cash += total_received
+        st.session_state.player.log_trade(company, 0, shares, current_price)
         st.success(f"Successfully sold {shares} shares of {company}!")
         st.rerun()  # Force refresh to update the UI
 
 # Function to get expert prediction
 def get_expert_prediction(expert):
-    if expert not in st.session_state.experts:
+    if expert not in EXPERTS:
         return "Invalid expert selected."
 
     # Deduct the cost from the user's cash
-    cost = st.session_state.experts[expert]["cost"]
-    if st.session_state.cash < cost:
+    cost = EXPERTS[expert]["cost"]
+    if st.session_state.player.cash < cost:
         return "Not enough cash to pay the expert!"
 
-    st.session_state.cash -= cost  # Deduct the cost immediately
+    st.session_state.player.cash -= cost  # Deduct the cost immediately
 
     # Generate a prediction based on the expert's accuracy
-    accuracy = st.session_state.experts[expert]["accuracy"]
+    accuracy = EXPERTS[expert]["accuracy"]
     if random.random() < accuracy:
         # Correct prediction
         prediction = f"{expert}'s prediction: The stock prices will rise in the next round!"
@@ -129,31 +106,35 @@ def get_expert_prediction(expert):
 
 # Function to calculate net worth
 def calculate_net_worth():
-    current_prices = companies[f"Round {st.session_state.round}"]
-    networth = st.session_state.cash
-    for company, data in st.session_state.portfolio.items():
+    current_prices = companies[f"Round {st.session_state.player.round}"]
+    networth = st.session_state.player.cash
+    for company, position in st.session_state.player.portfolio.items():
         current_price = current_prices.get(company, 0)  # Get current price or 0 if delisted
-        networth += data['shares'] * current_price
+        networth += position.shares * current_price
     return networth
 
-# Function to save leaderboard to CSV
+# Shared leaderboard store (one per server process, reused across sessions and reruns)
+@st.cache_resource
+def get_leaderboard_store():
+    return LeaderboardStore("leaderboard.csv")
+
+# Function to append the current player's net worth to the leaderboard journal
 def save_leaderboard():
-    leaderboard_df = pd.DataFrame(list(st.session_state.players.items()), columns=["Player", "Net Worth (₹)"])
-    leaderboard_df = leaderboard_df.sort_values(by="Net Worth (₹)", ascending=False)
-    leaderboard_df.to_csv("leaderboard.csv", index=False)
+    player = st.session_state.player.name
+    get_leaderboard_store().record(player, st.session_state.players[player], st.session_state.player.round)
 
 # Function to load leaderboard from CSV
 def load_leaderboard():
-    if os.path.exists("leaderboard.csv"):
-        try:
-            leaderboard_df = pd.read_csv("leaderboard.csv")
-            if not leaderboard_df.empty:  # Check if the file is not empty
-                for _, row in leaderboard_df.iterrows():
-                    st.session_state.players[row["Player"]] = row["Net Worth (₹)"]
-        except pd.errors.EmptyDataError:
-            st.warning("Leaderboard file is empty. Starting with a fresh leaderboard.")
-    else:
+    store = get_leaderboard_store()
+    store.refresh()
+    if not store.exists():
         st.warning("Leaderboard file not found. Starting with a fresh leaderboard.")
+    elif store.is_empty():
+        st.warning("Leaderboard file is empty. Starting with a fresh leaderboard.")
+    # Only merge when the file changed since this session last looked at it
+    if st.session_state.get('leaderboard_version') != store.version:
+        st.session_state.players.update(store.net_worths())
+        st.session_state.leaderboard_version = store.version
 
 # Load leaderboard data at the start
 load_leaderboard()
@@ -162,21 +143,21 @@ load_leaderboard()
 st.title("F&IC LUCERIUM 2025")
 
 # Player registration
-if 'player_name' not in st.session_state:
+if st.session_state.player.name is None:
     player_name = st.text_input("Enter your name to join the competition:")
     if st.button("Register"):
         if player_name:
-            st.session_state.player_name = player_name
+            st.session_state.player.name = player_name
             st.session_state.players[player_name] = 0  # Initialize net worth to 0
             st.success(f"Welcome, {player_name}!")
             st.rerun()
 else:
     st.sidebar.title("F&IC LUCERIUM 2025")
-    st.sidebar.subheader(f"Cash in Hand (₹): {st.session_state.cash}")
+    st.sidebar.subheader(f"Cash in Hand (₹): {st.session_state.player.cash}")
 
     # Trade Shares section
     st.sidebar.subheader("Trade Shares")
-    current_prices = companies[f"Round {st.session_state.round}"]
+    current_prices = companies[f"Round {st.session_state.player.round}"]
     company_selected = st.sidebar.selectbox("Select Company", list(current_prices.keys()))
     shares = st.sidebar.number_input(f"Number of shares for {company_selected}", min_value=0, key=f"shares_{company_selected}")
 
@@ -190,7 +171,7 @@ else:
             sell_shares(company_selected, shares, current_prices[company_selected])
 
     # Proceed to Next Round section
-    st.sidebar.subheader(f"Round {st.session_state.round} Password: `{round_passwords[st.session_state.round]}`")
+    st.sidebar.subheader(f"Round {st.session_state.player.round} Password: `{round_passwords[st.session_state.player.round]}`")
     st.sidebar.subheader("Proceed to Next Round")
     password = st.sidebar.text_input("Enter Password to Proceed to Next Round", type="password")
     confirmation = st.sidebar.checkbox("I hereby confirm this.")
@@ -199,20 +180,14 @@ else:
     if st.sidebar.button("Submit Round"):
         if not confirmation:
             st.sidebar.error("Please confirm by checking the box above.")
-        elif password == round_passwords[st.session_state.round]:  # Use the password from the dictionary
-            if st.session_state.round < 3:
+        elif password == round_passwords[st.session_state.player.round]:  # Use the password from the dictionary
+            if st.session_state.player.round < 3:
                 # Update round and reset session state for the next round
-                st.session_state.round += 1
+                st.session_state.player.round += 1
                 st.session_state.round_submitted = False
                 st.session_state.prediction = None  # Clear prediction for the new round
                 st.session_state.show_success_message = True  # Set flag to show success message
 
-                # Force recalculation of portfolio data
-                current_prices = companies[f"Round {st.session_state.round}"]
-                for company, data in st.session_state.portfolio.items():
-                    if data['shares'] > 0:
-                        data['networth'] = data['shares'] * current_prices.get(company, 0)
-
                 st.rerun()  # Force a rerun to update the UI instantly
             else:
                 st.sidebar.error("All rounds completed!")
@@ -221,7 +196,7 @@ else:
 
     # Display success message after round submission
     if st.session_state.show_success_message:
-        st.sidebar.success(f"Round {st.session_state.round - 1} submitted successfully! Now play the next round {st.session_state.round}.")
+        st.sidebar.success(f"Round {st.session_state.player.round - 1} submitted successfully! Now play the next round {st.session_state.player.round}.")
         st.session_state.show_success_message = False  # Reset the flag after displaying the message
 
     # Calculator in the sidebar
@@ -249,8 +224,8 @@ else:
 
     # Expert Tips section
     st.sidebar.subheader("Get Expert Tips")
-    expert_selected = st.sidebar.selectbox("Select an Expert", list(st.session_state.experts.keys()))
-    expert_cost = st.session_state.experts[expert_selected]["cost"]
+    expert_selected = st.sidebar.selectbox("Select an Expert", list(EXPERTS.keys()))
+    expert_cost = EXPERTS[expert_selected]["cost"]
     st.sidebar.write(f"Cost: ₹{expert_cost}")
 
     # Button to get expert prediction
@@ -262,14 +237,14 @@ else:
     # Display prediction if it exists
     if 'prediction' in st.session_state and st.session_state.prediction:
         st.sidebar.success(f"**Prediction:** {st.session_state.prediction}")  # Display prediction prominently
-        st.sidebar.write(f"Remaining Cash: ₹{st.session_state.cash}")
+        st.sidebar.write(f"Remaining Cash: ₹{st.session_state.player.cash}")
 
     # Main content area
-    st.header(f"Round {st.session_state.round}")
+    st.header(f"Round {st.session_state.player.round}")
 
     # Display news articles for the current round
     st.subheader("News for This Round")
-    for news in news_data[f"Round {st.session_state.round}"]:
+    for news in news_data[f"Round {st.session_state.player.round}"]:
         st.write(f"- {news}")
 
     # Create two columns for Current Stock Prices and Transaction Summary
@@ -284,13 +259,10 @@ else:
     # Display Transaction Summary in a table (right column)
     with col2:
         st.subheader("Transaction Summary")
-        current_round_transactions = [t for t in st.session_state.transactions if t['round'] == st.session_state.round]
-
-        # Calculate total spent (only from buying shares)
-        current_round_spent = sum(t['shares_bought'] * t['price'] for t in current_round_transactions)
-
-        # Calculate total received (only from selling shares)
-        current_round_received = sum(t['shares_sold'] * t['price'] for t in current_round_transactions)
+        # Running totals of the round, kept up to date by every trade
+        totals = st.session_state.player.round_totals.get(st.session_state.player.round, {'spent': 0, 'received': 0})
+        current_round_spent = totals['spent']
+        current_round_received = totals['received']
 
         # Calculate net cash flow for the round
         net_cash_flow = current_round_received - current_round_spent
@@ -310,13 +282,13 @@ else:
     total_networth = 0
 
     # Only include companies with shares owned
-    for company, data in st.session_state.portfolio.items():
-        if data['shares'] > 0:  # Only include companies with shares owned
+    for company, position in st.session_state.player.portfolio.items():
+        if position.shares > 0:  # Only include companies with shares owned
             current_price = current_prices.get(company, 0)  # Get current price or 0 if delisted
-            networth = data['shares'] * current_price
-            table_data.append([company, current_price, data['shares'], data['total_spent'], data['total_received'], networth])
-            total_spent += data['total_spent']
-            total_received += data['total_received']
+            networth = position.shares * current_price
+            table_data.append([company, current_price, position.shares, position.total_spent, position.total_received, networth])
+            total_spent += position.total_spent
+            total_received += position.total_received
             total_networth += networth
 
     # Display table only if there are transactions
@@ -328,7 +300,7 @@ else:
         st.write("No shares owned in the current round.")
 
     # Update player's net worth in the leaderboard
-    st.session_state.players[st.session_state.player_name] = calculate_net_worth()
+    st.session_state.players[st.session_state.player.name] = calculate_net_worth()
 
     # Display leaderboard
     st.subheader("Leaderboard")
@@ -336,10 +308,10 @@ else:
     leaderboard_df = leaderboard_df.sort_values(by="Net Worth (₹)", ascending=False)
     st.table(leaderboard_df)
 
-    # Save leaderboard to CSV every second
+    # Record net worth in the leaderboard journal (no-op when unchanged)
     save_leaderboard()
 
     # Final winner announcement
-    if st.session_state.round == 3 and password == round_passwords[st.session_state.round]:
+    if st.session_state.player.round == 3 and password == round_passwords[st.session_state.player.round]:
         st.success("Competition completed! The winner is the one with the highest net worth.")
         save_leaderboard()  # Save leaderboard data to CSV
@@ -0,0 +1,263 @@
+import heapq
+import itertools
+import queue
+import threading
+from collections import deque
+
+BUY = "buy"
+SELL = "sell"
+
+
+class Order:
+    __slots__ = ("order_id", "player", "ticker", "side", "price", "quantity", "remaining", "seq", "active")
+
+    def __init__(self, order_id, player, ticker, side, price, quantity, seq):
+        self.order_id = order_id
+        self.player = player
+        self.ticker = ticker
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.remaining = quantity
+        self.seq = seq
+        self.active = True
+
+
+# What the engine reports back to a player: a fill, or an order that left the book unfilled
+class OrderEvent:
+    __slots__ = ("kind", "order_id", "ticker", "side", "limit_price", "price", "quantity")
+
+    def __init__(self, kind, order, price, quantity):
+        self.kind = kind
+        self.order_id = order.order_id
+        self.ticker = order.ticker
+        self.side = order.side
+        self.limit_price = order.price
+        self.price = price
+        self.quantity = quantity
+
+
+# Cash and shares of event.ticker an event hands to its player: a cancellation returns the
+# reservation, a buy fill delivers shares (and the difference to the limit price), a sell fill cash
+def settlement(event):
+    if event.kind == "cancelled":
+        return (event.price * event.quantity, 0) if event.side == BUY else (0, event.quantity)
+    if event.side == BUY:
+        return (event.limit_price - event.price) * event.quantity, event.quantity
+    return event.price * event.quantity, 0
+
+
+# Cancellation of a player's saved open order (order id, ticker, side, limit price, remaining) that no
+# order book holds any more (the process restarted): the event that hands its reservation back
+def cancellation(player, order):
+    order_id, ticker, side, price, remaining = order
+    return OrderEvent("cancelled", Order(order_id, player, ticker, side, price, remaining, order_id), price, remaining)
+
+
+# Limit order book of one ticker with price-time priority
+#
+# Bids and asks are heaps keyed on (price, arrival sequence), so the best
+# price level comes out first and orders at the same price fill in FIFO
+# order. Inserts are O(log n). Cancels only mark the order inactive (O(1));
+# inactive orders are dropped when they reach the top of the heap.
+class OrderBook:
+    def __init__(self, ticker):
+        self.ticker = ticker
+        self._bids = []
+        self._asks = []
+        self._levels = {BUY: {}, SELL: {}}
+
+    def _top(self, heap):
+        while heap and not heap[0][2].active:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def best_bid(self):
+        order = self._top(self._bids)
+        return order.price if order else None
+
+    def best_ask(self):
+        order = self._top(self._asks)
+        return order.price if order else None
+
+    def _change_level(self, side, price, quantity):
+        levels = self._levels[side]
+        levels[price] = levels.get(price, 0) + quantity
+        if levels[price] <= 0:
+            del levels[price]
+
+    # Match an incoming order against the other side, then rest what is left; returns fills
+    def add(self, order):
+        fills = []
+        if order.side == BUY:
+            opposite, crosses = self._asks, lambda best: best.price <= order.price
+        else:
+            opposite, crosses = self._bids, lambda best: best.price >= order.price
+        while order.remaining:
+            best = self._top(opposite)
+            if best is None or not crosses(best):
+                break
+            quantity = min(order.remaining, best.remaining)
+            best.remaining -= quantity
+            order.remaining -= quantity
+            self._change_level(best.side, best.price, -quantity)
+            fills.append((best, best.price, quantity))
+            if not best.remaining:
+                best.active = False
+                heapq.heappop(opposite)
+        if order.remaining:
+            if order.side == BUY:
+                heapq.heappush(self._bids, (-order.price, order.seq, order))
+            else:
+                heapq.heappush(self._asks, (order.price, order.seq, order))
+            self._change_level(order.side, order.price, order.remaining)
+        else:
+            order.active = False
+        return fills
+
+    def cancel(self, order):
+        if not order.active:
+            return False
+        order.active = False
+        self._change_level(order.side, order.price, -order.remaining)
+        return True
+
+    # Best `levels` price levels per side as [(price, quantity), ...]
+    def depth(self, levels=5):
+        bids = sorted(self._levels[BUY].items(), reverse=True)[:levels]
+        asks = sorted(self._levels[SELL].items())[:levels]
+        return bids, asks
+
+
+# Order books of every ticker, shared by all sessions of the app
+#
+# Sessions only enqueue requests (submit/cancel); one background thread applies
+# them to the books in arrival order, so matching never races. Fills and
+# cancellations are delivered to per-player inboxes, which each session drains
+# on its next rerun to update its own cash, portfolio and transaction log.
+class MatchingEngine:
+    def __init__(self):
+        self._books = {}
+        self._orders = {}
+        self._open = {}
+        self._inboxes = {}
+        self._ids = itertools.count(1)
+        self._requests = queue.SimpleQueue()
+        self._state_lock = threading.Lock()
+        self._processed = threading.Condition()
+        self._submitted = 0
+        self._done = 0
+        self._thread = threading.Thread(target=self._run, name="matching-engine", daemon=True)
+        self._thread.start()
+
+    def book(self, ticker):
+        book = self._books.get(ticker)
+        if book is None:
+            book = self._books[ticker] = OrderBook(ticker)
+        return book
+
+    def submit(self, player, ticker, side, price, quantity):
+        if side not in (BUY, SELL):
+            raise ValueError(f"Unknown order side: {side}")
+        if quantity <= 0 or price <= 0:
+            raise ValueError("Order price and quantity must be positive")
+        order_id = next(self._ids)
+        self._enqueue(("submit", order_id, player, ticker, side, price, quantity))
+        return order_id
+
+    # Cancel a player's resting order; orders of other players are left alone
+    def cancel(self, order_id, player):
+        self._enqueue(("cancel", order_id, player))
+
+    # Cancel every resting order of a player, or of everyone
+    def cancel_all(self, player=None):
+        self._enqueue(("cancel_all", player))
+
+    def _enqueue(self, request):
+        with self._processed:
+            self._submitted += 1
+        self._requests.put(request)
+
+    # Block until every request enqueued so far has been applied (or the timeout expires)
+    def sync(self, timeout=1.0):
+        with self._processed:
+            target = self._submitted
+            return self._processed.wait_for(lambda: self._done >= target, timeout)
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            with self._state_lock:
+                self._apply(request)
+            with self._processed:
+                self._done += 1
+                self._processed.notify_all()
+
+    def _deliver(self, player, event):
+        inbox = self._inboxes.get(player)
+        if inbox is None:
+            inbox = self._inboxes[player] = deque()
+        inbox.append(event)
+
+    def _close(self, order):
+        self._orders.pop(order.order_id, None)
+        self._open.get(order.player, {}).pop(order.order_id, None)
+
+    def _cancel(self, order):
+        if self._books[order.ticker].cancel(order):
+            self._deliver(order.player, OrderEvent("cancelled", order, order.price, order.remaining))
+            self._close(order)
+
+    def _apply(self, request):
+        if request[0] == "cancel":
+            _, order_id, player = request
+            order = self._orders.get(order_id)
+            if order is not None and order.player == player:
+                self._cancel(order)
+            return
+        if request[0] == "cancel_all":
+            player = request[1]
+            orders = self._orders.values() if player is None else self._open.get(player, {}).values()
+            for order in list(orders):
+                self._cancel(order)
+            return
+        _, order_id, player, ticker, side, price, quantity = request
+        order = Order(order_id, player, ticker, side, price, quantity, order_id)
+        for resting, fill_price, fill_quantity in self.book(ticker).add(order):
+            self._deliver(resting.player, OrderEvent("fill", resting, fill_price, fill_quantity))
+            self._deliver(player, OrderEvent("fill", order, fill_price, fill_quantity))
+            if not resting.active:
+                self._close(resting)
+        if order.active:
+            self._orders[order_id] = order
+            self._open.setdefault(player, {})[order_id] = order
+
+    # Take every event waiting for a player (oldest first)
+    def drain(self, player):
+        inbox = self._inboxes.get(player)
+        events = []
+        while inbox:
+            events.append(inbox.popleft())
+        return events
+
+    # Events waiting for a player, without taking them
+    def pending(self, player):
+        with self._state_lock:
+            return list(self._inboxes.get(player, ()))
+
+    # Ids of a player's orders this engine still has: resting, or with events waiting to be drained
+    def order_ids(self, player):
+        with self._state_lock:
+            return set(self._open.get(player, {})) | {event.order_id for event in self._inboxes.get(player, ())}
+
+    # A player's resting orders as (order_id, ticker, side, price, remaining)
+    def open_orders(self, player):
+        with self._state_lock:
+            return [
+                (order.order_id, order.ticker, order.side, order.price, order.remaining)
+                for order in self._open.get(player, {}).values()
+            ]
+
+    def depth(self, ticker, levels=5):
+        with self._state_lock:
+            return self.book(ticker).depth(levels)
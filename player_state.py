@@ -0,0 +1,99 @@
+import sys
+
+import numpy as np
+
+from ledger import TransactionLedger
+
+
+# One holding of a player: shares owned and the cash that went in and came out
+class Position:
+    __slots__ = ("shares", "total_spent", "total_received")
+
+    def __init__(self, shares=0, total_spent=0, total_received=0):
+        self.shares = shares
+        self.total_spent = total_spent
+        self.total_received = total_received
+
+    def __repr__(self):
+        return f"Position(shares={self.shares}, total_spent={self.total_spent}, total_received={self.total_received})"
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self.as_tuple() == other.as_tuple()
+
+    def as_tuple(self):
+        return (self.shares, self.total_spent, self.total_received)
+
+
+# Everything one session knows about its player
+#
+# Replaces the loose session_state keys (cash, round, portfolio, ...) with one
+# object without a per-instance __dict__. Constant game configuration (experts,
+# passwords, prices, news) is not copied in here; sessions share module-level
+# singletons for those.
+class PlayerState:
+    __slots__ = ("name", "cash", "round", "portfolio", "transactions", "round_totals", "net_worth")
+
+    def __init__(self, cash=100000, round_number=1):
+        self.name = None
+        self.cash = cash
+        self.round = round_number
+        self.portfolio = {}
+        self.transactions = TransactionLedger()
+        self.round_totals = {}
+        self.net_worth = 0
+
+    # Position in a company, created empty on first use
+    def position(self, company):
+        position = self.portfolio.get(company)
+        if position is None:
+            position = self.portfolio[company] = Position()
+        return position
+
+    def shares(self, company):
+        position = self.portfolio.get(company)
+        return position.shares if position is not None else 0
+
+    # Add a trade to the running totals of the current round
+    def add_round_totals(self, spent, received, round_number=None):
+        totals = self.round_totals.setdefault(
+            self.round if round_number is None else round_number, {'spent': 0, 'received': 0, 'trades': 0}
+        )
+        totals['spent'] += spent
+        totals['received'] += received
+        totals['trades'] += 1
+
+    # Record a trade in the ledger and the round totals
+    def log_trade(self, company, shares_bought, shares_sold, price):
+        self.transactions.append(self.round, company, shares_bought, shares_sold, price)
+        self.add_round_totals(shares_bought * price, shares_sold * price)
+
+
+# Approximate bytes held by an object graph, counting every object once
+#
+# Follows dicts, lists, tuples, sets, __dict__ and __slots__. NumPy arrays count
+# their buffers; objects listed in `shared` (module-level singletons) are skipped.
+def deep_sizeof(obj, shared=()):
+    seen = {id(item) for item in shared}
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            total += sys.getsizeof(item) + (item.nbytes if item.base is None else 0)
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        if hasattr(item, "__dict__") and not isinstance(item, type):
+            stack.append(vars(item))
+        for cls in type(item).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
@@ -0,0 +1,110 @@
+import hashlib
+import threading
+
+import numpy as np
+
+RISE = 1
+FLAT = 0
+FALL = -1
+DIRECTION_WORDS = {RISE: "rise", FLAT: "stay flat", FALL: "fall"}
+
+
+# Stable 64-bit number for a player name (Python's hash() changes between processes)
+def _player_key(player):
+    return int.from_bytes(hashlib.blake2b(str(player).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# Direction of every ticker's move from a round to the next: RISE, FLAT or FALL
+#
+# A ticker delisted in the next round counts as a fall (its shares are worth
+# nothing); tickers not listed this round get FLAT and are never predicted.
+def next_round_directions(market, round_number):
+    current = market.round_prices(round_number)
+    following = np.nan_to_num(market.round_prices(round_number + 1), nan=0.0)
+    directions = np.sign(np.nan_to_num(following - current, nan=0.0)).astype(np.int8)
+    directions[np.isnan(current)] = FLAT
+    return directions
+
+
+# Expert predictions tied to the real next-round price moves
+#
+# Each expert is right about a ticker with probability equal to its accuracy:
+# a right call names the actual direction, a wrong one names one of the other
+# two. Draws come from a numpy Generator seeded with (event seed, round,
+# player), so an organiser can replay any prediction a player was shown.
+# Predictions for a whole round are computed in one batch: players x experts x
+# tickers at once, once per round (prepare_batch); asking for one afterwards is
+# a dictionary lookup.
+class PredictionEngine:
+    def __init__(self, market, experts, event_seed):
+        self.market = market
+        self.experts = list(experts)
+        self.accuracy = np.array([experts[expert]["accuracy"] for expert in self.experts], dtype=np.float64)
+        self.event_seed = event_seed
+        self._rounds = {}
+        self._batched = set()
+        self._lock = threading.Lock()
+
+    def _generator(self, round_number, player):
+        return np.random.default_rng([self.event_seed, round_number, _player_key(player)])
+
+    def has_next_round(self, round_number):
+        return round_number < self.market.n_rounds
+
+    # Compute (and keep) the predictions of every expert for these players in one go;
+    # returns {player: experts x tickers array of directions}
+    def prepare_round(self, round_number, players):
+        if not self.has_next_round(round_number):
+            return {}
+        with self._lock:
+            cached = self._rounds.setdefault(round_number, {})
+            missing = [player for player in dict.fromkeys(players) if player not in cached]
+            if missing:
+                truth = next_round_directions(self.market, round_number)
+                shape = (len(self.experts), len(self.market.tickers))
+                # Two uniforms per (expert, ticker): one decides right or wrong, one picks the wrong direction
+                draws = np.stack([self._generator(round_number, player).random((2, *shape)) for player in missing])
+                correct = draws[:, 0] < self.accuracy[None, :, None]
+                wrong = (truth + 1 + np.where(draws[:, 1] < 0.5, 1, 2)) % 3 - 1
+                predictions = np.where(correct, truth, wrong).astype(np.int8)
+                for player, prediction in zip(missing, predictions):
+                    cached[player] = prediction
+            return {player: cached[player] for player in players}
+
+    # prepare_round() for a round's whole field the first time there is one; False when it already was
+    def prepare_batch(self, round_number, players):
+        if round_number in self._batched:
+            return False
+        players = list(players)
+        if not players:
+            return False
+        self.prepare_round(round_number, players)
+        with self._lock:
+            self._batched.add(round_number)
+        return True
+
+    # {ticker: direction} one expert predicts for a player, over the tickers listed this round
+    def predict(self, round_number, player, expert):
+        prediction = self.prepare_round(round_number, [player]).get(player)
+        if prediction is None:
+            return {}
+        row = prediction[self.experts.index(expert)]
+        return {ticker: int(row[self.market.ticker_id(ticker)]) for ticker in self.market.listed(round_number)}
+
+    # Every prediction prepared for a round, one row per (player, expert, ticker), for audits
+    def audit(self, round_number):
+        truth = next_round_directions(self.market, round_number)
+        with self._lock:
+            prepared = dict(self._rounds.get(round_number, {}))
+        rows = []
+        for player, prediction in prepared.items():
+            for expert_id, expert in enumerate(self.experts):
+                for ticker in self.market.listed(round_number):
+                    ticker_id = self.market.ticker_id(ticker)
+                    rows.append((player, expert, ticker, int(prediction[expert_id, ticker_id]), int(truth[ticker_id])))
+        return rows
+
+
+# One sentence for the player, e.g. "Company A will rise, Company B will fall"
+def describe(prediction):
+    return ", ".join(f"{ticker} will {DIRECTION_WORDS[direction]}" for ticker, direction in prediction.items())
@@ -0,0 +1,115 @@
+import re
+
+import numpy as np
+
+# Headline words that move the drift of the companies a headline names
+POSITIVE_WORDS = frozenset((
+    "record", "profit", "profits", "surge", "surges", "gain", "gains", "growth", "resolves", "confidence",
+    "launch", "launches", "partnership", "beats", "rally", "rallies", "upgrade", "wins",
+))
+NEGATIVE_WORDS = frozenset((
+    "scrutiny", "decline", "declines", "drop", "drops", "loss", "losses", "delisted", "unexpected", "mixed",
+    "downgrade", "fraud", "lawsuit", "misses", "falls", "cuts", "probe",
+))
+
+
+# Sentiment of one headline in [-1, 1]: positive minus negative words, capped
+def headline_sentiment(headline):
+    words = re.findall(r"[a-z]+", headline.lower())
+    score = sum(word in POSITIVE_WORDS for word in words) - sum(word in NEGATIVE_WORDS for word in words)
+    return max(-1.0, min(1.0, float(score)))
+
+
+# Rounds x tickers matrix of news sentiment from {"Round 1": [headline, ...], ...}
+#
+# A headline counts for every ticker it names; one that names no ticker is
+# market news and counts for all of them. Each cell is the mean over the
+# headlines that count for it (0 without any).
+def news_sentiment(market, news):
+    total = np.zeros((market.n_rounds, len(market.tickers)))
+    count = np.zeros_like(total)
+    for round_label, headlines in news.items():
+        round_number = int(str(round_label).replace("Round", "").strip())
+        if not 1 <= round_number <= market.n_rounds:
+            continue
+        for headline in headlines:
+            named = [i for i, ticker in enumerate(market.tickers) if ticker.lower() in headline.lower()]
+            ids = named or list(range(len(market.tickers)))
+            total[round_number - 1, ids] += headline_sentiment(headline)
+            count[round_number - 1, ids] += 1
+    return np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+
+
+# Live prices inside each round, simulated once for the whole event
+#
+# Every listed ticker follows geometric Brownian motion with Poisson jumps from
+# its round price (the scenario price is the round's open) for `round_seconds`
+# seconds in `ticks` steps. The drift over a round is news_drift times the news
+# sentiment of that round and ticker; volatility and jumps are per round too.
+# All rounds and tickers are drawn in one vectorised pass from a Generator
+# seeded with the event seed, so the same event always sees the same paths.
+# The result is a rounds x (ticks + 1) x tickers array: the price at time t is
+# one index computation and an array read. Prices stop at the last tick when a
+# round runs over; unlisted tickers stay NaN.
+class PricePaths:
+    def __init__(self, market, news, event_seed, round_seconds=600, ticks=600, volatility=0.04,
+                 news_drift=0.03, jump_rate=2.0, jump_mean=0.0, jump_std=0.02):
+        self.market = market
+        self.round_seconds = float(round_seconds)
+        self.ticks = int(ticks)
+        self.ticks_per_second = self.ticks / self.round_seconds if self.round_seconds > 0 else 0.0
+        self.sentiment = news_sentiment(market, news)
+
+        rng = np.random.default_rng([event_seed, 0x70617468])
+        shape = (market.n_rounds, self.ticks, len(market.tickers))
+        dt = 1.0 / self.ticks
+        # Drift of log prices so that a round's expected move is news_drift x sentiment, jumps included
+        jump_compensation = jump_rate * (np.exp(jump_mean + 0.5 * jump_std ** 2) - 1.0)
+        drift = news_drift * self.sentiment - 0.5 * volatility ** 2 - jump_compensation
+        jumps = rng.poisson(jump_rate * dt, shape)
+        increments = drift[:, None, :] * dt + volatility * np.sqrt(dt) * rng.standard_normal(shape)
+        # The sum of n normal jump sizes is one normal with n times the mean and sqrt(n) times the spread
+        increments += jumps * jump_mean + np.sqrt(jumps) * jump_std * rng.standard_normal(shape)
+        log_moves = np.concatenate([np.zeros((shape[0], 1, shape[2])), np.cumsum(increments, axis=1)], axis=1)
+        paths = market.prices[:, None, :] * np.exp(log_moves)
+        self.paths = np.round(paths) if market.whole_prices else np.round(paths, 2)
+        self.paths.setflags(write=False)
+
+    def _scalar(self, price):
+        if np.isnan(price):
+            return None
+        return int(price) if self.market.whole_prices else float(price)
+
+    # Tick index of t seconds into a round
+    def tick(self, seconds):
+        return min(max(int(seconds * self.ticks_per_second), 0), self.ticks)
+
+    # Price of one ticker id t seconds into a round, None if it is not listed
+    def price_at(self, round_number, ticker_id, seconds):
+        return self._scalar(self.paths[round_number - 1, self.tick(seconds), ticker_id])
+
+    def price_of(self, round_number, ticker, seconds):
+        ticker_id = self.market.ticker_id(ticker)
+        if ticker_id is None:
+            return None
+        return self.price_at(round_number, ticker_id, seconds)
+
+    # All prices of a round t seconds in (NaN where not listed)
+    def prices_at(self, round_number, seconds):
+        return self.paths[round_number - 1, self.tick(seconds)]
+
+    # Prices of one ticker id from the round's open up to t seconds, for charts
+    def history(self, round_number, ticker_id, seconds):
+        return self.paths[round_number - 1, :self.tick(seconds) + 1, ticker_id]
+
+
+# Price source for GameEngine that reads the live paths
+#
+# `elapsed` maps a round number to the seconds since that round opened.
+class LiveQuotes:
+    def __init__(self, paths, elapsed):
+        self.paths = paths
+        self.elapsed = elapsed
+
+    def price_of(self, round_number, ticker):
+        return self.paths.price_of(round_number, ticker, self.elapsed(round_number))
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+
+# Timing histogram of one instrumented phase
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    # Upper bound of the bucket holding the q-th quantile
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+# Process-wide timing registry shared by every session
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._last_dump = 0.0
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds * 1000)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    # One summary row per phase, slowest total first
+    def summary(self):
+        with self._lock:
+            rows = [
+                {
+                    "Phase": name,
+                    "Calls": h.count,
+                    "Total (ms)": round(h.total_ms, 2),
+                    "Mean (ms)": round(h.total_ms / h.count, 3) if h.count else 0.0,
+                    "p50 (ms)": round(h.quantile(0.5), 3),
+                    "p95 (ms)": round(h.quantile(0.95), 3),
+                    "Max (ms)": round(h.max_ms, 3),
+                }
+                for name, h in self._histograms.items()
+            ]
+        return sorted(rows, key=lambda row: row["Total (ms)"], reverse=True)
+
+    def to_json(self):
+        with self._lock:
+            data = {
+                name: {
+                    "count": h.count,
+                    "sum_ms": h.total_ms,
+                    "max_ms": h.max_ms,
+                    "buckets_ms": [[str(bound), count] for bound, count in zip(BUCKETS_MS, h.counts)],
+                }
+                for name, h in self._histograms.items()
+            }
+        return json.dumps({"generated_at": time.time(), "phases": data}, indent=2)
+
+    # Prometheus text exposition format, one histogram labelled by phase
+    def to_prometheus(self):
+        lines = [
+            "# HELP mockstock_phase_seconds Time spent in each app phase.",
+            "# TYPE mockstock_phase_seconds histogram",
+        ]
+        with self._lock:
+            for name, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS_MS, h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound / 1000)
+                    lines.append(f'mockstock_phase_seconds_bucket{{phase="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'mockstock_phase_seconds_sum{{phase="{name}"}} {h.total_ms / 1000}')
+                lines.append(f'mockstock_phase_seconds_count{{phase="{name}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    # Write a .json or Prometheus text (any other extension) dump, replacing the file atomically
+    def dump(self, path):
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        self._last_dump = time.monotonic()
+
+    # Dump at most once every `interval` seconds; cheap to call on every rerun
+    def maybe_dump(self, path, interval=10.0):
+        if path and time.monotonic() - self._last_dump >= interval:
+            self.dump(path)
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def timer(name, registry=REGISTRY):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start)
+
+
+# Decorator version of timer(), named after the function unless given a name
+def timed(name=None, registry=REGISTRY):
+    def decorator(func):
+        phase = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(phase, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# Times consecutive sections of a script run without re-indenting them:
+# each lap() records the time since the previous lap under "<prefix>.<name>"
+class LapTimer:
+    def __init__(self, prefix, registry=REGISTRY):
+        self.prefix = prefix
+        self.registry = registry
+        self.started = self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.registry.observe(f"{self.prefix}.{name}", now - self._last)
+        self._last = now
+
+    def finish(self, name="total"):
+        self.registry.observe(f"{self.prefix}.{name}", time.perf_counter() - self.started)
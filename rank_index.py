@@ -0,0 +1,150 @@
+import random
+
+MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ("key", "player", "net_worth", "next", "width")
+
+    def __init__(self, key, player, net_worth, level):
+        self.key = key
+        self.player = player
+        self.net_worth = net_worth
+        self.next = [None] * level
+        self.width = [1] * level
+
+
+# Leaderboard ranking kept in an indexable skip list
+#
+# Players are ordered by net worth (highest first, ties by name). Every link
+# stores how many positions it skips, so an update, a player's rank and the
+# player at a given rank are all O(log n), and the top k are read in O(k)
+# by walking the bottom level.
+class RankIndex:
+    def __init__(self, seed=None):
+        self._head = _Node(None, None, None, MAX_LEVEL)
+        self._head.width = [0] * MAX_LEVEL
+        self._level = 1
+        self._keys = {}
+        self._random = random.Random(seed)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, player):
+        return player in self._keys
+
+    @staticmethod
+    def _key(player, net_worth):
+        return (-net_worth, player)
+
+    def _random_level(self):
+        level = 1
+        while level < MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    # Last node before `key` on every level, and the rank (0-based) of each of those nodes
+    def _path(self, key):
+        update = [self._head] * MAX_LEVEL
+        ranks = [0] * MAX_LEVEL
+        node = self._head
+        position = 0
+        for level in range(self._level - 1, -1, -1):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            update[level] = node
+            ranks[level] = position
+        return update, ranks
+
+    def _insert(self, player, net_worth):
+        key = self._key(player, net_worth)
+        update, ranks = self._path(key)
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                update[i] = self._head
+                ranks[i] = 0
+                self._head.width[i] = len(self._keys)
+            self._level = level
+        node = _Node(key, player, net_worth, level)
+        position = ranks[0] + 1
+        for i in range(level):
+            previous = update[i]
+            node.next[i] = previous.next[i]
+            previous.next[i] = node
+            skipped = position - ranks[i]
+            node.width[i] = previous.width[i] - skipped + 1
+            previous.width[i] = skipped
+        for i in range(level, self._level):
+            update[i].width[i] += 1
+        self._keys[player] = key
+
+    def _delete(self, key):
+        update, _ = self._path(key)
+        node = update[0].next[0]
+        for i in range(self._level):
+            if update[i].next[i] is node:
+                update[i].width[i] += node.width[i] - 1
+                update[i].next[i] = node.next[i]
+            else:
+                update[i].width[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._head.width[self._level - 1] = 0
+            self._level -= 1
+
+    # Insert a player or move them to a new net worth
+    def update(self, player, net_worth):
+        key = self._keys.get(player)
+        if key is not None:
+            if key[0] == -net_worth:
+                return
+            self._delete(key)
+        self._insert(player, net_worth)
+
+    def remove(self, player):
+        key = self._keys.pop(player, None)
+        if key is not None:
+            self._delete(key)
+
+    # 1-based rank of a player, None if unknown
+    def rank(self, player):
+        key = self._keys.get(player)
+        if key is None:
+            return None
+        node = self._head
+        position = 0
+        for level in range(self._level - 1, -1, -1):
+            while node.next[level] is not None and node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    # [(rank, player, net worth), ...] starting at 1-based `start`, at most `count` entries
+    def slice(self, start, count):
+        start = max(start, 1)
+        node = self._head
+        position = 0
+        for level in range(self._level - 1, -1, -1):
+            while node.next[level] is not None and position + node.width[level] < start:
+                position += node.width[level]
+                node = node.next[level]
+        entries = []
+        node = node.next[0]
+        position += 1
+        while node is not None and len(entries) < count:
+            entries.append((position, node.player, node.net_worth))
+            node = node.next[0]
+            position += 1
+        return entries
+
+    def top(self, k):
+        return self.slice(1, k)
+
+    # A player and up to `distance` players either side of them
+    def around(self, player, distance=2):
+        rank = self.rank(player)
+        if rank is None:
+            return []
+        return self.slice(rank - distance, 2 * distance + 1 - max(0, distance - rank + 1))
@@ -0,0 +1,337 @@
+# Rebuild every player's account from an event journal
+#
+# Streams a journal (journal.py) through GameEngine with the same scenario,
+# experts and event seed the game was played with. Trades go through at the
+# prices recorded with them (they were live prices) and order book fills are
+# applied as recorded; everything else is recomputed by the game rules: cash
+# checks, expert fees, predictions and the net worth of each round submit. A
+# replay therefore audits the game as it rebuilds it: an event the rules
+# reject, or a submit whose net worth differs from the recorded one, is
+# reported as a discrepancy.
+#
+# Checkpoints: every player's state is kept as they leave each round, so the
+# standings at the end of any round come without another pass (--round). The
+# replayer's whole state (journal offset, accounts, checkpoints) is saved next
+# to the journal, and the next run only streams the events appended since.
+#
+# Usage:
+#   python replay.py mockstock.journal
+#   python replay.py mockstock.journal --round 1 --player alice
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from game_config import EXPERTS, load_market, load_round_passwords
+from game_engine import GameEngine, PlayerAccount
+from journal import (BASKET_FILLED, BOUGHT, EXPERT_PAID, ORDER_CANCELLED, ORDER_EVENTS, ORDER_PLACED, REGISTERED,
+                     ROUND_FOLLOWED, ROUND_SUBMITTED, RUMOR_POSTED, SOLD, journal_header, read_journal)
+from player_state import Position
+from predictions import PredictionEngine
+from round_clock import OPEN, ClockState
+from state_protocol import decode, encode
+from state_server import account_state
+
+CHECKPOINT_FORMAT = 1
+
+
+# Prices of the event being replayed, as recorded with it
+class _JournalQuotes:
+    __slots__ = ("prices",)
+
+    def __init__(self):
+        self.prices = {}
+
+    def price_of(self, round_number, company):
+        return self.prices.get(company)
+
+
+# An order book event as recorded in the journal
+class _RecordedEvent:
+    __slots__ = ("kind", "order_id", "ticker", "side", "limit_price", "price", "quantity")
+
+    def __init__(self, kind, order_id, ticker, side, limit_price, price, quantity):
+        self.kind = kind
+        self.order_id = order_id
+        self.ticker = ticker
+        self.side = side
+        self.limit_price = limit_price
+        self.price = price
+        self.quantity = quantity
+
+
+# Stands in for the MatchingEngine: orders get their recorded ids and fill as recorded
+#
+# Keeps each player's open orders, which count towards their net worth.
+class _JournalOrders:
+    def __init__(self, open_orders=None):
+        self.next_id = None
+        self.pending = []
+        self._open = open_orders if open_orders is not None else {}
+
+    def submit(self, player, ticker, side, price, quantity):
+        self._open.setdefault(player, {})[self.next_id] = [ticker, side, price, quantity]
+        return self.next_id
+
+    def sync(self):
+        pass
+
+    def cancel(self, order_id, player):
+        pass
+
+    # Cancellations at a round's end are in the journal as order events
+    def cancel_all(self, player=None):
+        pass
+
+    def drain(self, player):
+        events, self.pending = self.pending, []
+        orders = self._open.get(player, {})
+        for event in events:
+            order = orders.get(event.order_id)
+            if order is None:
+                continue
+            order[3] -= event.quantity
+            if event.kind == "cancelled" or order[3] <= 0:
+                del orders[event.order_id]
+        return events
+
+    def open_orders(self, player):
+        return [(order_id, *order) for order_id, order in self._open.get(player, {}).items()]
+
+
+class _JournalClock:
+    __slots__ = ("state",)
+
+    def __init__(self):
+        self.state = ClockState()
+
+
+def _account_from(name, state):
+    cash, round_number, net_worth, positions, trades = state
+    account = PlayerAccount(cash=cash, round_number=round_number)
+    account.name = name
+    account.net_worth = net_worth
+    account.portfolio = {company: Position(shares, spent, received) for company, shares, spent, received in positions}
+    for trade_round, company, shares_bought, shares_sold, price in trades:
+        account.transactions.append(trade_round, company, shares_bought, shares_sold, price)
+        account.add_round_totals(shares_bought * price, shares_sold * price, trade_round)
+    return account
+
+
+class Replayer:
+    def __init__(self, market, event_seed):
+        self.market = market
+        self.event_seed = event_seed
+        self.quotes = _JournalQuotes()
+        self.orders = _JournalOrders()
+        self.clock = _JournalClock()
+        self.round_passwords = load_round_passwords(market)
+        self.engine = GameEngine(market, EXPERTS, self.round_passwords, PredictionEngine(market, EXPERTS, event_seed),
+                                 self.orders, self.quotes, self.clock)
+        self.accounts = {}
+        # {round: {player: account state as they left the round}}
+        self.round_ends = {}
+        self.rumors = []
+        self.discrepancies = []
+        self.offset = 0
+        self.events = 0
+        self._position = 0
+        self._apply = {
+            REGISTERED: self._registered,
+            BOUGHT: self._bought,
+            SOLD: self._sold,
+            BASKET_FILLED: self._basket_filled,
+            ORDER_PLACED: self._order_placed,
+            ORDER_CANCELLED: lambda name, order_id: None,
+            ORDER_EVENTS: self._order_events,
+            EXPERT_PAID: self._expert_paid,
+            RUMOR_POSTED: lambda source, round_number, rumor: self.rumors.append([round_number, source, rumor]),
+            ROUND_SUBMITTED: self._round_submitted,
+            ROUND_FOLLOWED: self._round_followed,
+        }
+
+    # Apply the records appended to the journal since the last replay; returns how many there were
+    def replay(self, path):
+        apply = self._apply
+        count = 0
+        for end, _, kind, fields in read_journal(path, self.offset):
+            handler = apply.get(kind)
+            if handler is not None:
+                handler(*fields)
+            self._position = self.offset = end
+            count += 1
+        self.events += count
+        return count
+
+    def _discrepancy(self, message):
+        self.discrepancies.append([self._position, message])
+
+    def _check(self, result, name):
+        if not result:
+            self._discrepancy(f"{name}: {result.message}")
+
+    # The player's account, in the round the event was recorded in
+    def _account(self, name, round_number=None):
+        account = self.accounts.get(name)
+        if account is None:
+            # Registered before the journal was started
+            self._discrepancy(f"{name}: no registration")
+            account = self.accounts[name] = self.engine.new_account(name)
+        if round_number is not None and account.round != round_number:
+            self._discrepancy(f"{name}: recorded in round {round_number}, replayed in round {account.round}")
+            account.round = round_number
+        return account
+
+    # Players register again on every visit; only the first registration opens an account
+    def _registered(self, name, cash):
+        if name not in self.accounts:
+            self.accounts[name] = self.engine.new_account(name, cash)
+
+    def _bought(self, name, round_number, company, shares, price):
+        self.quotes.prices = {company: price}
+        self._check(self.engine.buy(self._account(name, round_number), company, shares), name)
+
+    def _sold(self, name, round_number, company, shares, price):
+        self.quotes.prices = {company: price}
+        self._check(self.engine.sell(self._account(name, round_number), company, shares), name)
+
+    def _basket_filled(self, name, round_number, legs, prices):
+        self.quotes.prices = prices
+        self._check(self.engine.basket(self._account(name, round_number), legs), name)
+
+    def _order_placed(self, name, round_number, order_id, company, side, shares, limit_price):
+        self.orders.next_id = order_id
+        self._check(self.engine.place_order(self._account(name, round_number), company, side, shares, limit_price), name)
+
+    def _order_events(self, name, round_number, events):
+        self.orders.pending = [_RecordedEvent(*event) for event in events]
+        self.engine.apply_order_events(self._account(name, round_number))
+
+    # The first prediction of a round prepares every player's in one batch, as the app does
+    def _expert_paid(self, name, round_number, expert, cost):
+        self._check(self.engine.expert_prediction(self._account(name, round_number), expert, self.accounts), name)
+
+    def _round_submitted(self, name, round_number, net_worth):
+        account = self._account(name, round_number)
+        self._check(self.engine.submit_round(account, self.round_passwords.get(round_number, '')), name)
+        if abs(account.net_worth - net_worth) > 1e-6:
+            self._discrepancy(f"{name}: recorded net worth {net_worth}, replayed {account.net_worth}")
+        self.round_ends.setdefault(round_number, {})[name] = account_state(account, 0)
+
+    # The shared clock moved the player on; they are valued at the new round's prices, as the clock does
+    def _round_followed(self, name, round_number):
+        account = self._account(name)
+        left = account.round
+        self.clock.state = ClockState(round_number, OPEN)
+        self.engine.follow_clock(account)
+        self.clock.state = ClockState()
+        account.net_worth = self.engine.net_worth(account)
+        self.round_ends.setdefault(left, {})[name] = account_state(account, 0)
+
+    # Every player's account at the end of a round (players who have not left it yet as they are now),
+    # None for the current state
+    def accounts_at(self, round_number=None):
+        if round_number is None:
+            return dict(self.accounts)
+        accounts = {}
+        for name, account in self.accounts.items():
+            if account.round <= round_number:
+                accounts[name] = account
+                continue
+            for earlier in range(round_number, 0, -1):
+                state = self.round_ends.get(earlier, {}).get(name)
+                if state is not None:
+                    accounts[name] = _account_from(name, state)
+                    break
+        return accounts
+
+    def save_checkpoint(self, path):
+        data = encode([
+            CHECKPOINT_FORMAT, self.market.version, self.event_seed, self.offset, self.events,
+            {name: account_state(account, 0) for name, account in self.accounts.items()},
+            self.round_ends, self.rumors, self.orders._open, self.discrepancies,
+        ])
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    # Continue from a saved checkpoint; False when there is none for this scenario, seed and journal
+    def load_checkpoint(self, path, journal_size):
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            fields = decode(f.read())
+        checkpoint_format, version, seed, offset, events, accounts, round_ends, rumors, open_orders, discrepancies = fields
+        if (checkpoint_format, version, seed) != (CHECKPOINT_FORMAT, self.market.version, self.event_seed) \
+                or offset > journal_size:
+            return False
+        self.offset = self._position = offset
+        self.events = events
+        self.accounts = {name: _account_from(name, state) for name, state in accounts.items()}
+        self.round_ends = round_ends
+        self.rumors = rumors
+        self.orders._open = open_orders
+        self.discrepancies = discrepancies
+        return True
+
+
+def standings_table(accounts):
+    rows = [
+        (name, account.round, account.cash, account.net_worth, len(account.transactions))
+        for name, account in accounts.items()
+    ]
+    table = pd.DataFrame(rows, columns=["Player", "Round", "Cash (₹)", "Net Worth (₹)", "Trades"])
+    return table.sort_values("Net Worth (₹)", ascending=False, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild every player's account from a MockStock event journal")
+    parser.add_argument("journal", help="event journal written by the app, the state server or benchmark.py --journal")
+    parser.add_argument("--round", type=int, help="show the standings at the end of this round")
+    parser.add_argument("--player", help="show this player's positions and trades")
+    parser.add_argument("--top", type=int, default=20, help="rows of the standings to show")
+    parser.add_argument("--full", action="store_true", help="replay from the start instead of the last checkpoint")
+    args = parser.parse_args()
+
+    market = load_market()
+    version, seed = journal_header(args.journal)
+    if version != market.version:
+        parser.error(f"the journal was recorded with scenario {version}, not {market.version} (set MOCKSTOCK_SCENARIO)")
+    replayer = Replayer(market, seed)
+    checkpoint = args.journal + ".checkpoint"
+    resumed = not args.full and replayer.load_checkpoint(checkpoint, os.path.getsize(args.journal))
+
+    started = time.perf_counter()
+    count = replayer.replay(args.journal)
+    seconds = time.perf_counter() - started
+    replayer.save_checkpoint(checkpoint)
+
+    print(f"Replayed {count} events{' since the checkpoint' if resumed else ''} in {seconds:.3f} s "
+          f"({count / seconds if seconds else 0:,.0f} events/s); {replayer.events} events, "
+          f"{len(replayer.accounts)} players, {len(replayer.rumors)} rumors in the journal")
+    if replayer.discrepancies:
+        print(f"{len(replayer.discrepancies)} discrepancies:")
+        for offset, message in replayer.discrepancies[:args.top]:
+            print(f"  at byte {offset}: {message}")
+
+    accounts = replayer.accounts_at(args.round)
+    print(f"\nStandings {f'at the end of round {args.round}' if args.round else 'now'}:")
+    print(standings_table(accounts).head(args.top).to_string())
+    if args.player:
+        account = accounts.get(args.player)
+        if account is None:
+            print(f"\nNo account for {args.player}")
+            return
+        print(f"\n{args.player}: round {account.round}, cash ₹{account.cash}, net worth ₹{account.net_worth}")
+        for company, position in account.portfolio.items():
+            print(f"  {company}: {position.shares} shares, spent ₹{position.total_spent}, received ₹{position.total_received}")
+        trades = account.transactions.to_dataframe()
+        if not trades.empty:
+            print(trades.to_string())
+
+
+if __name__ == "__main__":
+    main()
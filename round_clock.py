@@ -0,0 +1,146 @@
+import sqlite3
+import threading
+import time
+
+from order_book import cancellation, settlement
+from valuation import publish_standings
+
+OPEN = "open"
+CLOSED = "closed"
+
+
+# One immutable reading of the round clock; sessions read it without any locking
+class ClockState:
+    __slots__ = ("round", "status", "opened_at", "deadline")
+
+    def __init__(self, round_number=0, status=CLOSED, opened_at=None, deadline=None):
+        self.round = round_number
+        self.status = status
+        self.opened_at = opened_at
+        self.deadline = deadline
+
+    # False until an organiser opens the first round; players then advance at their own pace
+    @property
+    def active(self):
+        return self.round > 0
+
+    # Trading is allowed: the round is open and its deadline (if any) has not passed
+    def is_open(self, now=None):
+        if self.status != OPEN:
+            return False
+        return self.deadline is None or (time.time() if now is None else now) < self.deadline
+
+    # Seconds until the deadline, None without one
+    def remaining(self, now=None):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - (time.time() if now is None else now))
+
+    def elapsed(self, now=None):
+        return (time.time() if now is None else now) - self.opened_at if self.opened_at is not None else 0.0
+
+    def __repr__(self):
+        return f"ClockState(round={self.round}, status={self.status!r}, deadline={self.deadline!r})"
+
+
+# Server-side round clock shared by every player
+#
+# The organiser opens and closes rounds (optionally with a deadline); the state
+# lives in the game database so every server process follows the same clock.
+# `state` is replaced, never modified, so reading the current round is one
+# attribute access. A watcher thread picks up changes made by other processes
+# and closes rounds whose deadline has passed; whichever process closes a round
+# first snapshots every player's cash and holdings in the closing transaction
+# and values them all in one batch into the leaderboard. `before_close` runs
+# ahead of that snapshot (to write accounts kept in memory); a clock with
+# `auto_close` off leaves expired rounds to another process.
+class RoundClock:
+    def __init__(self, database, market, store, orders=None, before_close=None, auto_close=True):
+        self.database = database
+        self.market = market
+        self.store = store
+        self.orders = orders
+        self.before_close = before_close
+        self.auto_close = auto_close
+        self.version = -1
+        self.state = ClockState()
+        self._watcher = None
+        self.refresh()
+
+    def refresh(self):
+        version = self.database.counter("round_clock")
+        if version == self.version:
+            return False
+        row = self.database.round_clock()
+        self.state = ClockState(*row) if row else ClockState()
+        self.version = version
+        return True
+
+    # Open a round for everyone (the one after the current round by default), optionally for `duration` seconds
+    def open_round(self, round_number=None, duration=None):
+        if self.state.status == OPEN:
+            raise ValueError(f"Round {self.state.round} is still open")
+        if round_number is None:
+            round_number = self.state.round + 1
+        if not 1 <= round_number <= self.market.n_rounds:
+            raise ValueError(f"There is no round {round_number}")
+        deadline = time.time() + duration if duration else None
+        self.database.open_round(round_number, deadline)
+        self.refresh()
+        return self.state
+
+    # Close the current round and value every player at the next round's prices (the last round at its own),
+    # then cancel every resting order; returns {player: net worth}, or None when the round was not open
+    def close_round(self, round_number=None):
+        if round_number is None:
+            round_number = self.state.round
+        if self.before_close is not None:
+            self.before_close()
+        snapshot = self.database.close_round(round_number)
+        self.refresh()
+        if snapshot is None:
+            return None
+        cash, portfolios, saved_orders = snapshot
+        self._add_reservations(cash, portfolios, saved_orders)
+        net_worths = publish_standings(self.store, cash, portfolios, self.market, min(round_number + 1, self.market.n_rounds))
+        # Players get their reservations back with the cancellations (already counted above)
+        if self.orders is not None:
+            self.orders.cancel_all()
+            self.orders.sync()
+        return net_worths
+
+    # Cash and shares held by this process's open limit orders still belong to their players, and
+    # fills and cancellations their sessions have not picked up yet are theirs already. So are the
+    # reservations of saved orders no order book holds any more (handed back when their player returns).
+    def _add_reservations(self, cash, portfolios, saved_orders):
+        for player in list(cash):
+            holdings = portfolios.setdefault(player, {})
+            live = set()
+            events = []
+            if self.orders is not None:
+                live = self.orders.order_ids(player)
+                events = [cancellation(player, order) for order in self.orders.open_orders(player)]
+                events += self.orders.pending(player)
+            events += [cancellation(player, order) for order in saved_orders.get(player, ()) if order[0] not in live]
+            for event in events:
+                event_cash, event_shares = settlement(event)
+                cash[player] += event_cash
+                if event_shares:
+                    holdings[event.ticker] = holdings.get(event.ticker, 0) + event_shares
+
+    def start_watcher(self, interval=0.5):
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="round-clock", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+                state = self.state
+                if self.auto_close and state.status == OPEN and state.deadline is not None and not state.is_open():
+                    self.close_round(state.round)
+            except sqlite3.Error:
+                pass
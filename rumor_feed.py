@@ -0,0 +1,221 @@
+import csv
+import io
+import os
+import threading
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+TAIL_BLOCK_BYTES = 4096
+RUMOR_COLUMNS = ["source", "rumor", "round"]
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+# Split raw CSV bytes into (offset, record) pairs, keeping quoted newlines inside their record
+def _split_records(data, base_offset=0):
+    records = []
+    start = 0
+    in_quotes = False
+    position = 0
+    while True:
+        newline = data.find(b"\n", position)
+        if newline == -1:
+            break
+        if data.count(b'"', position, newline) % 2:
+            in_quotes = not in_quotes
+        position = newline + 1
+        if not in_quotes:
+            records.append((base_offset + start, data[start:position]))
+            start = position
+    return records, start
+
+
+def _parse_record(record):
+    return next(csv.reader(io.StringIO(record.decode("utf-8", errors="replace"), newline="")), [])
+
+
+# Append-only rumor log with a ring buffer of the latest rumors
+#
+# One instance is shared by every session of the app (see get_rumor_feed() in
+# stock1L.py). Submitting a rumor appends a single line under a lock on the
+# file, so sessions never overwrite each other's rumors. Reading never parses
+# the whole file:
+#   - on first load (or if the file was rewritten) only its tail is read,
+#     block by block from the end, until it holds `size` complete rows
+#   - when the file grew, only the appended bytes are read
+# Round-scoped reads go through an index of byte offsets per round, built on
+# first use and then kept up to date from the appended bytes.
+class RumorFeed:
+    def __init__(self, path="rumors.csv", size=5):
+        self.path = path
+        self.size = size
+        self.version = 0
+        self._signature = None
+        self._header = RUMOR_COLUMNS
+        self._offset = 0
+        self._buffer = deque(maxlen=size)
+        self._latest = []
+        self._round_index = None
+        self._round_cache = {}
+        self._lock = threading.Lock()
+
+    # Latest rumors first, at most `size` of them
+    def latest(self):
+        return self._latest
+
+    def is_empty(self):
+        return self._signature is not None and self._signature[2] == 0
+
+    def _read_header(self, f):
+        f.seek(0)
+        line = f.readline()
+        return next(csv.reader([line.decode("utf-8")]), []), len(line)
+
+    # Parse complete CSV rows from the tail of the file
+    def _read_tail(self, f, data_start, end):
+        block = TAIL_BLOCK_BYTES
+        while True:
+            start = max(data_start, end - block)
+            f.seek(start)
+            data = f.read(end - start)
+            if start > data_start:
+                # Drop the partial first line
+                data = data[data.find(b"\n") + 1:]
+            rows = [row for row in csv.reader(io.StringIO(data.decode("utf-8", errors="replace"), newline=""))
+                    if len(row) == len(self._header)]
+            # Keep one spare row in case the block started inside a quoted field
+            if len(rows) > self.size or start == data_start:
+                return [dict(zip(self._header, row)) for row in rows[-self.size:]]
+            block *= 2
+
+    def _index_records(self, records):
+        if self._round_index is None or "round" not in self._header:
+            return
+        round_column = self._header.index("round")
+        for offset, record in records:
+            row = _parse_record(record)
+            if len(row) == len(self._header) and row[round_column]:
+                self._round_index.setdefault(row[round_column], []).append(offset)
+
+    # Reload the file if it changed since the last call; returns True when it did
+    def refresh(self):
+        signature = _file_signature(self.path)
+        if signature == self._signature:
+            return False
+        with self._lock:
+            signature = _file_signature(self.path)
+            if signature == self._signature:
+                return False
+            if signature is None or signature[2] == 0:
+                self._buffer.clear()
+                self._header = RUMOR_COLUMNS
+                self._offset = 0
+                self._round_index = None
+            elif self._signature is not None and self._signature[0] == signature[0] and 0 < self._offset <= signature[2]:
+                # Same file that only grew: read the appended bytes
+                with open(self.path, "rb") as f:
+                    f.seek(self._offset)
+                    records, consumed = _split_records(f.read(signature[2] - self._offset), self._offset)
+                for _, record in records:
+                    row = _parse_record(record)
+                    if len(row) == len(self._header):
+                        self._buffer.append(dict(zip(self._header, row)))
+                self._index_records(records)
+                self._offset += consumed
+            else:
+                with open(self.path, "rb") as f:
+                    self._header, data_start = self._read_header(f)
+                    self._buffer.clear()
+                    if self._header:
+                        self._buffer.extend(self._read_tail(f, data_start, signature[2]))
+                self._offset = signature[2]
+                self._round_index = None
+            self._latest = list(reversed(self._buffer))
+            self._round_cache = {}
+            self._signature = signature
+            self.version += 1
+            return True
+
+    # Latest rumors of one round first, at most `size` of them
+    def latest_for_round(self, round_number):
+        key = str(round_number)
+        cached = self._round_cache.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            if self._round_index is None:
+                self._build_round_index()
+            offsets = self._round_index.get(key, [])[-self.size:]
+            rumors = []
+            if offsets:
+                with open(self.path, "rb") as f:
+                    for offset in reversed(offsets):
+                        f.seek(offset)
+                        row = _parse_record(f.readline())
+                        rumors.append(dict(zip(self._header, row)))
+            self._round_cache[key] = rumors
+            return rumors
+
+    # Number of rumors posted in each round
+    def round_counts(self):
+        with self._lock:
+            if self._round_index is None:
+                self._build_round_index()
+            return {round_number: len(offsets) for round_number, offsets in self._round_index.items()}
+
+    # One full scan of the file, only needed the first time a round is queried
+    def _build_round_index(self):
+        self._round_index = {}
+        if self._offset == 0:
+            return
+        with open(self.path, "rb") as f:
+            _, data_start = self._read_header(f)
+            f.seek(data_start)
+            records, _ = _split_records(f.read(self._offset - data_start), data_start)
+        self._index_records(records)
+
+    # Append one rumor as a single line; newlines are flattened so every rumor stays on one line
+    def append(self, source, rumor, round_number):
+        line = io.StringIO()
+        csv.writer(line, lineterminator="\n").writerow([source, " ".join(rumor.splitlines()), round_number])
+        with self._lock:
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    header, _ = self._read_header(f)
+                if header and header != RUMOR_COLUMNS:
+                    self._upgrade_header()
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.lockf(f, fcntl.LOCK_EX)
+                try:
+                    if f.seek(0, os.SEEK_END) == 0:
+                        f.write((",".join(RUMOR_COLUMNS) + "\n").encode("utf-8"))
+                    f.write(line.getvalue().encode("utf-8"))
+                finally:
+                    if fcntl is not None:
+                        fcntl.lockf(f, fcntl.LOCK_UN)
+
+    # Rewrite a rumors file from before the round column existed (done once)
+    def _upgrade_header(self):
+        with open(self.path, "rb") as f:
+            header, data_start = self._read_header(f)
+            f.seek(data_start)
+            records, _ = _split_records(f.read())
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out, lineterminator="\n")
+            writer.writerow(RUMOR_COLUMNS)
+            for _, record in records:
+                old = dict(zip(header, _parse_record(record)))
+                writer.writerow([old.get("source", ""), old.get("rumor", ""), old.get("round", "")])
+        os.replace(tmp_path, self.path)
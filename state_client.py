@@ -0,0 +1,232 @@
+import itertools
+import queue
+import socket
+import time
+from contextlib import contextmanager
+
+from game_engine import PlayerAccount, RerunView, Result
+from player_state import Position
+from state_protocol import (ACCOUNT, APPLY_EVENTS, BASKET, BUY, CANCEL_ORDER, CLOSE_ROUND, DEPTH, ERROR, FOLLOW_CLOCK,
+                            OPEN_ORDERS, OPEN_ROUND, PLACE_ORDER, PREDICTION, PRICE, ROUND_ELAPSED, SELL, SUBMIT_ROUND,
+                            ProtocolError, StateServerError, frame, parse_address, read_frames)
+
+RECV_SIZE = 65536
+
+
+# Connection to the state server, shared by every thread of a worker process
+#
+# Idle sockets are kept in a LIFO pool: a call borrows one, so concurrent
+# sessions never interleave frames on a socket, and the most recently used
+# (warm) connection is reused first. call_many() pipelines: every request is
+# written in one send and the responses are read back in one go.
+class StateClient:
+    def __init__(self, address, timeout=10.0):
+        self.address = address
+        self.family, self.target = parse_address(address)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._request_ids = itertools.count(1)
+
+    def _connect(self):
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.target)
+        if self.family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    @contextmanager
+    def connection(self):
+        try:
+            sock = self._idle.get_nowait()
+        except queue.Empty:
+            sock = self._connect()
+        try:
+            yield sock
+        except BaseException:
+            # The stream may be out of step with its requests now; never reuse it
+            sock.close()
+            raise
+        self._idle.put(sock)
+
+    def call(self, code, *args):
+        return self.call_many([(code, args)])[0]
+
+    # Send [(opcode, args)] in one go and return their results in order
+    def call_many(self, requests):
+        request_ids = [next(self._request_ids) & 0xFFFFFFFF for _ in requests]
+        data = b"".join(frame(request_id, code, list(args)) for request_id, (code, args) in zip(request_ids, requests))
+        with self.connection() as sock:
+            sock.sendall(data)
+            responses = self._receive(sock, len(requests))
+        results = []
+        for request_id, (response_id, status, value) in zip(request_ids, responses):
+            if response_id != request_id:
+                raise ProtocolError(f"Response {response_id} does not match request {request_id}")
+            if status == ERROR:
+                raise StateServerError(value)
+            results.append(value)
+        return results
+
+    @staticmethod
+    def _receive(sock, count):
+        buffer = bytearray()
+        responses = []
+        while len(responses) < count:
+            chunk = sock.recv(RECV_SIZE)
+            if not chunk:
+                raise ConnectionError("State server closed the connection")
+            buffer += chunk
+            frames, consumed = read_frames(buffer)
+            del buffer[:consumed]
+            responses.extend(frames)
+        return responses
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# GameEngine stand-in for app workers: actions run on the state server
+#
+# Takes and returns the same things as GameEngine, so stock1L.py works with
+# either. After every action the session's PlayerAccount is updated from the
+# server's copy: cash, round, net worth, positions and the trades it has not
+# seen yet (sent as the number of trades it already has). refresh() pipelines
+# everything one rerun of the app reads into a single round trip.
+class RemoteGame:
+    def __init__(self, client, market, clock=None):
+        self.client = client
+        self.market = market
+        self.clock = clock
+        # {round: when it opened on the server, on this worker's clock}
+        self._round_opened = {}
+
+    # A local account for a player; the server creates its copy on the first action
+    def new_account(self, name, cash=100000):
+        account = PlayerAccount(cash=cash)
+        self.register(account, name)
+        return account
+
+    # The server records the registration when it first loads the account
+    def register(self, account, name):
+        account.name = name
+
+    @staticmethod
+    def _mirror(account, response):
+        ok, message, value, state = response
+        cash, round_number, net_worth, positions, trades = state
+        account.cash = cash
+        account.round = round_number
+        account.net_worth = net_worth
+        account.portfolio = {
+            company: Position(shares, spent, received) for company, shares, spent, received in positions
+        }
+        for trade_round, company, shares_bought, shares_sold, price in trades:
+            account.transactions.append(trade_round, company, shares_bought, shares_sold, price)
+            account.add_round_totals(shares_bought * price, shares_sold * price, trade_round)
+        return Result(ok, message, value)
+
+    def _action(self, code, account, *args):
+        return self._mirror(account, self.client.call(code, account.name, len(account.transactions), *args))
+
+    def buy(self, account, company, shares):
+        return self._action(BUY, account, company, shares)
+
+    def sell(self, account, company, shares):
+        return self._action(SELL, account, company, shares)
+
+    def basket(self, account, legs):
+        return self._action(BASKET, account, legs)
+
+    def place_order(self, account, company, side, shares, limit_price):
+        return self._action(PLACE_ORDER, account, company, side, shares, limit_price)
+
+    def cancel_order(self, account, order_id):
+        return self._action(CANCEL_ORDER, account, order_id)
+
+    def apply_order_events(self, account):
+        return self._action(APPLY_EVENTS, account).value
+
+    # Other players' predictions are prepared on the server, from its own standings
+    def expert_prediction(self, account, expert, players=()):
+        return self._action(PREDICTION, account, expert)
+
+    def submit_round(self, account, password, confirmed=True):
+        return self._action(SUBMIT_ROUND, account, password, confirmed)
+
+    # Checked against this worker's copy of the clock first, so steady rounds cost no round trip
+    def _behind_clock(self, account):
+        return self.clock is None or (self.clock.state.active and account.round != self.clock.state.round)
+
+    def follow_clock(self, account):
+        if not self._behind_clock(account):
+            return False
+        return self._action(FOLLOW_CLOCK, account).value
+
+    # Start of a rerun in one pipelined round trip: apply order events, follow the clock, read the limit
+    # order panel of `company` (in the round the account is moving to) and, once per round, when it opened
+    def refresh(self, account, company, levels=5):
+        known = len(account.transactions)
+        round_number = account.round
+        actions = [(APPLY_EVENTS, (account.name, known))]
+        follow = self._behind_clock(account)
+        if follow:
+            actions.append((FOLLOW_CLOCK, (account.name, known)))
+            if self.clock is not None:
+                round_number = self.clock.state.round
+        reads = [(PRICE, (round_number, company)), (DEPTH, (company, levels)), (OPEN_ORDERS, (account.name,))]
+        timed = round_number not in self._round_opened
+        if timed:
+            reads.append((ROUND_ELAPSED, (round_number,)))
+        sent = time.time()
+        responses = self.client.call_many(actions + reads)
+        # Every account response carries the trades from `known` on; only the last (latest) state is mirrored
+        result = self._mirror(account, responses[len(actions) - 1])
+        price, (bids, asks), open_orders = responses[len(actions):len(actions) + 3]
+        if timed:
+            self._round_opened.setdefault(round_number, sent - responses[-1])
+        return RerunView(result.value if follow else False, company, price,
+                         ([tuple(level) for level in bids], [tuple(level) for level in asks]),
+                         [tuple(order) for order in open_orders])
+
+    # When a round opened on the server (it times trades from then), on this worker's clock
+    def round_opened(self, round_number):
+        opened = self._round_opened.get(round_number)
+        if opened is None:
+            sent = time.time()
+            opened = self._round_opened.setdefault(round_number, sent - self.client.call(ROUND_ELAPSED, round_number))
+        return opened
+
+    # Rounds are opened and closed on the server, whose clock knows every open limit order
+    def open_round(self, round_number=None, duration=None):
+        return self._clock_action(OPEN_ROUND, round_number, duration)
+
+    def close_round(self):
+        return self._clock_action(CLOSE_ROUND)
+
+    def _clock_action(self, code, *args):
+        ok, message, value = self.client.call(code, *args)
+        if self.clock is not None:
+            self.clock.refresh()
+        return Result(ok, message, value)
+
+    # The server's copy of the account wins over a saved state read by the worker
+    def restore(self, account, saved):
+        self._action(ACCOUNT, account)
+
+    def is_last_round(self, account):
+        return account.round >= self.market.n_rounds
+
+    def price(self, account, company):
+        return self.client.call(PRICE, account.round, company)
+
+    def open_orders(self, account):
+        return [tuple(order) for order in self.client.call(OPEN_ORDERS, account.name)]
+
+    def depth(self, company, levels=5):
+        bids, asks = self.client.call(DEPTH, company, levels)
+        return [tuple(level) for level in bids], [tuple(level) for level in asks]
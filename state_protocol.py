@@ -0,0 +1,171 @@
+import socket
+import struct
+
+# Binary protocol between stock1L.py workers and the state server
+#
+# Every message is one frame: a 9-byte header (payload length, request id,
+# opcode or status) followed by the payload. Requests carry their arguments as
+# one encoded list, responses one encoded value. Responses come back in request
+# order and echo the request id, so a client can write many requests before
+# reading any response (pipelining).
+#
+# Values are encoded with a one-byte type tag: None, booleans, 64-bit integers,
+# doubles, UTF-8 strings and (nested) lists and string-keyed or int-keyed dicts.
+
+HEADER = struct.Struct("<IIB")
+MAX_FRAME = 16 * 2**20
+
+# Request opcodes
+PING = 0
+ACCOUNT = 1
+BUY = 2
+SELL = 3
+BASKET = 4
+PLACE_ORDER = 5
+CANCEL_ORDER = 6
+APPLY_EVENTS = 7
+PREDICTION = 8
+SUBMIT_ROUND = 9
+FOLLOW_CLOCK = 10
+PRICE = 11
+OPEN_ORDERS = 12
+DEPTH = 13
+OPEN_ROUND = 15
+CLOSE_ROUND = 16
+ROUND_ELAPSED = 17
+
+# Response statuses
+OK = 0
+ERROR = 1
+
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+_LENGTH = struct.Struct("<I")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+# Error raised in the server while handling a request, re-raised by the client
+class StateServerError(Exception):
+    pass
+
+
+# Exact type checks first (cheapest for the common str/int/float/list values); bool is not
+# an int here because type(True) is bool
+def _encode(value, out):
+    kind = type(value)
+    if kind is str:
+        data = value.encode("utf-8")
+        out.append(b"s" + _LENGTH.pack(len(data)) + data)
+    elif kind is int:
+        out.append(b"i" + _INT.pack(value))
+    elif kind is float:
+        out.append(b"d" + _FLOAT.pack(value))
+    elif kind is list or kind is tuple:
+        out.append(b"l" + _LENGTH.pack(len(value)))
+        for item in value:
+            _encode(item, out)
+    elif value is None:
+        out.append(b"N")
+    elif kind is bool:
+        out.append(b"T" if value else b"F")
+    elif kind is dict:
+        out.append(b"m" + _LENGTH.pack(len(value)))
+        for key, item in value.items():
+            _encode(key, out)
+            _encode(item, out)
+    elif hasattr(value, "item"):
+        # NumPy scalars
+        _encode(value.item(), out)
+    elif isinstance(value, tuple):
+        # namedtuples travel as lists
+        _encode(list(value), out)
+    else:
+        raise ProtocolError(f"Cannot encode {type(value).__name__}")
+
+
+def encode(value):
+    out = []
+    _encode(value, out)
+    return b"".join(out)
+
+
+# Most frequent tags first: strings, integers, doubles and lists
+def _decode(data, offset):
+    tag = data[offset]
+    offset += 1
+    if tag == 0x73:  # s
+        length = _LENGTH.unpack_from(data, offset)[0]
+        offset += _LENGTH.size
+        return str(data[offset:offset + length], "utf-8"), offset + length
+    if tag == 0x69:  # i
+        return _INT.unpack_from(data, offset)[0], offset + _INT.size
+    if tag == 0x64:  # d
+        return _FLOAT.unpack_from(data, offset)[0], offset + _FLOAT.size
+    if tag == 0x6C:  # l
+        count = _LENGTH.unpack_from(data, offset)[0]
+        offset += _LENGTH.size
+        items = []
+        for _ in range(count):
+            item, offset = _decode(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == 0x4E:  # N
+        return None, offset
+    if tag == 0x54:  # T
+        return True, offset
+    if tag == 0x46:  # F
+        return False, offset
+    if tag == 0x6D:  # m
+        count = _LENGTH.unpack_from(data, offset)[0]
+        offset += _LENGTH.size
+        items = {}
+        for _ in range(count):
+            key, offset = _decode(data, offset)
+            items[key], offset = _decode(data, offset)
+        return items, offset
+    raise ProtocolError(f"Unknown type tag {tag:#x}")
+
+
+def decode(data):
+    try:
+        value, offset = _decode(data, 0)
+    except (IndexError, struct.error, UnicodeDecodeError):
+        raise ProtocolError("Value cut short") from None
+    if offset > len(data):
+        raise ProtocolError("Value cut short")
+    if offset != len(data):
+        raise ProtocolError("Trailing bytes after value")
+    return value
+
+
+def frame(request_id, code, value):
+    payload = encode(value)
+    return HEADER.pack(len(payload), request_id, code) + payload
+
+
+# Split every complete frame off the front of a buffer; returns [(request id, code, value)]
+# and how many bytes they took
+def read_frames(buffer):
+    frames = []
+    offset = 0
+    while len(buffer) - offset >= HEADER.size:
+        length, request_id, code = HEADER.unpack_from(buffer, offset)
+        if length > MAX_FRAME:
+            raise ProtocolError(f"Frame of {length} bytes is too large")
+        end = offset + HEADER.size + length
+        if len(buffer) < end:
+            break
+        frames.append((request_id, code, decode(memoryview(buffer)[offset + HEADER.size:end])))
+        offset = end
+    return frames, offset
+
+
+# "unix:/path/to.sock" or "host:port" as (socket family, address)
+def parse_address(address):
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
@@ -0,0 +1,255 @@
+# Shared state server for one competition
+#
+# One process owns the game state every stock1L.py worker shares: player
+# accounts, live prices, the order books and the standings. Workers started
+# with MOCKSTOCK_STATE_SERVER set send every game action here (see
+# state_client.py) instead of applying it to their own copy, so several
+# Streamlit processes behind a load balancer serve one consistent game.
+#
+# Requests arrive over a Unix socket or localhost TCP in the binary protocol
+# of state_protocol.py. Each connection gets a thread that reads every frame
+# that has arrived, handles them in order and writes all responses back in one
+# send, so pipelined requests cost one round trip. Actions on the game state
+# run one at a time under a lock; accounts are written to the game database in
+# the background (write-behind, one transaction per window).
+#
+# Usage:
+#   python state_server.py --listen unix:/tmp/mockstock.sock
+#   MOCKSTOCK_STATE_SERVER=unix:/tmp/mockstock.sock streamlit run stock1L.py --server.port 8501
+
+import argparse
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from game_config import (DATABASE_PATH, EXPERTS, JOURNAL_PATH, ROUND_SECONDS, STATE_SERVER, event_seed, load_market,
+                         load_round_passwords, news_data)
+from game_db import GameDatabase, SqliteLeaderboard
+from game_engine import GameEngine, Result
+from journal import EventJournal
+from leaderboard_store import NET_WORTH_COLUMN
+from order_book import MatchingEngine
+from player_state import Position
+from predictions import PredictionEngine
+from price_paths import LiveQuotes, PricePaths
+from round_clock import RoundClock
+from state_protocol import (ACCOUNT, APPLY_EVENTS, BASKET, BUY, CANCEL_ORDER, CLOSE_ROUND, DEPTH, ERROR, FOLLOW_CLOCK,
+                            OK, OPEN_ORDERS, OPEN_ROUND, PING, PLACE_ORDER, PREDICTION, PRICE, ROUND_ELAPSED, SELL,
+                            SUBMIT_ROUND, ProtocolError, frame, parse_address, read_frames)
+from write_behind import WriteBehind
+
+# Seconds of account changes written to the database in one go
+SAVE_WINDOW = 0.2
+# Seconds of round submissions the leaderboard writer groups into one commit
+LEADERBOARD_WRITE_WINDOW = 0.05
+RECV_SIZE = 65536
+
+
+# What a client needs to mirror an account after an action: cash, round, net worth,
+# every position and the trades from index `known` on
+def account_state(account, known):
+    return [
+        account.cash, account.round, account.net_worth,
+        [[company, *position.as_tuple()] for company, position in account.portfolio.items()],
+        account.transactions.rows(known),
+    ]
+
+
+# The game of one competition: a GameEngine plus every player's account
+class GameState:
+    def __init__(self, database, market, seed, round_seconds=ROUND_SECONDS, journal=None):
+        self.database = database
+        self.market = market
+        self.store = SqliteLeaderboard(database)
+        self.store.enable_write_behind(LEADERBOARD_WRITE_WINDOW)
+        self.store.start_watcher()
+        self.orders = MatchingEngine()
+        # Accounts are written out before a round closes, so the closing snapshot has every trade
+        self.clock = RoundClock(database, market, self.store, self.orders, before_close=self._save_all)
+        self.clock.start_watcher()
+        self._round_opened = {}
+        quotes = None
+        if round_seconds > 0:
+            quotes = LiveQuotes(PricePaths(market, news_data, seed, round_seconds=round_seconds), self.round_elapsed)
+        self.engine = GameEngine(market, EXPERTS, load_round_passwords(market), PredictionEngine(market, EXPERTS, seed),
+                                 self.orders, quotes, self.clock, journal)
+        self.accounts = {}
+        self._saved_trades = {}
+        self._lock = threading.RLock()
+        self._saves = WriteBehind(self._save, SAVE_WINDOW, name="state-server-save")
+        self._handlers = {
+            PING: lambda: "pong",
+            ACCOUNT: lambda name, known: self._account_action(name, known, lambda account: Result(True)),
+            BUY: lambda name, known, company, shares: self._account_action(name, known, self.engine.buy, company, shares),
+            SELL: lambda name, known, company, shares: self._account_action(name, known, self.engine.sell, company, shares),
+            BASKET: lambda name, known, legs: self._account_action(name, known, self.engine.basket, legs),
+            PLACE_ORDER: lambda name, known, company, side, shares, limit_price: self._account_action(
+                name, known, self.engine.place_order, company, side, shares, limit_price),
+            CANCEL_ORDER: lambda name, known, order_id: self._account_action(name, known, self.engine.cancel_order, order_id),
+            APPLY_EVENTS: lambda name, known: self._account_action(
+                name, known, lambda account: Result(True, value=self.engine.apply_order_events(account))),
+            PREDICTION: lambda name, known, expert: self._account_action(
+                name, known, self.engine.expert_prediction, expert, self.store.snapshot()),
+            SUBMIT_ROUND: self._submit_round,
+            FOLLOW_CLOCK: lambda name, known: self._account_action(
+                name, known, lambda account: Result(True, value=self.engine.follow_clock(account))),
+            PRICE: lambda round_number, company: self.engine.quotes.price_of(round_number, company),
+            OPEN_ORDERS: lambda name: self.orders.open_orders(name),
+            DEPTH: lambda company, levels: self.orders.depth(company, levels),
+            OPEN_ROUND: lambda round_number, duration: self._result(self.engine.open_round(round_number, duration)),
+            CLOSE_ROUND: lambda: self._result(self.engine.close_round()),
+            ROUND_ELAPSED: self.round_elapsed,
+        }
+
+    # Seconds since a round opened: on the round clock once it runs, otherwise since a player first reached it
+    def round_elapsed(self, round_number):
+        state = self.clock.state
+        if state.active and state.round == round_number:
+            return state.elapsed()
+        now = time.time()
+        return now - self._round_opened.setdefault(round_number, now)
+
+    # A player's account, loaded from the database (or created) on first use
+    def account(self, name):
+        account = self.accounts.get(name)
+        if account is None:
+            account = self.engine.new_account(name)
+            saved = self.database.load_player(name)
+            if saved:
+                self.engine.restore(account, saved)
+            standing = self.store.snapshot().get(name)
+            if standing:
+                account.net_worth = standing[NET_WORTH_COLUMN]
+            self.accounts[name] = account
+            self._saved_trades[name] = len(account.transactions)
+        return account
+
+    @staticmethod
+    def _result(result):
+        return [result.ok, result.message, result.value]
+
+    def _account_action(self, name, known, action, *args):
+        account = self.account(name)
+        result = action(account, *args)
+        self._saves.put(name, name)
+        return [result.ok, result.message, result.value, account_state(account, known)]
+
+    def _submit_round(self, name, known, password, confirmed):
+        response = self._account_action(name, known, self.engine.submit_round, password, confirmed)
+        if response[0]:
+            account = self.accounts[name]
+            self.store.submit(name, account.net_worth, account.round)
+        return response
+
+    # Handle one request; returns the response frame
+    def dispatch(self, request_id, code, args):
+        handler = self._handlers.get(code)
+        try:
+            if handler is None:
+                raise ProtocolError(f"Unknown opcode {code}")
+            with self._lock:
+                value = handler(*args)
+            return frame(request_id, OK, value)
+        except Exception as error:
+            return frame(request_id, ERROR, f"{type(error).__name__}: {error}")
+
+    # Write the players changed since their last save in one transaction; runs on the write-behind thread
+    def _save(self, names):
+        with self._lock:
+            players = []
+            saved_trades = {}
+            for name in names:
+                account = self.accounts[name]
+                portfolio = {company: Position(*position.as_tuple()) for company, position in account.portfolio.items()}
+                players.append((name, account.cash, account.round, portfolio,
+                                account.transactions.rows(self._saved_trades[name]), self.orders.open_orders(name)))
+                saved_trades[name] = len(account.transactions)
+        self.database.save_players(players)
+        with self._lock:
+            self._saved_trades.update(saved_trades)
+
+    # Write every account now; runs under the game lock when a round closes
+    def _save_all(self):
+        self._save(list(self.accounts))
+
+    def flush(self, timeout=5.0):
+        return self._saves.flush(timeout) and self.store.flush(timeout)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        if self.request.family == socket.AF_INET:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        state = self.server.state
+        buffer = bytearray()
+        while True:
+            try:
+                chunk = self.request.recv(RECV_SIZE)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buffer += chunk
+            try:
+                frames, consumed = read_frames(buffer)
+            except ProtocolError:
+                return
+            del buffer[:consumed]
+            if frames:
+                self.request.sendall(b"".join(state.dispatch(*request) for request in frames))
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+# Socket server for `address` ("unix:/path/to.sock" or "host:port") serving a GameState
+def make_server(address, state):
+    family, target = parse_address(address)
+    if family == socket.AF_UNIX:
+        # A socket file left behind by a server that did not shut down cleanly
+        if os.path.exists(target):
+            os.unlink(target)
+        server = _UnixServer(target, _Handler)
+    else:
+        server = _TCPServer(target, _Handler)
+    server.state = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one MockStock competition to several app workers")
+    parser.add_argument("--listen", default=STATE_SERVER or "unix:mockstock.sock",
+                        help='"unix:/path/to.sock" or "host:port" (default: $MOCKSTOCK_STATE_SERVER)')
+    parser.add_argument("--db", default=DATABASE_PATH, help="game database")
+    parser.add_argument("--journal", default=JOURNAL_PATH, help="event journal (default: $MOCKSTOCK_JOURNAL; none when unset)")
+    args = parser.parse_args()
+
+    database = GameDatabase(args.db)
+    database.import_csv("leaderboard.csv", "rumors.csv")
+    market = load_market()
+    seed = event_seed(market)
+    journal = EventJournal(args.journal, market.version, seed) if args.journal else None
+    state = GameState(database, market, seed, journal=journal)
+    server = make_server(args.listen, state)
+    print(f"State server listening on {args.listen}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        state.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,23 @@
 import streamlit as st
 import pandas as pd
-import random
 import os
+import time
+from itertools import zip_longest
+from game_db import GameDatabase, SqliteLeaderboard, SqliteRumorFeed
+from player_state import PlayerState, deep_sizeof
+from game_config import (DATABASE_PATH, EXPERTS, JOURNAL_PATH, ROUND_SECONDS, STATE_SERVER, event_seed, load_market,
+                         load_round_passwords, news_data)
+from profiling import REGISTRY, LapTimer, timed
+from order_book import BUY, SELL, MatchingEngine
+from predictions import PredictionEngine
+from game_engine import ALL_ROUNDS_COMPLETED, GameEngine
+from journal import RUMOR_POSTED, EventJournal
+from price_paths import LiveQuotes, PricePaths
+from round_clock import OPEN, RoundClock
+from state_client import RemoteGame, StateClient
+
+# Time each section of this run (see the performance panel at the bottom of the sidebar)
+rerun_timer = LapTimer("rerun")
 
 # Set page config as the first Streamlit command
 st.set_page_config(
@@ -58,172 +74,437 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # Initialize session state variables
-if 'round' not in st.session_state:
-    st.session_state.round = 1
-if 'cash' not in st.session_state:
-    st.session_state.cash = 100000  # Starting cash in hand
-if 'portfolio' not in st.session_state:
-    st.session_state.portfolio = {}
-if 'transactions' not in st.session_state:
-    st.session_state.transactions = []
+if 'player' not in st.session_state:
+    st.session_state.player = PlayerState(cash=100000)  # Cash, round, portfolio and trade log of this session
 if 'round_submitted' not in st.session_state:
     st.session_state.round_submitted = False
-if 'experts' not in st.session_state:
-    st.session_state.experts = {
-        "Expert 1": {"cost": 50000, "accuracy": 0.8},
-        "Expert 2": {"cost": 30000, "accuracy": 0.49},
-        "Expert 3": {"cost": 1000, "accuracy": 0.21}
-    }
 if 'prediction' not in st.session_state:
     st.session_state.prediction = None
-if 'players' not in st.session_state:
-    st.session_state.players = {}
 if 'show_success_message' not in st.session_state:
     st.session_state.show_success_message = False
-if 'rumors' not in st.session_state:
-    st.session_state.rumors = []
 if 'leaderboard_updated' not in st.session_state:
     st.session_state.leaderboard_updated = False
 
-# Store passwords for each round in a dictionary
-round_passwords = {
-    1: "apple",
-    2: "tegrat",
-    3: ""
-}
-
-# Dummy data for companies and their prices for three rounds
-companies = {
-    'Round 1': {'Company A': 100, 'Company B': 150, 'Company C': 200},
-    'Round 2': {'Company A': 110, 'Company B': 140, 'Company C': 210},
-    'Round 3': {'Company A': 120, 'Company B': 130}  # Company C is delisted in Round 3
-}
-
-# Dummy news data for each round
-news_data = {
-    'Round 1': [
-        "Company A announces record profits!",
-        "Company B faces regulatory scrutiny.",
-        "Company C launches a new product line."
-    ],
-    'Round 2': [
-        "Company A's profits decline due to market conditions.",
-        "Company B resolves regulatory issues and gains investor confidence.",
-        "Company C's new product receives mixed reviews."
-    ],
-    'Round 3': [
-        "Company A's stock surges after a major partnership.",
-        "Company B's stock drops due to unexpected losses.",
-        "Company C is delisted from the stock exchange."
-    ]
-}
-
-# Function to load rumors from CSV
+# Admin password for the performance panel (the panel is hidden when unset)
+ADMIN_PASSWORD = os.environ.get("MOCKSTOCK_ADMIN_PASSWORD")
+# File the timing histograms are dumped to (.json, otherwise Prometheus text); no dump when unset
+PROFILE_DUMP_PATH = os.environ.get("MOCKSTOCK_PROFILE_DUMP")
+
+# Shared price matrix (rounds x companies, NaN where a company is delisted)
+@st.cache_resource
+def get_market_data():
+    return load_market()
+
+market = get_market_data()
+
+# Password of each round (the app does not start while a round players submit has none)
+round_passwords = load_round_passwords(market)
+
+# Seed of this event's expert predictions and price paths
+EVENT_SEED = event_seed(market)
+
+# Shared expert prediction engine (predictions tied to the actual next-round price moves)
+@st.cache_resource
+def get_prediction_engine(scenario_version, event_seed):
+    return PredictionEngine(market, EXPERTS, event_seed)
+
+# Seconds between live price table refreshes
+PRICE_REFRESH_SECONDS = 2
+
+# Shared intra-round price paths, simulated once per scenario and event seed
+@st.cache_resource
+def get_price_paths(scenario_version, event_seed):
+    return PricePaths(market, news_data, event_seed, round_seconds=ROUND_SECONDS)
+
+# When each round's live prices started moving: the first time a session of this server reached it
+@st.cache_resource
+def get_round_opened():
+    return {}
+
+# Seconds since a round opened (on the organiser's clock once it is running); with a state server,
+# since the server opened it, so the price table shows the prices trades go through at
+def round_elapsed(round_number):
+    now = time.time()
+    state = get_round_clock().state
+    if state.active and state.round == round_number:
+        return state.elapsed(now)
+    if STATE_SERVER:
+        return now - game().round_opened(round_number)
+    return now - get_round_opened().setdefault(round_number, now)
+
+# Per-round render model: selectbox options, price table and news lines only change with the round
+# (cache_resource hands back the same objects instead of unpickling a copy on every rerun like cache_data)
+@st.cache_resource
+def get_round_view(round_number, scenario_version):
+    return {
+        'companies': list(market.listed(round_number)),
+        'prices_df': pd.DataFrame({
+            "Company": market.listed(round_number),
+            "Current Price (₹)": market.listed_price_array(round_number)
+        }),
+        'news': [f"- {news}" for news in news_data.get(f"Round {round_number}", [])]
+    }
+
+# Shared database (one connection pool per server process)
+@st.cache_resource
+def get_database():
+    database = GameDatabase(DATABASE_PATH)
+    # A fresh database starts from the standings and rumors of the old CSV files
+    database.import_csv("leaderboard.csv", "rumors.csv")
+    return database
+
+# Number of latest rumors shown on the page
+RUMOR_FEED_SIZE = 5
+
+# Shared rumor feed (one per server process, reused across sessions and reruns)
+@st.cache_resource
+def get_rumor_feed():
+    return SqliteRumorFeed(get_database(), size=RUMOR_FEED_SIZE)
+
+# Function to load the latest rumors of the current round (latest first)
+@timed()
 def load_rumors():
-    if os.path.exists("rumors.csv"):
-        try:
-            rumors_df = pd.read_csv("rumors.csv")
-            if not rumors_df.empty:
-                # Return only the last 5 rumors and reverse the order (latest first)
-                return rumors_df.to_dict('records')[-5:][::-1]
-        except pd.errors.EmptyDataError:
-            st.warning("Rumors file is empty.")
-    return []
-
-# Function to save rumors to CSV
-def save_rumors(rumors):
-    rumors_df = pd.DataFrame(rumors)
-    rumors_df.to_csv("rumors.csv", index=False)
+    feed = get_rumor_feed()
+    feed.refresh()
+    return feed.latest_for_round(st.session_state.player.round)
+
+# Function to add a rumor for the current round to the shared rumor table
+@timed()
+def save_rumors(rumor):
+    get_rumor_feed().append(rumor["source"], rumor["rumor"], st.session_state.player.round)
+    journal = get_journal(market.version, EVENT_SEED)
+    if journal is not None:
+        journal.append(RUMOR_POSTED, rumor["source"], st.session_state.player.round, rumor["rumor"])
+
+# Shared order books for player-to-player trading (one engine per server process)
+@st.cache_resource
+def get_matching_engine():
+    return MatchingEngine()
+
+# Shared event journal (MOCKSTOCK_JOURNAL); every process appends to the same file
+@st.cache_resource
+def get_journal(scenario_version, event_seed):
+    return EventJournal(JOURNAL_PATH, scenario_version, event_seed) if JOURNAL_PATH else None
+
+# Connection pool to the shared state server (MOCKSTOCK_STATE_SERVER)
+@st.cache_resource
+def get_state_client():
+    return StateClient(STATE_SERVER)
+
+# Shared game rules (one engine per server process, or the state server when one is configured);
+# the functions below only show their results
+@st.cache_resource
+def get_game_engine(scenario_version, event_seed):
+    if STATE_SERVER:
+        return RemoteGame(get_state_client(), market, get_round_clock())
+    quotes = LiveQuotes(get_price_paths(scenario_version, event_seed), round_elapsed) if ROUND_SECONDS > 0 else None
+    return GameEngine(market, EXPERTS, round_passwords, get_prediction_engine(scenario_version, event_seed),
+                      get_matching_engine(), quotes, get_round_clock(), get_journal(scenario_version, event_seed))
+
+def game():
+    return get_game_engine(market.version, EVENT_SEED)
 
 # Function to buy shares
-def buy_shares(company, shares, current_price):
-    total_cost = shares * current_price
-    if total_cost > st.session_state.cash:
-        st.error("Not enough cash to buy these shares!")
+def buy_shares(company, shares):
+    result = game().buy(st.session_state.player, company, shares)
+    if not result:
+        st.error(result.message)
     else:
-        if company not in st.session_state.portfolio:
-            st.session_state.portfolio[company] = {'shares': 0, 'total_spent': 0, 'total_received': 0}
-        st.session_state.portfolio[company]['shares'] += shares
-        st.session_state.portfolio[company]['total_spent'] += total_cost
-        st.session_state.cash -= total_cost
-        st.session_state.transactions.append({
-            'round': st.session_state.round,
-            'company': company,
-            'shares_bought': shares,
-            'shares_sold': 0,
-            'price': current_price
-        })
-        st.success(f"✅ Successfully bought {shares} shares of {company}!")
+        st.success(f"✅ {result.message}")
         st.rerun()
 
 # Function to sell shares
-def sell_shares(company, shares, current_price):
-    if company not in st.session_state.portfolio or st.session_state.portfolio[company]['shares'] < shares:
-        st.error("You don't own enough shares to sell!")
+def sell_shares(company, shares):
+    result = game().sell(st.session_state.player, company, shares)
+    if not result:
+        st.error(result.message)
     else:
-        total_received = shares * current_price
-        st.session_state.portfolio[company]['shares'] -= shares
-        st.session_state.portfolio[company]['total_received'] += total_received
-        st.session_state.cash += total_received
-        st.session_state.transactions.append({
-            'round': st.session_state.round,
-            'company': company,
-            'shares_bought': 0,
-            'shares_sold': shares,
-            'price': current_price
-        })
-        st.success(f"✅ Successfully sold {shares} shares of {company}!")
+        st.success(f"✅ {result.message}")
         st.rerun()
 
+# Multi-order ticket; runs as a fragment so submitting a basket only reruns this ticket, not the whole page
+@st.fragment
+def order_ticket(companies):
+    st.subheader("🧺 Multi-Order Ticket")
+    with st.form(key='basket_form', clear_on_submit=True):
+        st.write("Shares to buy (positive) or sell (negative) for each company:")
+        columns = st.columns(len(companies)) if companies else []
+        legs = {}
+        for column, company in zip(columns, companies):
+            legs[company] = column.number_input(company, step=1, value=0, key=f"basket_{company}")
+        submitted = st.form_submit_button("Place Orders")
+    # Handled after the form so the lines below already show the new cash and holdings (no st.rerun needed)
+    if submitted:
+        result = game().basket(st.session_state.player, legs)
+        if not result:
+            st.error(result.message)
+        else:
+            save_player_state()
+            st.success(f"✅ {result.message}")
+    st.write(f"💰 Cash in Hand (₹): {st.session_state.player.cash}")
+    held = {company: st.session_state.player.portfolio[company].shares for company in companies if company in st.session_state.player.portfolio}
+    if held:
+        st.write("Holdings: " + ", ".join(f"{company}: {shares}" for company, shares in held.items()))
+
+# Function to place a limit order; its cash or shares are reserved until it fills or is cancelled
+def place_limit_order(company, side, shares, limit_price):
+    result = game().place_order(st.session_state.player, company, side, shares, limit_price)
+    if not result:
+        st.error(result.message)
+        return
+    st.rerun()
+
+# Function to cancel a resting limit order (the reservation comes back with the cancellation)
+def cancel_limit_order(order_id):
+    result = game().cancel_order(st.session_state.player, order_id)
+    if not result:
+        st.error(result.message)
+        return
+    st.rerun()
+
 # Function to get expert prediction
+# The first request of a round prepares the predictions of every player on the leaderboard in one batch
 def get_expert_prediction(expert):
-    if expert not in st.session_state.experts:
-        return "Invalid expert selected."
-    cost = st.session_state.experts[expert]["cost"]
-    if st.session_state.cash < cost:
-        return "Not enough cash to pay the expert!"
-    st.session_state.cash -= cost
-    accuracy = st.session_state.experts[expert]["accuracy"]
-    if random.random() < accuracy:
-        prediction = f"{expert}'s prediction: The stock prices will rise in the next round!"
+    return game().expert_prediction(st.session_state.player, expert, get_leaderboard_store().snapshot()).message
+
+# Seconds between live leaderboard refreshes
+LEADERBOARD_REFRESH_SECONDS = 5
+# Seconds of round submissions the leaderboard writer groups into one commit
+LEADERBOARD_WRITE_WINDOW = 0.05
+
+# Shared leaderboard store (one per server process, reused across sessions and reruns)
+@st.cache_resource
+def get_leaderboard_store():
+    store = SqliteLeaderboard(get_database())
+    # Round submissions arrive in bursts; commit them in one transaction per window instead of one each
+    store.enable_write_behind(LEADERBOARD_WRITE_WINDOW)
+    # Picks up other processes' writes in the background so live views never touch the disk
+    store.start_watcher(LEADERBOARD_REFRESH_SECONDS)
+    return store
+
+# Seconds between round clock checks in each session
+CLOCK_REFRESH_SECONDS = 2
+
+# Shared round clock: once the organiser opens a round, every player trades in that round
+# and standings are valued for everyone at once when it closes
+@st.cache_resource
+def get_round_clock():
+    # With a state server, limit orders live there and only its clock closes rounds (see the admin panel)
+    if STATE_SERVER:
+        clock = RoundClock(get_database(), market, get_leaderboard_store(), auto_close=False)
     else:
-        prediction = f"{expert}'s prediction: The stock prices will fall in the next round."
-    return prediction
-
-# Function to calculate net worth
-def calculate_net_worth():
-    current_prices = companies[f"Round {st.session_state.round}"]
-    networth = st.session_state.cash
-    for company, data in st.session_state.portfolio.items():
-        current_price = current_prices.get(company, 0)
-        networth += data['shares'] * current_price
-    return networth
+        clock = RoundClock(get_database(), market, get_leaderboard_store(), get_matching_engine())
+    # Follows other processes' opens and closes, and (unless auto_close is off) closes rounds when their deadline passes
+    clock.start_watcher()
+    return clock
 
+# Function to queue the current player's standing for the leaderboard table (written by a background thread)
+@timed()
 def save_leaderboard():
-    # Unpack the dictionary to match the columns
-    leaderboard_data = [
-        [player, data["Net Worth (₹)"], data["Round"]]
-        for player, data in st.session_state.players.items()
-    ]
-    leaderboard_df = pd.DataFrame(leaderboard_data, columns=["Player", "Net Worth (₹)", "Round"])
-    leaderboard_df = leaderboard_df.sort_values(by="Net Worth (₹)", ascending=False)
-    leaderboard_df.to_csv("leaderboard.csv", index=False)
-
-# Function to load leaderboard from CSV
+    # The state server records standings itself when a round is submitted
+    if STATE_SERVER:
+        return
+    player = st.session_state.player
+    get_leaderboard_store().submit(player.name, player.net_worth, player.round)
+
+# Function to load the leaderboard from the database
+@timed()
 def load_leaderboard():
-    if os.path.exists("leaderboard.csv"):
-        try:
-            leaderboard_df = pd.read_csv("leaderboard.csv")
-            if not leaderboard_df.empty:
-                for _, row in leaderboard_df.iterrows():
-                    st.session_state.players[row["Player"]] = {
-                        "Net Worth (₹)": row["Net Worth (₹)"],
-                        "Round": row["Round"]
-                    }
-        except pd.errors.EmptyDataError:
-            st.warning("Leaderboard file is empty. Starting with a fresh leaderboard.")
+    # Sessions read the shared standings straight from the store instead of keeping a copy each
+    get_leaderboard_store().refresh()
+
+# What save_player_state() compares to skip saves: cash, round, number of trades, positions and open orders
+def saved_state_key(player, orders):
+    return (
+        player.cash,
+        player.round,
+        len(player.transactions),
+        tuple((company, *position.as_tuple()) for company, position in player.portfolio.items()),
+        tuple(tuple(order) for order in orders),
+    )
+
+# Function to save the player's cash, round, portfolio, open orders and new trades, when they changed since the last save
+# (the open orders are saved so their reserved cash and shares come back after a restart)
+@timed()
+def save_player_state():
+    # The state server owns and saves the accounts
+    if STATE_SERVER:
+        return
+    player = st.session_state.player
+    orders = game().open_orders(player)
+    state = saved_state_key(player, orders)
+    saved = st.session_state.get('saved_state')
+    if state == saved:
+        return
+    saved_trades = saved[2] if saved else 0
+    get_database().save_player(player.name, player.cash, player.round, player.portfolio,
+                               player.transactions.rows(saved_trades), orders)
+    st.session_state.saved_state = state
+
+# Sidebar panels run as fragments: using their widgets reruns only the panel, not the
+# leaderboard, rumor and table rendering of the whole page. Actions that change cash or
+# holdings (Buy, Sell, Get Prediction) still rerun the whole app through st.rerun().
+
+# Trade Shares panel
+@st.fragment
+@timed("fragment.trade_panel")
+def trade_panel(companies):
+    st.subheader("💼 Trade Shares")
+    company_selected = st.selectbox("Select Company", companies)
+    shares = st.number_input(f"Number of shares for {company_selected}", min_value=0, key=f"shares_{company_selected}")
+
+    # Buy/Sell buttons
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Buy"):
+            buy_shares(company_selected, shares)
+    with col2:
+        if st.button("Sell"):
+            sell_shares(company_selected, shares)
+
+# Calculator panel
+@st.fragment
+@timed("fragment.calculator")
+def calculator():
+    st.subheader("🧮 Calculator")
+    calc_num1 = st.number_input("Enter first number", key="calc_num1")
+    calc_operation = st.selectbox("Select operation", ["+", "-", "*", "/"], key="calc_operation")
+    calc_num2 = st.number_input("Enter second number", key="calc_num2")
+
+    # Perform calculation
+    if st.button("Calculate"):
+        if calc_operation == "+":
+            result = calc_num1 + calc_num2
+        elif calc_operation == "-":
+            result = calc_num1 - calc_num2
+        elif calc_operation == "*":
+            result = calc_num1 * calc_num2
+        elif calc_operation == "/":
+            if calc_num2 != 0:
+                result = calc_num1 / calc_num2
+            else:
+                result = "Error: Division by zero"
+        else:
+            result = "Invalid operation"
+        st.write(f"**Result:** {result}")
+
+# Expert Tips panel
+@st.fragment
+@timed("fragment.expert_tips")
+def expert_tips():
+    st.subheader("🔮 Get Expert Tips")
+    expert_selected = st.selectbox("Select an Expert", list(EXPERTS.keys()))
+    expert_cost = EXPERTS[expert_selected]["cost"]
+    st.write(f"💸 Cost: ₹{expert_cost}")
+
+    # Button to get expert prediction
+    if st.button("Get Prediction"):
+        prediction = get_expert_prediction(expert_selected)
+        st.session_state.prediction = prediction
+        st.rerun()
+
+    # Display prediction if it exists
+    if 'prediction' in st.session_state and st.session_state.prediction:
+        st.success(f"**🔮 Prediction:** {st.session_state.prediction}")
+        st.write(f"💵 Remaining Cash: ₹{st.session_state.player.cash}")
+
+# Rows shown at the top of the live leaderboard, and neighbours shown either side of the current player
+LEADERBOARD_TOP = 50
+LEADERBOARD_NEIGHBOURS = 2
+
+# Function to turn (rank, player, net worth) entries into leaderboard rows
+def leaderboard_rows(entries, standings):
+    return [[rank, player, net_worth, standings.get(player, {}).get("Round")] for rank, player, net_worth in entries]
+
+# Current prices; with live prices the table refreshes itself every few seconds and shows the
+# move since the round opened
+@st.fragment(run_every=PRICE_REFRESH_SECONDS if ROUND_SECONDS > 0 else None)
+@timed("fragment.prices")
+def live_prices(round_view):
+    st.subheader("📈 Current Stock Prices")
+    if ROUND_SECONDS <= 0:
+        st.table(round_view['prices_df'])
+        return
+    round_number = st.session_state.player.round
+    elapsed = round_elapsed(round_number)
+    paths = get_price_paths(market.version, EVENT_SEED)
+    opening = round_view['prices_df']["Current Price (₹)"].to_numpy()
+    ids = [market.ticker_id(company) for company in round_view['companies']]
+    prices = paths.prices_at(round_number, elapsed)[ids]
+    prices_df = round_view['prices_df'].assign(**{
+        "Current Price (₹)": prices.astype(opening.dtype),
+        "Change (%)": ((prices / opening - 1) * 100).round(2),
+    })
+    st.table(prices_df)
+    remaining = ROUND_SECONDS - elapsed
+    if remaining > 0:
+        st.caption(f"⏱️ Prices move for another {int(remaining) // 60}:{int(remaining) % 60:02d}")
+    else:
+        st.caption("⏱️ Prices are final for this round")
+
+# Round status on the organiser's clock; checks the shared clock every few seconds and reruns the
+# page when a round opened or closed since this session last drew it
+@st.fragment(run_every=CLOCK_REFRESH_SECONDS)
+@timed("fragment.round_status")
+def round_status():
+    clock = get_round_clock()
+    if st.session_state.get('clock_version', clock.version) != clock.version:
+        st.rerun()
+    state = clock.state
+    if not state.active:
+        return
+    st.subheader(f"⏱️ Round {state.round}")
+    if state.is_open():
+        remaining = state.remaining()
+        if remaining is None:
+            st.success("🟢 Trading is open.")
+        else:
+            st.success(f"🟢 Trading is open for another {int(remaining) // 60}:{int(remaining) % 60:02d}.")
+    elif state.round == market.n_rounds:
+        st.info("🎉 All rounds completed!")
     else:
-        st.warning("Leaderboard file not found. Starting with a fresh leaderboard.")
+        st.info(f"🔴 Round {state.round} is closed. Waiting for the organiser to open round {state.round + 1}.")
+
+# Live leaderboard; refreshes itself every few seconds from the shared in-memory standings.
+# Shows the top LEADERBOARD_TOP players from the store's rank index, plus the current player's
+# rank and neighbours when they are further down. The table is only rebuilt when the store's
+# version (or the player) changed since this session last drew it.
+@st.fragment(run_every=LEADERBOARD_REFRESH_SECONDS)
+@timed("fragment.leaderboard")
+def live_leaderboard():
+    st.subheader("🏆 Leaderboard")
+    store = get_leaderboard_store()
+    player = st.session_state.player
+    player_name = player.name
+    cached = st.session_state.get('leaderboard_view')
+    view_key = (store.version, player_name)
+    if cached is None or cached[0] != view_key:
+        standings = store.snapshot()
+        leaders, around = store.ranking(player_name, LEADERBOARD_TOP, LEADERBOARD_NEIGHBOURS)
+        leaderboard_data = leaderboard_rows(leaders, standings)
+        caption = None
+        if around and around[-1][0] > LEADERBOARD_TOP:
+            leaderboard_data += leaderboard_rows([entry for entry in around if entry[0] > LEADERBOARD_TOP], standings)
+            caption = f"Your rank: #{store.rank(player_name)} of {store.player_count()}"
+        elif not around and player_name:
+            # Players who registered but have not submitted a round yet are only known to their own session
+            leaderboard_data.append([None, player_name, player.net_worth, player.round])
+            caption = "Submit a round to get ranked."
+        leaderboard_df = pd.DataFrame(leaderboard_data, columns=["Rank", "Player", "Net Worth (₹)", "Round"])
+        leaderboard_df = leaderboard_df.astype({"Rank": "Int64"})
+
+        # Highlight the current player's row
+        def highlight_current_player(row):
+            if row["Player"] == player_name:
+                return ['background-color: #e3f2fd'] * len(row)
+            else:
+                return [''] * len(row)
+
+        cached = (view_key, leaderboard_df.style.apply(highlight_current_player, axis=1), caption)
+        st.session_state.leaderboard_view = cached
+    st.dataframe(cached[1], hide_index=True)
+    if cached[2]:
+        st.caption(cached[2])
 
 # Load leaderboard data at the start
 load_leaderboard()
@@ -231,120 +512,121 @@ load_leaderboard()
 # Streamlit app layout
 st.title("📈 F&IC LUCERIUM 2025")
 
+rerun_timer.lap("setup")
+
+# Projector view (?view=leaderboard): only the live leaderboard
+if st.query_params.get("view") == "leaderboard":
+    live_leaderboard()
+    st.stop()
+
 # Player registration
-if 'player_name' not in st.session_state:
+if st.session_state.player.name is None:
     player_name = st.text_input("Enter your name to join the competition:")
+    # Returning players get their saved account back, so a name is kept for whoever first joined with it
+    player_pin = st.text_input("Choose a PIN (returning players: enter yours):", type="password")
     if st.button("Register"):
-        if player_name:
-            st.session_state.player_name = player_name
-            st.session_state.players[player_name] = {"Net Worth (₹)": 0, "Round": 1}
+        if player_name and not player_pin:
+            st.error("Enter a PIN so nobody else can play as you!")
+        elif player_name and not get_database().claim_player(player_name, player_pin):
+            st.error("That name is taken. Enter its PIN to carry on, or pick another name.")
+        elif player_name:
+            game().register(st.session_state.player, player_name)
+            # Returning players (browser refresh, server restart) carry on where they left off
+            saved = get_database().load_player(player_name)
+            if saved or STATE_SERVER:
+                game().restore(st.session_state.player, saved)
+                # The restored trades are in the database already; only later ones get inserted (and saved
+                # orders handed back on restore are saved as gone right away)
+                st.session_state.saved_state = saved_state_key(st.session_state.player, saved['orders'] if saved else [])
+            standing = get_leaderboard_store().snapshot().get(player_name)
+            if standing:
+                st.session_state.player.net_worth = standing["Net Worth (₹)"]
+            save_player_state()
             st.success(f"🎉 Welcome, {player_name}!")
             st.rerun()
 else:
+    # Apply limit order fills and cancellations since the last run, follow the organiser's round clock once
+    # it is running and read the limit order panel (one round trip with a state server)
+    order_company = st.session_state.get("order_company") or next(iter(market.listed(st.session_state.player.round)), None)
+    view = game().refresh(st.session_state.player, order_company)
+    clock_state = get_round_clock().state
+    st.session_state.clock_version = get_round_clock().version
+    if view.moved:
+        st.session_state.prediction = None
+        standing = get_leaderboard_store().snapshot().get(st.session_state.player.name)
+        if standing:
+            st.session_state.player.net_worth = standing["Net Worth (₹)"]
+    # Persist whatever the previous run changed (trades and round submits end in st.rerun())
+    save_player_state()
+
     # Display the player's name in the sidebar
-    st.sidebar.write(f"👤 Hi, {st.session_state.player_name}!")
+    st.sidebar.write(f"👤 Hi, {st.session_state.player.name}!")
     
     st.sidebar.title("📊 F&IC LUCERIUM 2025")
-    st.sidebar.subheader(f"💰 Cash in Hand (₹): {st.session_state.cash}")
+    st.sidebar.subheader(f"💰 Cash in Hand (₹): {st.session_state.player.cash}")
 
     # Trade Shares section
-    st.sidebar.subheader("💼 Trade Shares")
-    current_prices = companies[f"Round {st.session_state.round}"]
-    company_selected = st.sidebar.selectbox("Select Company", list(current_prices.keys()))
-    shares = st.sidebar.number_input(f"Number of shares for {company_selected}", min_value=0, key=f"shares_{company_selected}")
-
-    # Buy/Sell buttons
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        if st.button("Buy"):
-            buy_shares(company_selected, shares, current_prices[company_selected])
-    with col2:
-        if st.button("Sell"):
-            sell_shares(company_selected, shares, current_prices[company_selected])
-
-    # Proceed to Next Round section
-    st.sidebar.subheader(f"🔑 Round {st.session_state.round} Password: `{round_passwords[st.session_state.round]}`")
-    st.sidebar.subheader("⏭️ Proceed to Next Round")
-    password = st.sidebar.text_input("Enter Password to Proceed to Next Round", type="password")
-    confirmation = st.sidebar.checkbox("I hereby confirm this.")
-
-    # Submit Round button with confirmation check
-    if st.sidebar.button("Submit Round"):
-        if not confirmation:
-            st.sidebar.error("❌ Please confirm by checking the box above.")
-        elif password == round_passwords[st.session_state.round]:
-            if st.session_state.round < 3:
-                st.session_state.round += 1
+    round_view = get_round_view(st.session_state.player.round, market.version)
+    with st.sidebar:
+        trade_panel(round_view['companies'])
+
+    rerun_timer.lap("trade_panel")
+
+    # Round status on the shared clock (shows nothing until the organiser opens the first round)
+    with st.sidebar:
+        round_status()
+
+    # Without the clock, players move on at their own pace with the round password
+    if not clock_state.active:
+        # Proceed to Next Round section
+        st.sidebar.subheader(f"🔑 Round {st.session_state.player.round} Password: `{round_passwords.get(st.session_state.player.round, '')}`")
+        st.sidebar.subheader("⏭️ Proceed to Next Round")
+        password = st.sidebar.text_input("Enter Password to Proceed to Next Round", type="password")
+        confirmation = st.sidebar.checkbox("I hereby confirm this.")
+
+        # Submit Round button with confirmation check
+        if st.sidebar.button("Submit Round"):
+            result = game().submit_round(st.session_state.player, password, confirmed=confirmation)
+            if result:
                 st.session_state.round_submitted = False
                 st.session_state.prediction = None
                 st.session_state.show_success_message = True
-                st.session_state.rumors = []
-                st.session_state.players[st.session_state.player_name] = {
-                    "Net Worth (₹)": calculate_net_worth(),
-                    "Round": st.session_state.round
-                }
                 save_leaderboard()
                 st.session_state.leaderboard_updated = True
                 st.rerun()
+            elif result.message == ALL_ROUNDS_COMPLETED:
+                st.sidebar.error(f"🎉 {result.message}")
             else:
-                st.sidebar.error("🎉 All rounds completed!")
-        else:
-            st.sidebar.error("❌ Incorrect password!")
+                st.sidebar.error(f"❌ {result.message}")
 
-    # Display success message after round submission
-    if st.session_state.show_success_message:
-        st.sidebar.success(f"✅ Round {st.session_state.round - 1} submitted successfully! Now play the next round {st.session_state.round}.")
-        st.session_state.show_success_message = False
+        # Display success message after round submission
+        if st.session_state.show_success_message:
+            st.sidebar.success(f"✅ Round {st.session_state.player.round - 1} submitted successfully! Now play the next round {st.session_state.player.round}.")
+            st.session_state.show_success_message = False
+
+    rerun_timer.lap("round_submit")
 
     # Calculator in the sidebar
-    st.sidebar.subheader("🧮 Calculator")
-    calc_num1 = st.sidebar.number_input("Enter first number", key="calc_num1")
-    calc_operation = st.sidebar.selectbox("Select operation", ["+", "-", "*", "/"], key="calc_operation")
-    calc_num2 = st.sidebar.number_input("Enter second number", key="calc_num2")
+    with st.sidebar:
+        calculator()
 
-    # Perform calculation
-    if st.sidebar.button("Calculate"):
-        if calc_operation == "+":
-            result = calc_num1 + calc_num2
-        elif calc_operation == "-":
-            result = calc_num1 - calc_num2
-        elif calc_operation == "*":
-            result = calc_num1 * calc_num2
-        elif calc_operation == "/":
-            if calc_num2 != 0:
-                result = calc_num1 / calc_num2
-            else:
-                result = "Error: Division by zero"
-        else:
-            result = "Invalid operation"
-        st.sidebar.write(f"**Result:** {result}")
+    rerun_timer.lap("calculator")
 
     # Expert Tips section
-    st.sidebar.subheader("🔮 Get Expert Tips")
-    expert_selected = st.sidebar.selectbox("Select an Expert", list(st.session_state.experts.keys()))
-    expert_cost = st.session_state.experts[expert_selected]["cost"]
-    st.sidebar.write(f"💸 Cost: ₹{expert_cost}")
-
-    # Button to get expert prediction
-    if st.sidebar.button("Get Prediction"):
-        prediction = get_expert_prediction(expert_selected)
-        st.session_state.prediction = prediction
-        st.rerun()
+    with st.sidebar:
+        expert_tips()
 
-    # Display prediction if it exists
-    if 'prediction' in st.session_state and st.session_state.prediction:
-        st.sidebar.success(f"**🔮 Prediction:** {st.session_state.prediction}")
-        st.sidebar.write(f"💵 Remaining Cash: ₹{st.session_state.cash}")
+    rerun_timer.lap("expert_tips")
 
     # Main content area
-    st.header(f"📊 Round {st.session_state.round}")
+    st.header(f"📊 Round {st.session_state.player.round}")
 
     # Display news articles and rumors for the current round
     st.subheader("📰 News and Rumors for This Round")
-    for news in news_data[f"Round {st.session_state.round}"]:
-        st.write(f"- {news}")
+    for news in round_view['news']:
+        st.write(news)
 
-    # Load and display rumors from CSV
+    # Load and display rumors from the database
     rumors = load_rumors()
     if rumors:
         st.write("**🗣️ Rumors:**")
@@ -360,32 +642,73 @@ else:
         st.markdown("</div>", unsafe_allow_html=True)
         if submit_rumor and rumor_text:
             new_rumor = {"source": rumor_source if rumor_source else "Anonymous", "rumor": rumor_text}
-            st.session_state.rumors.append(new_rumor)
-            save_rumors(st.session_state.rumors)
+            save_rumors(new_rumor)
             st.success("✅ Rumor submitted successfully!")
             st.rerun()
 
+    rerun_timer.lap("news_rumors")
+
     # Create two columns for Current Stock Prices and Transaction Summary
     col1, col2 = st.columns(2)
 
     # Display company names and current prices in a table (left column)
     with col1:
-        st.subheader("📈 Current Stock Prices")
-        current_prices_df = pd.DataFrame(list(current_prices.items()), columns=["Company", "Current Price (₹)"])
-        st.table(current_prices_df)
+        live_prices(round_view)
 
     # Display Transaction Summary in a table (right column)
     with col2:
         st.subheader("📝 Transaction Summary")
-        current_round_transactions = [t for t in st.session_state.transactions if t['round'] == st.session_state.round]
-        current_round_spent = sum(t['shares_bought'] * t['price'] for t in current_round_transactions)
-        current_round_received = sum(t['shares_sold'] * t['price'] for t in current_round_transactions)
-        net_cash_flow = current_round_received - current_round_spent
+        totals = st.session_state.player.round_totals.get(st.session_state.player.round, {'spent': 0, 'received': 0, 'trades': 0})
+        net_cash_flow = totals['received'] - totals['spent']
         transaction_summary_df = pd.DataFrame({
             "Metric": ["Total Amount Spent", "Total Amount Received", "Net Cash Flow"],
-            "Amount (₹)": [current_round_spent, current_round_received, net_cash_flow]
+            "Amount (₹)": [totals['spent'], totals['received'], net_cash_flow]
         })
         st.table(transaction_summary_df)
+        st.caption(f"Number of Trades: {totals['trades']}")
+
+    rerun_timer.lap("prices_summary")
+
+    # Buy and sell several companies in one order
+    order_ticket(round_view['companies'])
+
+    rerun_timer.lap("order_ticket")
+
+    # Limit orders: trade with other players through the shared order book
+    st.subheader("📒 Limit Orders")
+    order_company = st.selectbox("Company", round_view['companies'], key="order_company")
+    if order_company != view.company:
+        # Not the company read at the start of the run (the round changed)
+        view.price = game().price(st.session_state.player, order_company)
+        view.depth = game().depth(order_company)
+    col1, col2 = st.columns(2)
+    with col1:
+        with st.form(key='limit_order_form'):
+            order_side = st.radio("Side", [BUY, SELL], horizontal=True, format_func=str.title, key="order_side")
+            # Whole rupees, or paise for scenarios with fractional prices (number_input needs matching types)
+            order_price = view.price or 1
+            if market.whole_prices:
+                price_input = {"min_value": 1, "value": int(order_price), "step": 1}
+            else:
+                price_input = {"min_value": 0.01, "value": float(order_price), "step": 0.01, "format": "%.2f"}
+            order_price = st.number_input("Limit Price (₹)", key=f"order_price_{order_company}", **price_input)
+            order_shares = st.number_input("Number of Shares", min_value=1, key="order_shares")
+            if st.form_submit_button("Place Order"):
+                place_limit_order(order_company, order_side, order_shares, order_price)
+    with col2:
+        bids, asks = view.depth
+        st.write(f"**Order book for {order_company}**")
+        depth_rows = [[bid_qty, bid, ask, ask_qty] for (bid, bid_qty), (ask, ask_qty) in zip_longest(bids, asks, fillvalue=(None, None))]
+        st.table(pd.DataFrame(depth_rows, columns=["Bid Qty", "Bid (₹)", "Ask (₹)", "Ask Qty"]))
+        if view.open_orders:
+            st.write("**Your open orders**")
+            for order_id, company, side, limit_price, remaining in view.open_orders:
+                order_col, cancel_col = st.columns([3, 1])
+                order_col.write(f"{side.title()} {remaining} × {company} @ ₹{limit_price}")
+                if cancel_col.button("Cancel", key=f"cancel_order_{order_id}"):
+                    cancel_limit_order(order_id)
+
+    rerun_timer.lap("limit_orders")
 
     # Table for portfolio data (only display if there are transactions in the current round)
     st.subheader("💼 Your Portfolio")
@@ -394,52 +717,48 @@ else:
     total_received = 0
     total_networth = 0
 
-    # Only include companies with shares owned
-    for company, data in st.session_state.portfolio.items():
-        if data['shares'] > 0:  # Only include companies with shares owned
-            current_price = current_prices.get(company, 0)  # Get current price or 0 if delisted
-            networth = data['shares'] * current_price
-            table_data.append([company, current_price, data['shares'], data['total_spent'], data['total_received'], networth])
-            total_spent += data['total_spent']
-            total_received += data['total_received']
+    # Holdings are valued at the round's prices, like the submitted and leaderboard net worth
+    # (the live prices above are what trades go through at)
+    for company, position in st.session_state.player.portfolio.items():
+        if position.shares > 0:  # Only include companies with shares owned
+            current_price = market.price_of(st.session_state.player.round, company) or 0  # 0 if delisted
+            networth = position.shares * current_price
+            table_data.append([company, current_price, position.shares, position.total_spent, position.total_received, networth])
+            total_spent += position.total_spent
+            total_received += position.total_received
             total_networth += networth
 
     # Display table only if there are transactions
     if table_data:
-        df = pd.DataFrame(table_data, columns=["Company", "Current Price (₹)", "No. of shares", "Total amount spent", "Total amount received", "Networth"])
+        df = pd.DataFrame(table_data, columns=["Company", "Round Price (₹)", "No. of shares", "Total amount spent", "Total amount received", "Networth"])
         st.table(df)
         st.write(f"**💰 Total Portfolio Value (Networth): ₹{total_networth}**")
     else:
         st.write("No shares owned in the current round.")
 
+    rerun_timer.lap("portfolio")
+
     # Display leaderboard with round progress
-    st.subheader("🏆 Leaderboard")
-    leaderboard_data = []
-    for player, data in st.session_state.players.items():
-        leaderboard_data.append([player, data["Net Worth (₹)"], data["Round"]])
-    leaderboard_df = pd.DataFrame(leaderboard_data, columns=["Player", "Net Worth (₹)", "Round"])
-    leaderboard_df = leaderboard_df.sort_values(by="Net Worth (₹)", ascending=False)
-
-    # Highlight the current player's row
-    def highlight_current_player(row):
-        if row["Player"] == st.session_state.player_name:
-            return ['background-color: #e3f2fd'] * len(row)
-        else:
-            return [''] * len(row)
+    live_leaderboard()
 
-    st.dataframe(leaderboard_df.style.apply(highlight_current_player, axis=1))
+    rerun_timer.lap("leaderboard")
 
     # Final winner announcement
-    if st.session_state.round == 3 and password == round_passwords[st.session_state.round]:
+    if clock_state.active:
+        if clock_state.round == market.n_rounds and not clock_state.is_open():
+            st.success("🎉 Competition completed! The winner is the one with the highest net worth.")
+    elif st.session_state.player.round == market.n_rounds and password == round_passwords.get(st.session_state.player.round, ''):
         st.success("🎉 Competition completed! The winner is the one with the highest net worth.")
-        save_leaderboard()  # Save leaderboard data to CSV
+        save_leaderboard()  # Save leaderboard data to the database
+
+rerun_timer.lap("final")
 
 # Help section in the sidebar
 st.sidebar.subheader("❓ Help")
 st.sidebar.write("""
 - **Buy/Sell Shares**: Select a company and the number of shares to buy or sell.
 - **Expert Tips**: Pay for expert predictions to guide your decisions.
-- **Submit Round**: Enter the password to proceed to the next round.
+- **Submit Round**: Enter the password to proceed to the next round (when the organiser runs the round clock, rounds open and close for everyone at once).
 - **Rumors**: Submit and view rumors to stay ahead of the competition.
 """)
 
@@ -448,3 +767,42 @@ if st.sidebar.button("🔄 Reset Game (Admin Only)"):
     st.session_state.clear()
     st.success("Game reset successfully! Refresh the page to start over.")
     st.rerun()
+
+# Performance panel (for admins)
+if ADMIN_PASSWORD:
+    with st.sidebar.expander("⏱️ Performance (Admin Only)"):
+        if st.text_input("Admin password", type="password", key="admin_password") == ADMIN_PASSWORD:
+            st.dataframe(pd.DataFrame(REGISTRY.summary()), hide_index=True)
+            if st.button("Write Profile Dump"):
+                REGISTRY.dump(PROFILE_DUMP_PATH or "profile.json")
+                st.success(f"Timings written to {PROFILE_DUMP_PATH or 'profile.json'}")
+            if st.button("Reset Timings"):
+                REGISTRY.reset()
+            # Round clock: open and close rounds for every player at once (on the state server when there is one)
+            state = get_round_clock().state
+            st.write(f"**Round clock:** round {state.round} {state.status}" if state.active else "**Round clock:** not started (players use round passwords)")
+            round_minutes = st.number_input("Round length (minutes, 0 = no deadline)", min_value=0, value=0, key="round_minutes")
+            if st.button("Open Next Round", disabled=state.status == OPEN):
+                result = game().open_round(duration=round_minutes * 60)
+                if result:
+                    st.rerun()
+                st.error(result.message)
+            if st.button("Close Round", disabled=state.status != OPEN):
+                result = game().close_round()
+                if result:
+                    st.success(result.message)
+                else:
+                    st.error(result.message)
+            # Every expert prediction prepared for the current round, with the actual move
+            audit = get_prediction_engine(market.version, EVENT_SEED).audit(st.session_state.player.round)
+            st.download_button("Download Prediction Audit", pd.DataFrame(
+                audit, columns=["player", "expert", "company", "predicted", "actual"]
+            ).to_csv(index=False), file_name=f"predictions_round_{st.session_state.player.round}.csv")
+            # Bytes this session holds per session_state key (shared singletons are not counted)
+            session_bytes = {key: deep_sizeof(value) for key, value in st.session_state.to_dict().items()}
+            st.write(f"**Session memory:** {sum(session_bytes.values()):,} bytes")
+            st.dataframe(pd.DataFrame(sorted(session_bytes.items(), key=lambda item: item[1], reverse=True),
+                                      columns=["Key", "Bytes"]), hide_index=True)
+
+rerun_timer.finish()
+REGISTRY.maybe_dump(PROFILE_DUMP_PATH)
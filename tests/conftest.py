@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# Run stock1L.py against a fresh database in a temporary directory
+#
+# game_config reads the environment when it is imported, and shared resources
+# (database, engines, stores) are cached per process, so both are reset.
+@pytest.fixture
+def app_env(tmp_path, monkeypatch):
+    import streamlit as st
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MOCKSTOCK_DB", str(tmp_path / "mockstock.db"))
+    monkeypatch.setenv("MOCKSTOCK_ROUND_SECONDS", "0")
+    monkeypatch.delenv("MOCKSTOCK_STATE_SERVER", raising=False)
+    monkeypatch.delitem(sys.modules, "game_config", raising=False)
+    st.cache_resource.clear()
+    yield tmp_path
+    st.cache_resource.clear()
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+
+
+def _login(name, pin="1234"):
+    at = AppTest.from_file(os.path.join(ROOT, "stock1L.py"), default_timeout=30).run()
+    at.text_input[0].input(name)
+    at.text_input[1].input(pin)
+    at.button[0].click().run()
+    assert not at.exception, at.exception
+    return at
+
+
+def _trades(tmp_path, name):
+    with sqlite3.connect(tmp_path / "mockstock.db") as connection:
+        return connection.execute("SELECT COUNT(*) FROM trades WHERE player = ?", (name,)).fetchone()[0]
+
+
+def test_logging_in_again_does_not_save_restored_trades_again(app_env):
+    at = _login("alice")
+    at.sidebar.number_input[0].set_value(3).run()
+    [button for button in at.sidebar.button if button.label == "Buy"][0].click().run()
+    assert not at.exception, at.exception
+    assert _trades(app_env, "alice") == 1
+
+    for _ in range(3):
+        at = _login("alice")
+        player = at.session_state.player
+        assert len(player.transactions) == 1
+        assert player.round_totals[1]["spent"] == 300
+        assert player.cash == 99700
+    assert _trades(app_env, "alice") == 1
+
+
+def test_transaction_summary_counts_trades_outside_the_amount_column(app_env):
+    at = _login("bob")
+    at.sidebar.number_input[0].set_value(2).run()
+    [button for button in at.sidebar.button if button.label == "Buy"][0].click().run()
+    assert not at.exception, at.exception
+
+    [summary] = [table.value for table in at.table if "Metric" in table.value.columns]
+    assert list(summary["Metric"]) == ["Total Amount Spent", "Total Amount Received", "Net Cash Flow"]
+    assert "Number of Trades: 1" in [caption.value for caption in at.caption]
+
+
+def test_scenario_with_fractional_prices_can_place_limit_orders(app_env, monkeypatch):
+    scenario = app_env / "scenario.csv"
+    scenario.write_text("round,company,price\n1,X,10.5\n1,Y,20.25\n2,X,11.75\n2,Y,19.5\n")
+    monkeypatch.setenv("MOCKSTOCK_SCENARIO", str(scenario))
+    at = _login("carol")
+
+    price = [number for number in at.number_input if number.label == "Limit Price (₹)"][0]
+    assert price.value == 10.5
+    price.set_value(10.25)
+    [button for button in at.button if button.label == "Place Order"][0].click().run()
+    assert not at.exception, at.exception
+    assert at.session_state.player.cash == 100000 - 10.25
+    assert "Buy 1 × X @ ₹10.25" in [markdown.value for markdown in at.markdown]
+
+
+def test_open_orders_are_handed_back_after_a_restart(app_env):
+    import streamlit as st
+
+    at = _login("dave")
+    at.sidebar.number_input[0].set_value(4).run()
+    [button for button in at.sidebar.button if button.label == "Buy"][0].click().run()
+    for side, shares, price in (("Sell", 4, 150), ("Buy", 10, 90)):
+        at.radio(key="order_side").set_value(side.lower())
+        at.number_input(key="order_shares").set_value(shares)
+        [number for number in at.number_input if number.label == "Limit Price (₹)"][0].set_value(price)
+        [button for button in at.button if button.label == "Place Order"][0].click().run()
+        assert not at.exception, at.exception
+    assert at.session_state.player.cash == 100000 - 400 - 900
+    assert at.session_state.player.portfolio["Company A"].shares == 0
+
+    # A restart loses the in-memory order book
+    st.cache_resource.clear()
+    at = _login("dave")
+    player = at.session_state.player
+    assert player.cash == 100000 - 400
+    assert player.portfolio["Company A"].shares == 4
+    with sqlite3.connect(app_env / "mockstock.db") as connection:
+        assert connection.execute("SELECT COUNT(*) FROM open_orders").fetchone()[0] == 0
+        assert connection.execute("SELECT cash FROM players WHERE name = 'dave'").fetchone()[0] == 100000 - 400
+
+
+def test_saved_account_needs_its_pin(app_env):
+    at = _login("erin", pin="2468")
+    at.sidebar.number_input[0].set_value(5).run()
+    [button for button in at.sidebar.button if button.label == "Buy"][0].click().run()
+
+    at = _login("erin", pin="1357")
+    assert at.session_state.player.name is None
+    assert [error.value for error in at.error] == ["That name is taken. Enter its PIN to carry on, or pick another name."]
+    at = _login("erin", pin="")
+    assert at.session_state.player.name is None
+
+    at = _login("erin", pin="2468")
+    assert at.session_state.player.cash == 100000 - 500
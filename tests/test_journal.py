@@ -0,0 +1,75 @@
+import pytest
+
+from journal import BOUGHT, JOURNAL_STARTED, RECORD, EventJournal, journal_header, read_journal
+from state_protocol import encode
+
+
+def test_journal_starts_with_its_scenario_and_seed(tmp_path):
+    path = str(tmp_path / "game.journal")
+    journal = EventJournal(path, "abc", 7)
+    journal.append(BOUGHT, "alice", 1, "Company A", 3, 100.0)
+    journal.close()
+
+    assert journal_header(path) == ("abc", 7)
+    assert [(kind, fields) for _, _, kind, fields in read_journal(path)] == [
+        (JOURNAL_STARTED, ["abc", 7]),
+        (BOUGHT, ["alice", 1, "Company A", 3, 100.0]),
+    ]
+
+
+def test_reopening_appends_after_the_existing_records(tmp_path):
+    path = str(tmp_path / "game.journal")
+    EventJournal(path, "abc", 7).close()
+    journal = EventJournal(path, "abc", 7)
+    journal.append(BOUGHT, "bob", 1, "Company B", 1, 150.0)
+    journal.close()
+
+    assert [kind for _, _, kind, _ in read_journal(path)] == [JOURNAL_STARTED, BOUGHT]
+
+
+def test_journal_of_another_scenario_or_seed_is_refused(tmp_path):
+    path = str(tmp_path / "game.journal")
+    EventJournal(path, "abc", 7).close()
+    with pytest.raises(ValueError, match="was started with scenario abc and seed 7"):
+        EventJournal(path, "def", 7)
+    with pytest.raises(ValueError):
+        EventJournal(path, "abc", 8)
+
+
+def _recorded(path, offset=0):
+    return [(kind, fields) for _, _, kind, fields in read_journal(path, offset)]
+
+
+def _journal_of_three_trades(path):
+    journal = EventJournal(path, "abc", 7)
+    for shares in (1, 2, 3):
+        journal.append(BOUGHT, "alice", 1, "Company A", shares, 100.0)
+    journal.close()
+    return _recorded(path)
+
+
+def test_reading_stops_before_a_record_cut_short(tmp_path):
+    path = str(tmp_path / "game.journal")
+    records = _journal_of_three_trades(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    last = RECORD.size + len(encode(["alice", 1, "Company A", 3, 100.0]))
+    for cut in range(1, last + 1):
+        with open(path, "wb") as f:
+            f.write(data[:-cut])
+        assert _recorded(path) == records[:-1]
+
+
+def test_reading_stops_at_a_record_that_fails_its_checksum(tmp_path):
+    path = str(tmp_path / "game.journal")
+    records = _journal_of_three_trades(path)
+    offsets = [offset for offset, _, _, _ in read_journal(path)]
+    with open(path, "r+b") as f:
+        # Last payload byte of the second trade
+        f.seek(offsets[2] - 1)
+        byte = f.read(1)
+        f.seek(offsets[2] - 1)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    assert _recorded(path) == records[:2]
+    # Reading on from a record offset gives the records after it
+    assert _recorded(path, offsets[0]) == records[1:2]
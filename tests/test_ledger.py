@@ -0,0 +1,56 @@
+import pytest
+
+from ledger import LEDGER_COLUMNS, TransactionLedger
+
+
+def _ledger(*rows, capacity=64):
+    ledger = TransactionLedger(capacity)
+    for row in rows:
+        ledger.append(*row)
+    return ledger
+
+
+def test_later_purchases_do_not_change_an_earlier_sale():
+    ledger = _ledger((1, "A", 10, 0, 100), (1, "A", 0, 10, 110), (2, "A", 10, 0, 200))
+    assert ledger.realized_pnl() == {"A": 100.0}
+
+
+def test_sales_are_valued_at_the_running_average_cost():
+    ledger = _ledger(
+        (1, "A", 10, 0, 100), (1, "B", 5, 0, 50), (1, "A", 10, 0, 200),
+        # 20 shares of A cost 3000 (150 each); the 16 left cost 2400
+        (2, "A", 0, 4, 170), (2, "A", 4, 0, 120),
+        # Plus 4 @ 120: 20 shares cost 2880 (144 each)
+        (3, "A", 0, 20, 100), (3, "B", 0, 5, 40),
+    )
+    assert ledger.realized_pnl() == pytest.approx({"A": 4 * (170 - 150) + 20 * (100 - 144), "B": -50.0})
+
+
+def test_round_summary():
+    ledger = _ledger((1, "A", 10, 0, 100), (1, "B", 0, 2, 55.5), (2, "A", 0, 5, 120))
+    assert ledger.round_summary(1) == {"spent": 1000.0, "received": 111.0, "net": -889.0, "trades": 2}
+    assert ledger.round_summary(2) == {"spent": 0.0, "received": 600.0, "net": 600.0, "trades": 1}
+    assert ledger.round_summary(3) == {"spent": 0.0, "received": 0.0, "net": 0.0, "trades": 0}
+
+
+def test_company_summary():
+    ledger = _ledger((1, "A", 10, 0, 100), (1, "B", 3, 0, 50), (2, "A", 0, 4, 120))
+    summary = ledger.company_summary()
+    assert summary.to_dict("list") == {
+        "Company": ["A", "B"],
+        "Shares bought": [10, 3],
+        "Shares sold": [4, 0],
+        "Total amount spent": [1000.0, 150.0],
+        "Total amount received": [480.0, 0.0],
+    }
+
+
+@pytest.mark.parametrize("capacity", [0, 1, 3])
+def test_columns_grow_past_their_capacity(capacity):
+    rows = [(1 + i % 3, f"C{i % 7}", i, 0, 100 + i / 4) for i in range(100)]
+    ledger = _ledger(*rows, capacity=capacity)
+    assert len(ledger) == 100
+    assert ledger.rows() == rows
+    assert ledger.rows(98) == rows[98:]
+    assert list(ledger)[5] == dict(zip(LEDGER_COLUMNS, rows[5]))
+    assert ledger.to_dataframe().values.tolist() == [list(row) for row in rows]
@@ -0,0 +1,111 @@
+import pytest
+
+from game_config import EXPERTS, companies, round_passwords
+from game_engine import GameEngine
+from market_data import MarketData
+from order_book import BUY, SELL, MatchingEngine
+
+
+@pytest.fixture
+def engine():
+    return GameEngine(MarketData.from_dict(companies), EXPERTS, round_passwords, orders=MatchingEngine())
+
+
+def test_players_cannot_cancel_each_others_orders(engine):
+    alice = engine.new_account("alice")
+    mallory = engine.new_account("mallory")
+    order_id = engine.place_order(alice, "Company A", BUY, 5, 90).value
+
+    assert not engine.cancel_order(mallory, order_id)
+    # Straight to the matching engine as well
+    engine.orders.cancel(order_id, "mallory")
+    engine.orders.sync()
+    assert [order[0] for order in engine.open_orders(alice)] == [order_id]
+
+    assert engine.cancel_order(alice, order_id)
+    assert engine.apply_order_events(alice) == 1
+    assert alice.cash == 100000
+
+
+def test_orders_need_a_company_listed_this_round(engine):
+    alice = engine.new_account("alice")
+    alice.round = 3
+    result = engine.place_order(alice, "Company C", BUY, 1, 100)
+    assert not result
+    assert result.message == "Company C is not listed this round!"
+    assert not engine.place_order(alice, "Company Z", BUY, 1, 100)
+
+
+def test_submitting_a_round_cancels_the_players_orders(engine):
+    alice = engine.new_account("alice")
+    bob = engine.new_account("bob")
+    assert engine.buy(alice, "Company C", 2)
+    assert engine.place_order(alice, "Company C", SELL, 2, 250)
+    assert engine.place_order(alice, "Company A", BUY, 10, 90)
+    bob_order = engine.place_order(bob, "Company B", BUY, 1, 100).value
+
+    assert engine.submit_round(alice, round_passwords[1])
+
+    assert engine.open_orders(alice) == []
+    assert alice.cash == 100000 - 400
+    assert alice.portfolio["Company C"].shares == 2
+    # Valued at round 2 prices with the reservations back
+    assert alice.net_worth == 100000 - 400 + 2 * 210
+    assert [order[0] for order in engine.open_orders(bob)] == [bob_order]
+
+
+def test_engine_without_order_book_refuses_limit_orders():
+    engine = GameEngine(MarketData.from_dict(companies), EXPERTS, round_passwords)
+    alice = engine.new_account("alice")
+    for result in (engine.place_order(alice, "Company A", BUY, 1, 100), engine.cancel_order(alice, 1)):
+        assert not result
+        assert result.message == "Limit orders are not available."
+    assert alice.cash == 100000
+
+
+def _fills(matching, player):
+    return [(event.order_id, event.price, event.quantity) for event in matching.drain(player) if event.kind == "fill"]
+
+
+def test_better_prices_fill_first_then_earlier_orders():
+    matching = MatchingEngine()
+    late = matching.submit("carol", "Company A", SELL, 101, 5)
+    early = matching.submit("alice", "Company A", SELL, 101, 5)
+    cheapest = matching.submit("bob", "Company A", SELL, 100, 5)
+    assert matching.sync()
+    # Same price: the earlier of the two asks at 101 is `late` (submitted first)
+    buy = matching.submit("dave", "Company A", BUY, 101, 12)
+    assert matching.sync()
+
+    assert _fills(matching, "dave") == [(buy, 100, 5), (buy, 101, 5), (buy, 101, 2)]
+    assert _fills(matching, "bob") == [(cheapest, 100, 5)]
+    assert _fills(matching, "carol") == [(late, 101, 5)]
+    assert _fills(matching, "alice") == [(early, 101, 2)]
+    assert matching.open_orders("alice") == [(early, "Company A", SELL, 101, 3)]
+    assert matching.depth("Company A") == ([], [(101, 3)])
+
+
+def test_partial_fill_rests_the_remainder_at_the_limit_price():
+    matching = MatchingEngine()
+    ask = matching.submit("alice", "Company B", SELL, 150, 4)
+    bid = matching.submit("bob", "Company B", BUY, 155, 10)
+    assert matching.sync()
+
+    # Fills at the resting order's price, the rest of the bid waits in the book
+    assert _fills(matching, "bob") == [(bid, 150, 4)]
+    assert _fills(matching, "alice") == [(ask, 150, 4)]
+    assert matching.open_orders("alice") == []
+    assert matching.open_orders("bob") == [(bid, "Company B", BUY, 155, 6)]
+    assert matching.depth("Company B") == ([(155, 6)], [])
+
+    # A bid below the best ask does not cross
+    matching.submit("carol", "Company B", SELL, 160, 1)
+    assert matching.sync()
+    assert _fills(matching, "carol") == []
+    assert matching.depth("Company B") == ([(155, 6)], [(160, 1)])
+
+    matching.cancel(bid, "bob")
+    assert matching.sync()
+    [event] = matching.drain("bob")
+    assert (event.kind, event.order_id, event.quantity, event.price) == ("cancelled", bid, 6, 155)
+    assert matching.depth("Company B") == ([], [(160, 1)])
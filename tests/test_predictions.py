@@ -0,0 +1,49 @@
+from game_config import EXPERTS, companies, round_passwords
+from game_engine import GameEngine
+from market_data import MarketData
+from predictions import PredictionEngine
+
+
+class _CountingPredictions(PredictionEngine):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.batch_sizes = []
+
+    def prepare_round(self, round_number, players):
+        self.batch_sizes.append(len(players))
+        return super().prepare_round(round_number, players)
+
+
+def _engine():
+    market = MarketData.from_dict(companies)
+    return GameEngine(market, EXPERTS, round_passwords, _CountingPredictions(market, EXPERTS, 42))
+
+
+def test_the_field_is_prepared_once_per_round():
+    engine = _engine()
+    field = {f"player{i}": None for i in range(500)}
+    accounts = [engine.new_account(f"player{i}") for i in range(3)]
+
+    for account in accounts:
+        assert engine.expert_prediction(account, "Expert 3", field)
+
+    # One batch for the field, then one lookup per request
+    assert engine.predictions.batch_sizes == [500, 1, 1, 1]
+    assert len(engine.predictions.audit(1)) == 500 * len(EXPERTS) * 3
+
+
+def test_batched_predictions_match_one_by_one_predictions():
+    batched = _engine()
+    single = _engine()
+    field = [f"player{i}" for i in range(50)]
+    batched.predictions.prepare_batch(1, field)
+    for name in ("player7", "player49"):
+        for expert in EXPERTS:
+            assert batched.predictions.predict(1, name, expert) == single.predictions.predict(1, name, expert)
+
+
+def test_an_empty_field_does_not_use_up_the_round():
+    engine = _engine()
+    assert not engine.predictions.prepare_batch(1, {})
+    assert engine.predictions.prepare_batch(1, ["alice", "bob"])
+    assert not engine.predictions.prepare_batch(1, ["carol"])
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from rank_index import RankIndex
+
+
+# Standings the slow way: sorted by net worth (highest first), ties by name
+def _reference(net_worths):
+    ordered = sorted(net_worths.items(), key=lambda item: (-item[1], item[0]))
+    return [(rank, player, net_worth) for rank, (player, net_worth) in enumerate(ordered, start=1)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_updates_match_a_sorted_reference(seed):
+    rng = random.Random(seed)
+    index = RankIndex(seed=seed)
+    net_worths = {}
+    for step in range(2000):
+        player = f"p{rng.randrange(300)}"
+        if rng.random() < 0.1:
+            index.remove(player)
+            net_worths.pop(player, None)
+        else:
+            # Few distinct values, so ties (ordered by name) are common
+            net_worth = rng.randrange(50) * 1000
+            index.update(player, net_worth)
+            net_worths[player] = net_worth
+        if step % 250 == 0 or step == 1999:
+            expected = _reference(net_worths)
+            assert len(index) == len(net_worths)
+            assert index.top(len(expected) + 5) == expected
+            assert index.top(10) == expected[:10]
+            for rank, player, _ in expected:
+                assert index.rank(player) == rank
+            for start in (1, 2, len(expected) // 2, len(expected)):
+                assert index.slice(start, 7) == expected[start - 1:start + 6]
+
+
+def test_around_clips_at_both_ends():
+    index = RankIndex(seed=1)
+    net_worths = {f"p{i}": 1000 * i for i in range(10)}
+    for player, net_worth in net_worths.items():
+        index.update(player, net_worth)
+    expected = _reference(net_worths)
+    for rank, player, _ in expected:
+        assert index.around(player, 2) == expected[max(rank - 3, 0):rank + 2]
+    assert index.around("nobody") == []
+
+
+def test_unchanged_and_removed_players():
+    index = RankIndex(seed=2)
+    index.update("alice", 500)
+    index.update("bob", 700)
+    index.update("alice", 500)
+    assert index.top(5) == [(1, "bob", 700), (2, "alice", 500)]
+    index.remove("bob")
+    index.remove("bob")
+    assert "bob" not in index
+    assert index.rank("bob") is None
+    assert index.top(5) == [(1, "alice", 500)]
@@ -0,0 +1,95 @@
+import pytest
+
+from game_config import EXPERTS, companies, round_passwords
+from game_engine import GameEngine
+from journal import EventJournal
+from market_data import MarketData
+from order_book import BUY, SELL, MatchingEngine
+from predictions import PredictionEngine
+from replay import Replayer
+from state_protocol import encode
+from state_server import account_state
+
+SEED = 11
+
+
+@pytest.fixture
+def market():
+    return MarketData.from_dict(companies)
+
+
+@pytest.fixture
+def game(market, tmp_path):
+    path = str(tmp_path / "game.journal")
+    journal = EventJournal(path, market.version, SEED)
+    engine = GameEngine(market, EXPERTS, round_passwords, PredictionEngine(market, EXPERTS, SEED),
+                        orders=MatchingEngine(), journal=journal)
+    yield engine, path
+    journal.close()
+
+
+def _play_round_one(engine, players):
+    alice = players["alice"] = engine.new_account("alice")
+    bob = players["bob"] = engine.new_account("bob")
+    assert engine.buy(alice, "Company A", 10)
+    assert engine.sell(alice, "Company A", 4)
+    assert engine.basket(bob, {"Company B": 3, "Company C": 2})
+    assert engine.place_order(alice, "Company A", SELL, 6, 95)
+    assert engine.place_order(bob, "Company A", BUY, 4, 100)
+    assert engine.apply_order_events(alice) == 1
+    assert engine.apply_order_events(bob) == 1
+    assert engine.expert_prediction(alice, next(iter(EXPERTS)), players)
+    assert engine.submit_round(alice, round_passwords[1])
+    assert engine.submit_round(bob, round_passwords[1])
+
+
+def _play_round_two(engine, players):
+    alice, bob = players["alice"], players["bob"]
+    assert engine.buy(bob, "Company C", 5)
+    assert engine.sell(alice, "Company A", 2)
+    assert engine.submit_round(bob, round_passwords[2])
+
+
+def _states(accounts):
+    return {name: account_state(account, 0) for name, account in accounts.items()}
+
+
+def test_replay_rebuilds_every_account(game, market):
+    engine, path = game
+    players = {}
+    _play_round_one(engine, players)
+    _play_round_two(engine, players)
+
+    replayer = Replayer(market, SEED)
+    assert replayer.replay(path) == replayer.events > 0
+    assert replayer.discrepancies == []
+    assert _states(replayer.accounts) == _states(players)
+    # Bob has moved on to round 3 since; at the end of round 2 Alice is still playing it
+    assert replayer.accounts_at(2)["bob"].round == 3
+    assert _states(replayer.accounts_at(1))["bob"] == replayer.round_ends[1]["bob"]
+
+
+def test_resuming_from_a_checkpoint_matches_a_full_replay(game, market, tmp_path):
+    engine, path = game
+    checkpoint = str(tmp_path / "game.checkpoint")
+    players = {}
+    _play_round_one(engine, players)
+    first = Replayer(market, SEED)
+    first.replay(path)
+    first.save_checkpoint(checkpoint)
+
+    _play_round_two(engine, players)
+    resumed = Replayer(market, SEED)
+    assert resumed.load_checkpoint(checkpoint, 10**9)
+    assert resumed.replay(path) > 0
+    full = Replayer(market, SEED)
+    full.replay(path)
+
+    assert resumed.offset == full.offset
+    assert resumed.events == full.events
+    assert resumed.discrepancies == full.discrepancies == []
+    assert _states(resumed.accounts) == _states(full.accounts) == _states(players)
+    # Checkpoints store tuples as lists
+    assert encode(resumed.round_ends) == encode(full.round_ends)
+    # A checkpoint of another seed is not used
+    assert not Replayer(market, SEED + 1).load_checkpoint(checkpoint, 10**9)
@@ -0,0 +1,107 @@
+import pytest
+
+from game_config import EXPERTS, companies, round_passwords
+from game_db import GameDatabase, SqliteLeaderboard
+from game_engine import GameEngine
+from market_data import MarketData
+from order_book import BUY, SELL, MatchingEngine
+from round_clock import RoundClock
+
+
+@pytest.fixture
+def game(tmp_path):
+    database = GameDatabase(str(tmp_path / "game.db"))
+    market = MarketData.from_dict(companies)
+    orders = MatchingEngine()
+    clock = RoundClock(database, market, SqliteLeaderboard(database), orders)
+    engine = GameEngine(market, EXPERTS, round_passwords, orders=orders, clock=clock)
+    yield database, clock, engine
+    database.close()
+
+
+def _save(database, account):
+    database.save_player(account.name, account.cash, account.round, account.portfolio, account.transactions.rows())
+
+
+def test_close_round_values_fills_players_have_not_picked_up(game):
+    database, clock, engine = game
+    clock.open_round(1)
+    alice = engine.new_account("alice")
+    bob = engine.new_account("bob")
+    assert engine.buy(alice, "Company A", 10)
+    assert engine.place_order(alice, "Company A", SELL, 10, 100)
+    assert engine.place_order(bob, "Company A", BUY, 10, 100)
+    _save(database, alice)
+    _save(database, bob)
+
+    net_worths = clock.close_round()
+
+    # Alice sold her 10 shares at 100; Bob holds them, valued at round 2's price of 110
+    assert net_worths == {"alice": 100000, "bob": 99000 + 10 * 110}
+    engine.apply_order_events(alice)
+    engine.apply_order_events(bob)
+    assert alice.cash == 100000
+    assert bob.portfolio["Company A"].shares == 10
+
+
+def test_close_round_returns_reservations_of_open_orders(game):
+    database, clock, engine = game
+    clock.open_round(1)
+    carol = engine.new_account("carol")
+    assert engine.buy(carol, "Company B", 4)
+    assert engine.place_order(carol, "Company B", SELL, 4, 500)
+    assert engine.place_order(carol, "Company C", BUY, 2, 150)
+    _save(database, carol)
+
+    # 4 Company B at 140 and the 300 reserved for the buy order
+    assert clock.close_round() == {"carol": 100000 - 600 - 300 + 300 + 4 * 140}
+    # Orders do not outlive their round; the reservations come back to the player
+    assert engine.open_orders(carol) == []
+    assert engine.apply_order_events(carol) == 2
+    assert carol.cash == 100000 - 600
+    assert carol.portfolio["Company B"].shares == 4
+
+
+def test_saved_orders_outlive_a_restart(game, tmp_path):
+    database, clock, engine = game
+    dave = engine.new_account("dave")
+    assert engine.buy(dave, "Company A", 5)
+    assert engine.place_order(dave, "Company A", SELL, 5, 150)
+    assert engine.place_order(dave, "Company B", BUY, 10, 100)
+    database.save_player(dave.name, dave.cash, dave.round, dave.portfolio, dave.transactions.rows(),
+                         engine.open_orders(dave))
+
+    # A new process: its order book is empty
+    market = MarketData.from_dict(companies)
+    orders = MatchingEngine()
+    restarted = GameEngine(market, EXPERTS, round_passwords, orders=orders)
+    clock = RoundClock(database, market, SqliteLeaderboard(database), orders)
+    clock.open_round(1)
+    # The 1000 reserved for the buy order and the 5 shares offered are still Dave's
+    assert clock.close_round() == {"dave": 100000 - 500 + 5 * 110}
+
+    dave = restarted.new_account("dave")
+    restarted.restore(dave, database.load_player("dave"))
+    assert dave.cash == 100000 - 500
+    assert dave.portfolio["Company A"].shares == 5
+    assert restarted.open_orders(dave) == []
+
+
+def test_restore_leaves_orders_the_book_still_has(game):
+    database, clock, engine = game
+    erin = engine.new_account("erin")
+    frank = engine.new_account("frank")
+    resting = engine.place_order(erin, "Company A", BUY, 2, 90).value
+    filled = engine.place_order(erin, "Company B", BUY, 3, 150).value
+    assert engine.buy(frank, "Company B", 3)
+    assert engine.place_order(frank, "Company B", SELL, 3, 150)
+    database.save_player(erin.name, erin.cash, erin.round, erin.portfolio, erin.transactions.rows(),
+                         [(resting, "Company A", BUY, 90, 2), (filled, "Company B", BUY, 150, 3)])
+
+    # Erin logs in again in the same process: the resting order and the fill waiting for her stay in the book
+    erin = engine.new_account("erin")
+    engine.restore(erin, database.load_player("erin"))
+    assert erin.cash == 100000 - 180 - 450
+    assert engine.apply_order_events(erin) == 1
+    assert erin.portfolio["Company B"].shares == 3
+    assert [order[0] for order in engine.open_orders(erin)] == [resting]
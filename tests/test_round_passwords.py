@@ -0,0 +1,33 @@
+import pytest
+
+import game_config
+from game_config import EXPERTS, companies, load_round_passwords
+from game_engine import GameEngine
+from market_data import MarketData
+
+FOUR_ROUNDS = MarketData.from_dict({**companies, 'Round 4': {'Company A': 125, 'Company B': 120}})
+
+
+def test_built_in_passwords_cover_the_built_in_rounds():
+    assert load_round_passwords(MarketData.from_dict(companies)) == game_config.round_passwords
+
+
+def test_a_scenario_with_more_rounds_than_passwords_is_refused():
+    with pytest.raises(ValueError, match="No password for round 3 of 4"):
+        load_round_passwords(FOUR_ROUNDS)
+
+
+def test_passwords_from_the_environment(monkeypatch):
+    monkeypatch.setattr(game_config, "ROUND_PASSWORDS", "one, two,three")
+    assert load_round_passwords(FOUR_ROUNDS) == {1: "one", 2: "two", 3: "three"}
+
+
+def test_a_round_without_password_cannot_be_submitted():
+    engine = GameEngine(FOUR_ROUNDS, EXPERTS, game_config.round_passwords)
+    account = engine.new_account("alice")
+    account.round = 3
+    result = engine.submit_round(account, "")
+    assert not result
+    assert account.round == 3
+    account.round = 4
+    assert engine.submit_round(account, "").message == "All rounds completed!"
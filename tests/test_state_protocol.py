@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from state_protocol import HEADER, MAX_FRAME, PING, ProtocolError, decode, encode, frame, read_frames
+
+
+@pytest.mark.parametrize("value", [
+    None, True, False, 0, -1, 2**63 - 1, -2**63, 0.0, -2.5, 1e300, "", "Company A", "₹ ünïcödé",
+    [], [1, "two", 3.0, None, [True, False]], {}, {"cash": 100000.0, "portfolio": {"Company A": [3, 100.0]}},
+    {1: "one", 2: ["two"]},
+])
+def test_values_survive_a_round_trip(value):
+    decoded = decode(encode(value))
+    assert decoded == value
+    assert type(decoded) is type(value)
+
+
+def test_tuples_and_numpy_scalars_decode_as_plain_values():
+    assert decode(encode((1, ("a", 2.5)))) == [1, ["a", 2.5]]
+    value = decode(encode([np.int64(7), np.float64(1.5), np.bool_(True)]))
+    assert value == [7, 1.5, True]
+    assert [type(item) for item in value] == [int, float, bool]
+
+
+def test_bad_values_and_payloads_are_protocol_errors():
+    with pytest.raises(ProtocolError):
+        encode(object())
+    with pytest.raises(ProtocolError):
+        decode(b"?")
+    with pytest.raises(ProtocolError):
+        decode(encode(1) + b"N")
+
+
+@pytest.mark.parametrize("value", ["Company A", "₹ ünïcödé", 12, 1.5, [1, 2, 3], {"a": [1, "b"]}])
+def test_truncated_payloads_are_protocol_errors(value):
+    data = encode(value)
+    for end in range(len(data)):
+        with pytest.raises(ProtocolError):
+            decode(data[:end])
+
+
+def test_read_frames_waits_for_whole_frames():
+    data = frame(1, PING, ["hello", 1]) + frame(2, PING, {"a": None})
+    first = len(frame(1, PING, ["hello", 1]))
+    for end in range(first):
+        assert read_frames(bytearray(data[:end])) == ([], 0)
+    assert read_frames(bytearray(data[:first + 3])) == ([(1, PING, ["hello", 1])], first)
+    assert read_frames(bytearray(data)) == ([(1, PING, ["hello", 1]), (2, PING, {"a": None})], len(data))
+
+
+def test_oversized_frames_are_refused():
+    with pytest.raises(ProtocolError, match="too large"):
+        read_frames(bytearray(HEADER.pack(MAX_FRAME + 1, 1, PING)))
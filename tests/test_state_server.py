@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from game_config import companies
+from game_db import GameDatabase, SqliteLeaderboard
+from market_data import MarketData
+from order_book import BUY, SELL
+from round_clock import RoundClock
+from state_client import RemoteGame, StateClient
+from state_server import GameState, make_server
+
+
+@pytest.fixture
+def remote(tmp_path):
+    database = GameDatabase(str(tmp_path / "game.db"))
+    market = MarketData.from_dict(companies)
+    address = f"unix:{tmp_path / 'state.sock'}"
+    state = GameState(database, market, seed=1, round_seconds=0)
+    server = make_server(address, state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # A worker's view: its own clock follows the database but never closes rounds
+    clock = RoundClock(database, market, SqliteLeaderboard(database), auto_close=False)
+    client = StateClient(address)
+    yield RemoteGame(client, market, clock), clock, state
+    client.close()
+    server.shutdown()
+    server.server_close()
+    database.close()
+
+
+def test_worker_closes_rounds_through_the_server(remote):
+    game, clock, _ = remote
+    assert game.open_round()
+    assert clock.state.round == 1
+    alice = game.new_account("alice")
+    assert game.buy(alice, "Company A", 10)
+    # 10 x 105 reserved by a resting buy order, held on the server
+    assert game.place_order(alice, "Company B", BUY, 10, 105)
+
+    result = game.close_round()
+
+    assert result, result.message
+    # The closing snapshot has the server's latest trades and the order's reservation
+    assert result.value == {"alice": 100000 - 1000 + 10 * 110}
+    assert not clock.state.is_open()
+    assert not game.close_round()
+
+
+def test_worker_clock_leaves_expired_rounds_to_the_server(tmp_path):
+    database = GameDatabase(str(tmp_path / "game.db"))
+    market = MarketData.from_dict(companies)
+    clock = RoundClock(database, market, SqliteLeaderboard(database), auto_close=False)
+    clock.open_round(duration=0.01)
+    clock.start_watcher(0.01)
+    threading.Event().wait(0.1)
+    clock.refresh()
+    assert clock.state.status == "open"
+    database.close()
+
+
+def test_reservations_come_back_after_a_server_restart(tmp_path):
+    database = GameDatabase(str(tmp_path / "game.db"))
+    market = MarketData.from_dict(companies)
+    state = GameState(database, market, seed=1, round_seconds=0)
+    alice = state.account("alice")
+    assert state.engine.place_order(alice, "Company A", BUY, 10, 95)
+    state._save_all()
+
+    restarted = GameState(database, market, seed=1, round_seconds=0)
+    alice = restarted.account("alice")
+    assert alice.cash == 100000
+    assert restarted.engine.open_orders(alice) == []
+    database.close()
+
+
+def test_refresh_reads_a_rerun_in_one_round_trip(remote):
+    game, clock, state = remote
+    alice = game.new_account("alice")
+    bob = game.new_account("bob")
+    assert game.buy(alice, "Company A", 10)
+    assert game.place_order(alice, "Company A", SELL, 4, 100)
+    assert game.place_order(bob, "Company A", BUY, 6, 100)
+    round_trips = []
+    call_many = game.client.call_many
+    game.client.call_many = lambda requests: round_trips.append(len(requests)) or call_many(requests)
+
+    view = game.refresh(alice, "Company A")
+
+    # Order events, price, depth, open orders and the round's start
+    assert round_trips == [5]
+    assert not view.moved
+    assert alice.cash == 100000 - 1000 + 400
+    assert len(alice.transactions) == 2
+    assert (view.price, view.depth, view.open_orders) == (100, ([(100, 2)], []), [])
+    # The price table times round 1 from the server's start
+    assert abs(game.round_opened(1) - state._round_opened[1]) < 0.5
+    assert round_trips == [5]
+
+    # The organiser opens round 2: the account follows it in the same round trip, priced in round 2
+    assert game.open_round(2)
+    view = game.refresh(alice, "Company A")
+    assert round_trips == [5, 1, 6]
+    assert view.moved
+    assert alice.round == 2
+    assert view.price == 110
+    assert len(alice.transactions) == 2
@@ -0,0 +1,42 @@
+import logging
+
+from write_behind import WriteBehind
+
+
+def test_batches_are_coalesced_by_key():
+    batches = []
+    buffer = WriteBehind(batches.append, window=0.01)
+    for i in range(10):
+        buffer.put(i % 3, i)
+    assert buffer.flush(2.0)
+    assert sorted(item for batch in batches for item in batch)[-3:] == [7, 8, 9]
+
+
+def test_failed_write_is_retried():
+    written = []
+    failures = [RuntimeError("locked"), RuntimeError("locked")]
+
+    def write(items):
+        if failures:
+            raise failures.pop()
+        written.extend(items)
+
+    buffer = WriteBehind(write, window=0.01)
+    buffer.put("a", 1)
+    assert buffer.flush(2.0)
+    assert written == [1]
+    assert buffer.dropped == 0
+
+
+def test_batch_is_dropped_and_reported_after_max_attempts(caplog):
+    def write(items):
+        raise RuntimeError("disk full")
+
+    buffer = WriteBehind(write, window=0.01, name="test-writer", max_attempts=3)
+    with caplog.at_level(logging.ERROR, logger="write_behind"):
+        buffer.put("a", 1)
+        assert not buffer.flush(2.0)
+    assert buffer.dropped == 1
+    assert "test-writer: dropping 1 items after 3 failed writes" in caplog.text
+    # Reported once; later writes are not affected
+    assert buffer.flush(2.0)
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+# Net worth of every player at once: cash + holdings @ prices
+#
+# holdings is a players x tickers matrix of shares and prices a vector with one
+# price per ticker. NaN prices (delisted tickers) are valued at zero.
+def value_players(cash, holdings, prices):
+    cash = np.asarray(cash, dtype=np.float64)
+    holdings = np.asarray(holdings, dtype=np.float64)
+    prices = np.nan_to_num(np.asarray(prices, dtype=np.float64), nan=0.0)
+    if holdings.size == 0:
+        return cash.copy()
+    return cash + holdings @ prices
+
+
+# Build the players x tickers holdings matrix from {player: {ticker: shares}} portfolios
+#
+# Columns follow market.tickers; tickers unknown to the market are ignored,
+# since they have no price to be valued at.
+def holdings_matrix(portfolios, market):
+    players = list(portfolios)
+    holdings = np.zeros((len(players), len(market.tickers)), dtype=np.float64)
+    for row, player in enumerate(players):
+        for ticker, shares in portfolios[player].items():
+            ticker_id = market.ticker_id(ticker)
+            if ticker_id is not None:
+                holdings[row, ticker_id] = shares
+    return players, holdings
+
+
+# Value every player against the closing prices of a round; returns {player: net worth}
+def value_all(cash, portfolios, market, round_number):
+    players, holdings = holdings_matrix(portfolios, market)
+    cash_vector = np.fromiter((cash.get(player, 0) for player in players), dtype=np.float64, count=len(players))
+    net_worths = value_players(cash_vector, holdings, market.closing_prices(round_number))
+    if market.whole_prices and np.all(net_worths == np.round(net_worths)):
+        net_worths = net_worths.astype(np.int64)
+    return dict(zip(players, net_worths.tolist()))
+
+
+# Value every player at a round's closing prices and write the standings to the leaderboard in one append
+def publish_standings(store, cash, portfolios, market, round_number):
+    net_worths = value_all(cash, portfolios, market, round_number)
+    store.record_many((player, net_worth, round_number) for player, net_worth in net_worths.items())
+    return net_worths
@@ -0,0 +1,109 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+import weakref
+
+_instances = weakref.WeakSet()
+logger = logging.getLogger(__name__)
+
+
+# Write-behind buffer with group commit
+#
+# put() only enqueues a keyed item and returns. A background thread waits for
+# the first item, keeps collecting for `window` seconds, and hands the batch to
+# `write` in one call, so a burst of submissions costs one durable write per
+# window instead of one per item. Items with the same key in one batch are
+# coalesced (the latest wins). A failed write is logged and retried with the
+# next batch; after `max_attempts` failures in a row the batch is dropped, and
+# the next flush() reports it.
+class WriteBehind:
+    def __init__(self, write, window=0.05, name="write-behind", max_attempts=5):
+        self.write = write
+        self.window = window
+        self.name = name
+        self.max_attempts = max_attempts
+        self.batches = 0
+        self.dropped = 0
+        self._unreported_drops = 0
+        self._items = queue.SimpleQueue()
+        self._pending = {}
+        self._state = threading.Condition()
+        self._submitted = 0
+        self._done = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        _instances.add(self)
+
+    def put(self, key, item):
+        with self._state:
+            self._submitted += 1
+        self._items.put((key, item))
+
+    # Block until everything put so far is written (or the timeout expires); returns True when it was,
+    # False on a timeout or when a batch was dropped since the last flush
+    def flush(self, timeout=5.0):
+        with self._state:
+            target = self._submitted
+            if not self._state.wait_for(lambda: self._done >= target, timeout):
+                return False
+            dropped, self._unreported_drops = self._unreported_drops, 0
+            return not dropped
+
+    def _collect(self, block):
+        try:
+            key, item = self._items.get() if block else self._items.get_nowait()
+        except queue.Empty:
+            return 0
+        self._pending[key] = item
+        count = 1
+        deadline = time.monotonic() + self.window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return count
+            try:
+                key, item = self._items.get(timeout=remaining)
+            except queue.Empty:
+                return count
+            self._pending[key] = item
+            count += 1
+
+    def _run(self):
+        collected = 0
+        attempts = 0
+        while True:
+            collected += self._collect(block=not self._pending)
+            if not self._pending:
+                continue
+            try:
+                self.write(list(self._pending.values()))
+            except Exception:
+                attempts += 1
+                if attempts < self.max_attempts:
+                    logger.exception("%s: writing %d items failed (attempt %d of %d)",
+                                     self.name, len(self._pending), attempts, self.max_attempts)
+                    # Keep the batch (newer puts still overwrite it) and retry after another window
+                    time.sleep(self.window)
+                    continue
+                logger.exception("%s: dropping %d items after %d failed writes", self.name, len(self._pending), attempts)
+                self.dropped += len(self._pending)
+                with self._state:
+                    self._unreported_drops += len(self._pending)
+            else:
+                self.batches += 1
+            self._pending = {}
+            attempts = 0
+            with self._state:
+                self._done += collected
+                self._state.notify_all()
+            collected = 0
+
+
+# Write out every buffer of this process; runs at interpreter exit
+def flush_all(timeout=5.0):
+    return all([buffer.flush(timeout) for buffer in list(_instances)])
+
+
+atexit.register(flush_all)